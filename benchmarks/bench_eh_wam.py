@@ -0,0 +1,78 @@
+"""
+Benchmark of the EH-WAM aggregation: groupby().apply(lambda) against grading.eh_wam
+
+Run from the repository root:
+    python benchmarks/bench_eh_wam.py
+"""
+import os
+import sys
+import time
+
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.append(src_dir)
+
+import numpy as np
+import pandas as pd
+
+from app.logic import grading
+
+ROW_COUNTS = [10_000, 100_000, 1_000_000]
+UNITS_PER_STUDENT = 20
+
+
+def make_units(row_count, seed=0):
+    """
+    Build a random table of adjusted marks and credit points.
+
+    Parameters:
+    - row_count (int): Number of unit attempt rows.
+    - seed (int): Seed for the random generator.
+
+    Returns:
+    pd.DataFrame: Table with 'Person_ID', 'Adjusted_Mark' and 'Relevant_Credit_Points' columns.
+    """
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Person_ID': rng.integers(0, max(row_count // UNITS_PER_STUDENT, 1), row_count) + 23000000,
+        'Adjusted_Mark': rng.integers(0, 101, row_count).astype(float),
+        'Relevant_Credit_Points': rng.choice([6, 12], row_count),
+    })
+
+
+def apply_eh_wam(data):
+    """
+    The previous per student lambda implementation, used as the baseline.
+    """
+    return data.groupby('Person_ID').apply(
+        lambda x: (x['Adjusted_Mark'] * x['Relevant_Credit_Points']).sum() / x['Relevant_Credit_Points'].sum()
+    )
+
+
+def best_time(function, data, repeat=3):
+    """
+    Best wall time of a few calls to function(data), in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(data)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    print(f"{'rows':>10} {'apply (s)':>10} {'eh_wam (s)':>11} {'speedup':>8}")
+    for row_count in ROW_COUNTS:
+        data = make_units(row_count)
+
+        apply_time, expected = best_time(apply_eh_wam, data)
+        fast_time, actual = best_time(grading.eh_wam, data)
+
+        # Both paths must agree at the 3 decimal places the output is rounded to
+        pd.testing.assert_series_equal(actual.round(3), expected.round(3), check_names=False)
+
+        print(f"{row_count:>10} {apply_time:>10.4f} {fast_time:>11.4f} {apply_time / fast_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Micro-benchmark of the hot Sqlite_handbookDB lookups, with SQLite's default connection settings
+and with the tuned connection profile (CONNECTION_PRAGMAS, WAL and the statement cache)
+
+Runs on a copy of the shipped handbook.db, or with --majors on a synthetic handbook of that many
+majors (see synthetic_cohort.py).
+
+Run from the repository root:
+    python benchmarks/bench_handbook_lookups.py
+    python benchmarks/bench_handbook_lookups.py --majors 500
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+import synthetic_cohort
+
+sys.path.append(synthetic_cohort.src_dir)
+from app.databases.sqlite_handbookDB import JOURNAL_MODE, Sqlite_handbookDB
+
+REPEAT = 2000
+
+# Connection settings compared: Sqlite_handbookDB keyword arguments, and the journal mode of the
+# file (kept in the database, so it is set before each profile runs)
+PROFILES = {
+    'defaults': ({'pragmas': {}}, 'DELETE'),
+    'tuned': ({'wal': True}, JOURNAL_MODE),
+    'tuned, read-only': ({'read_only': True}, JOURNAL_MODE),
+}
+
+
+def lookups(handbook_db, major, year, rule_id, unit_code):
+    """
+    The lookups timed, as name -> function of no arguments.
+    """
+    major_id = handbook_db.get_major_id(major, year)
+    return {
+        'fetch_major_rules_verbose': lambda: handbook_db.fetch_major_rules_verbose(major, year),
+        'fetch_major_rules_verbose_by_id': lambda: handbook_db.fetch_major_rules_verbose_by_id(major_id),
+        'fetch_rule_verbose': lambda: handbook_db.fetch_rule_verbose(rule_id),
+        'fetch_unit_rules': lambda: handbook_db.fetch_unit_rules(rule_id),
+        'unit_in_major': lambda: handbook_db.unit_in_major(unit_code, major),
+        'get_major_id': lambda: handbook_db.get_major_id(major, year),
+        'fetch_majors_for_year': lambda: handbook_db.fetch_majors_for_year(year),
+    }
+
+
+def time_lookup(lookup, repeat):
+    """
+    Mean time of a lookup, in microseconds.
+    """
+    # get_major_id prints what it finds
+    with contextlib.redirect_stdout(io.StringIO()):
+        lookup()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            lookup()
+        return (time.perf_counter() - start) / repeat * 1e6
+
+
+def bench_profile(db_path, settings, journal_mode, repeat):
+    """
+    Time every lookup on one connection profile.
+
+    Returns:
+    dict: Lookup name -> mean time in microseconds.
+    """
+    conn = sqlite3.connect(db_path)
+    conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+    conn.close()
+
+    handbook_db = Sqlite_handbookDB(db_path, **settings)
+    try:
+        major, year = handbook_db.fetch_all_majors()[-1]
+        rule_id, _, units = handbook_db.fetch_major_rules_verbose(major, year)[-1]
+        with contextlib.redirect_stdout(io.StringIO()):
+            timed = lookups(handbook_db, major, year, rule_id, units[-1][0])
+        return {name: time_lookup(lookup, repeat) for name, lookup in timed.items()}
+    finally:
+        handbook_db.conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the hot handbook lookups.")
+    parser.add_argument("--majors", type=int, help="use a synthetic handbook of this many majors")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="calls of each lookup")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = os.path.join(temp_dir, "handbook.db")
+        if args.majors:
+            synthetic_cohort.write_handbook_db(synthetic_cohort.build_handbook(args.majors), db_path)
+        else:
+            shutil.copy(synthetic_cohort.TEMPLATE_DB_PATH, db_path)
+
+        # The schema is migrated first, so every profile runs with the same indexes
+        Sqlite_handbookDB(db_path).conn.close()
+
+        results = {profile: bench_profile(db_path, settings, journal_mode, args.repeat)
+                   for profile, (settings, journal_mode) in PROFILES.items()}
+
+    print(f"SQLite {sqlite3.sqlite_version}, mean time per call in microseconds")
+    print(f"{'lookup':<34}" + "".join(f"{profile:>18}" for profile in PROFILES))
+    for name in results['defaults']:
+        print(f"{name:<34}" + "".join(f"{results[profile][name]:>18.1f}" for profile in PROFILES))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Memory benchmark of the input schema (file_backends.INPUT_DTYPES) on a synthetic extract
+
+The extract (see synthetic_cohort.py, about 1M rows by default) is read twice: every column with
+pandas' default dtypes, as the input was read before the schema, and through read_input. For each,
+the size of the input frame and the peak memory of reading and processing it (Cohort_state and
+build_output, without writing) are reported.
+
+Run from the repository root:
+    python benchmarks/bench_input_memory.py
+    python benchmarks/bench_input_memory.py --students 2500
+"""
+import argparse
+import gc
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+import synthetic_cohort
+from bench_process_file import DEFAULT_DATA_DIR, cohort_files
+
+sys.path.append(synthetic_cohort.src_dir)
+from app.databases.handbook_snapshot import Handbook_snapshot
+from app.databases.sqlite_handbookDB import Sqlite_handbookDB
+from app.logic import file_backends
+from app.logic.cohort_state import Cohort_state
+from app.logic.marks_processor import Marks_processor
+
+# About 1M unit attempt rows, with retakes
+DEFAULT_STUDENTS = 25_000
+
+MIB = 1024 * 1024
+
+# How the extract is read: name -> function of the extract path
+READERS = {
+    'default dtypes': lambda input_path: pd.read_csv(input_path, dtype={'Unit_Code': str}),
+    'input schema': file_backends.read_input,
+}
+
+
+def measure(reader, input_path, handbook):
+    """
+    Read and process the extract once tracing memory allocations, and time reading it untraced.
+
+    Returns:
+    dict: The input rows and columns, the size of the input frame and the peak traced memory in
+    bytes, and the time taken to read the extract.
+    """
+    start = time.perf_counter()
+    reader(input_path)
+    read_seconds = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        data = reader(input_path)
+        input_bytes = int(data.memory_usage(deep=True).sum())
+        shape = data.shape
+
+        cohort = Cohort_state(handbook)
+        cohort.add(data)
+        Marks_processor(handbookDB=None).build_output(cohort)
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {'rows': shape[0], 'columns': shape[1], 'input_bytes': input_bytes,
+            'peak_bytes': peak_bytes, 'read_seconds': read_seconds}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the memory use of the input schema.")
+    parser.add_argument("--students", type=int, default=DEFAULT_STUDENTS)
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="where the synthetic data is kept")
+    args = parser.parse_args(argv)
+
+    input_path, db_path = cohort_files(args.data_dir, args.students)
+    handbook_db = Sqlite_handbookDB(db_path, read_only=True)
+    try:
+        handbook = Handbook_snapshot.from_db(handbook_db)
+    finally:
+        handbook_db.conn.close()
+
+    results = {name: measure(reader, input_path, handbook) for name, reader in READERS.items()}
+
+    print(f"{args.students} students, {results['input schema']['rows']} rows")
+    print(f"{'read with':<16}{'columns':>8}{'input frame':>14}{'peak':>12}{'read':>10}")
+    for name, result in results.items():
+        print(f"{name:<16}{result['columns']:>8}{result['input_bytes'] / MIB:>10.1f} MiB"
+              f"{result['peak_bytes'] / MIB:>8.1f} MiB{result['read_seconds']:>9.2f}s")
+
+    baseline, compact = results['default dtypes'], results['input schema']
+    print(f"Input frame {1 - compact['input_bytes'] / baseline['input_bytes']:.0%} smaller, "
+          f"peak memory {1 - compact['peak_bytes'] / baseline['peak_bytes']:.0%} lower")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
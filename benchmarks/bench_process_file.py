@@ -0,0 +1,201 @@
+"""
+End to end benchmark of Marks_processor.process_file on synthetic cohorts of increasing size
+
+For each scale a synthetic extract and handbook database are generated (see synthetic_cohort.py,
+kept in the data directory between runs), processed, and the total and per stage times recorded.
+The results are written to a JSON file. Given the results of an earlier run with --baseline, any
+scale or stage that got slower by more than the tolerance is reported and the exit code is 1.
+
+Run from the repository root:
+    python benchmarks/bench_process_file.py --output results.json
+    python benchmarks/bench_process_file.py --scales 1000 10000 --baseline results.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+
+import pandas as pd
+
+import synthetic_cohort
+
+sys.path.append(synthetic_cohort.src_dir)
+from app.databases.sqlite_handbookDB import Sqlite_handbookDB
+from app.logic.instrumentation import Instrumentation
+from app.logic.marks_processor import Marks_processor
+
+DEFAULT_SCALES = [1_000, 10_000, 100_000]
+DEFAULT_DATA_DIR = os.path.join(tempfile.gettempdir(), "marks_processor_benchmark")
+DEFAULT_RESULTS_PATH = "bench_process_file.json"
+
+# Extracts of at least this many students are streamed in chunks, as a whole file would not fit in memory
+CHUNKED_FROM_STUDENTS = 100_000
+CHUNKSIZE = 500_000
+
+# A time is a regression when it is this much slower than the baseline, and the baseline is at least
+# MIN_COMPARED_SECONDS (shorter times are mostly noise)
+DEFAULT_TOLERANCE = 0.25
+MIN_COMPARED_SECONDS = 0.05
+
+
+def cohort_files(data_dir, students, seed=0):
+    """
+    Generate the extract and handbook database of a scale, unless they already exist.
+
+    Returns:
+    tuple: The extract path and the handbook database path.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    input_path = os.path.join(data_dir, f"cohort_{students}_{seed}.csv")
+    db_path = os.path.join(data_dir, f"handbook_{students}_{seed}.db")
+    if not (os.path.exists(input_path) and os.path.exists(db_path)):
+        handbook = synthetic_cohort.build_handbook()
+        synthetic_cohort.write_handbook_db(handbook, db_path)
+        synthetic_cohort.write_cohort(input_path, handbook, students, seed=seed)
+    return input_path, db_path
+
+
+def run_once(input_path, db_path, output_path, chunksize=None, workers=None):
+    """
+    Process an extract once.
+
+    Returns:
+    dict: The instrumentation report of the run.
+    """
+    handbook_db = Sqlite_handbookDB(db_path, read_only=True)
+    try:
+        instrumentation = Instrumentation(track_memory=False)
+        Marks_processor(handbookDB=handbook_db).process_file(
+            input_path, output_path, chunksize=chunksize, workers=workers, instrumentation=instrumentation
+        )
+        return instrumentation.report
+    finally:
+        handbook_db.conn.close()
+
+
+def bench_scale(data_dir, students, repeat, workers=None):
+    """
+    Time processing one scale, keeping the median of each time over the repeats.
+
+    Returns:
+    dict: The result of the scale.
+    """
+    input_path, db_path = cohort_files(data_dir, students)
+    chunksize = CHUNKSIZE if students >= CHUNKED_FROM_STUDENTS else None
+    output_path = os.path.join(data_dir, f"output_{students}.csv")
+
+    reports = [run_once(input_path, db_path, output_path, chunksize, workers) for _ in range(repeat)]
+    os.remove(output_path)
+
+    # Stage name -> its record in each run, the chunks of a streamed input added up
+    stages = {}
+    for report in reports:
+        for stage in report['stages']:
+            stages.setdefault(stage['stage'], []).append(stage)
+
+    return {
+        'students': students,
+        'input_rows': stages['adjust'][0]['rows'],
+        'chunksize': chunksize,
+        'workers': workers,
+        'repeat': repeat,
+        'total_seconds': round(statistics.median(report['total_seconds'] for report in reports), 6),
+        'stages': {
+            name: {
+                'seconds': round(statistics.median(stage['seconds'] for stage in runs), 6),
+                'rows': runs[0]['rows'],
+            }
+            for name, runs in stages.items()
+        },
+    }
+
+
+def environment():
+    """
+    Where the benchmark ran, to tell apart results from different machines and commits.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=synthetic_cohort.src_dir,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def regressions(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare results with the results of an earlier run.
+
+    Parameters:
+    - results (dict): The results of this run.
+    - baseline (dict): The results of the earlier run.
+    - tolerance (float): How much slower a time may be, as a share of the baseline time.
+
+    Returns:
+    list[str]: A description of every time that got slower than allowed.
+    """
+    baseline_scales = {scale['students']: scale for scale in baseline['scales']}
+    found = []
+    for scale in results['scales']:
+        baseline_scale = baseline_scales.get(scale['students'])
+        if baseline_scale is None:
+            continue
+
+        timings = [('total', scale['total_seconds'], baseline_scale['total_seconds'])]
+        timings += [(name, stage['seconds'], baseline_scale['stages'][name]['seconds'])
+                    for name, stage in scale['stages'].items() if name in baseline_scale['stages']]
+        for name, seconds, baseline_seconds in timings:
+            if baseline_seconds >= MIN_COMPARED_SECONDS and seconds > baseline_seconds * (1 + tolerance):
+                found.append(f"{scale['students']} students, {name}: {seconds:.3f}s "
+                             f"(baseline {baseline_seconds:.3f}s, +{seconds / baseline_seconds - 1:.0%})")
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark process_file on synthetic cohorts.")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES, help="numbers of students")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per scale, the median is kept")
+    parser.add_argument("--workers", type=int, help="worker processes passed to process_file")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="where the synthetic data is kept")
+    parser.add_argument("--output", default=DEFAULT_RESULTS_PATH, help="JSON file to write the results to")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slow down before a time is a regression (default: 0.25)")
+    args = parser.parse_args(argv)
+
+    results = {'environment': environment(), 'scales': []}
+    for students in args.scales:
+        scale = bench_scale(args.data_dir, students, args.repeat, args.workers)
+        results['scales'].append(scale)
+        stage_times = "  ".join(f"{name} {stage['seconds']:.3f}s" for name, stage in scale['stages'].items())
+        print(f"{students:>8} students {scale['input_rows']:>9} rows  total {scale['total_seconds']:.3f}s  {stage_times}")
+
+    with open(args.output, 'w') as results_file:
+        json.dump(results, results_file, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            found = regressions(results, json.load(baseline_file), args.tolerance)
+        for regression in found:
+            print(f"Regression: {regression}")
+        if found:
+            return 1
+        print("No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
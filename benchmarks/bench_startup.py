@@ -0,0 +1,68 @@
+"""
+Benchmark of cold start time: the headless CLI, the GUI entry point and the output preview
+
+Each command runs in a fresh interpreter, so the times include interpreter start up and imports.
+
+Run from the repository root:
+    python benchmarks/bench_startup.py
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+example_input_path = os.path.abspath(os.path.join(src_dir, "..", "test_files", "Example Data BEHons.xlsx"))
+
+REPEAT = 5
+
+# Modules the headless CLI should never import
+GUI_MODULES = ['tkinter', 'app.TkinterGui']
+
+
+def run_time(command, repeat=REPEAT):
+    """
+    Median wall time of running a command in a fresh interpreter from the src directory, in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=src_dir, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def imported_modules(code):
+    """
+    Modules imported by running some code in a fresh interpreter from the src directory.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=src_dir,
+                            check=True, capture_output=True, text=True)
+    return {line.split("|")[-1].strip() for line in result.stderr.splitlines() if "|" in line}
+
+
+def main():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_path = os.path.join(temp_dir, "output.csv")
+        commands = {
+            "python (empty)": [sys.executable, "-c", "pass"],
+            "python -m app --help": [sys.executable, "-m", "app", "--help"],
+            "import GUI entry point": [sys.executable, "-c", "import main"],
+            "import output preview": [sys.executable, "-c", "import app.TkinterGui.output_window"],
+            "python -m app process": [sys.executable, "-m", "app", "process", example_input_path, output_path],
+        }
+
+        print(f"{'command':<26} {'median (s)':>10}")
+        for name, command in commands.items():
+            print(f"{name:<26} {run_time(command):>10.3f}")
+
+    # Everything the process command imports, without running it
+    cli_modules = imported_modules("import app.__main__, app.logic.marks_processor, app.databases.sqlite_handbookDB")
+    leaked = sorted(set(GUI_MODULES) & cli_modules)
+    print(f"GUI modules imported by the CLI: {', '.join(leaked) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
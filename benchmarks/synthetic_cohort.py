@@ -0,0 +1,325 @@
+"""
+Synthetic student extracts and a matching handbook database, for benchmarks and tests
+
+The extract has the columns of the registrar's extract (see test_files/Example Data BEHons.xlsx).
+Every major has a shared engineering core, its own level 2-5 units and three rules, and students
+take the core, most of their major and some electives, with grades drawn from a distribution.
+
+Run from the repository root:
+    python benchmarks/synthetic_cohort.py --students 1000 cohort.csv handbook.db
+"""
+import argparse
+import os
+import sqlite3
+import sys
+
+import numpy as np
+import pandas as pd
+
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+TEMPLATE_DB_PATH = os.path.join(src_dir, "handbook.db")
+
+MAJOR_NAMES = [
+    'Civil Engineering', 'Mechanical Engineering', 'Electrical and Electronic Engineering',
+    'Software Engineering', 'Chemical Engineering', 'Mining Engineering', 'Environmental Engineering',
+    'Biomedical Engineering', 'Automation and Robotics Engineering',
+]
+
+# Units every major shares: (unit code, credit points)
+CORE_UNITS = [
+    ('GENG1000', 0), ('GENG1010', 6), ('GENG1101', 6), ('MATH1011', 6), ('MATH1012', 6),
+    ('PHYS1001', 6), ('GENG2000', 0), ('GENG3000', 0),
+]
+CAPSTONE_UNITS = [('GENG4411', 0), ('GENG4412', 12)]
+
+MAJOR_UNITS_PER_LEVEL = 6
+MAJOR_UNIT_LEVELS = [2, 3, 4, 5]
+ELECTIVE_COUNT = 30
+ELECTIVES_PER_STUDENT = 12
+
+# Credit points required by each major's rules
+CORE_RULE_CREDIT_POINTS = 30
+INTERMEDIATE_RULE_CREDIT_POINTS = 60
+ADVANCED_RULE_CREDIT_POINTS = 60
+
+# Share of grades of the credit bearing units, close to the example data
+DEFAULT_GRADE_DISTRIBUTION = {
+    'HD': 0.20, 'D': 0.23, 'CR': 0.24, 'P': 0.15, 'UP': 0.04, 'N': 0.03, 'N+': 0.01, 'AC': 0.03,
+    'FN': 0.01, 'FC': 0.01, 'PS': 0.01, 'WD': 0.01, 'WP': 0.01, 'UF': 0.005, 'F': 0.005,
+}
+# Grade of the zero credit point units (inductions, practicum), as in the example data
+ZERO_CREDIT_POINT_GRADE = 'AC'
+# Marks of the marked grades, as [low, high]; other grades have no mark
+GRADE_MARKS = {'HD': (80, 100), 'D': (70, 79), 'CR': (60, 69), 'P': (50, 59), 'N': (0, 44), 'N+': (45, 49)}
+PASSING_GRADES = ['HD', 'D', 'CR', 'P', 'PS', 'AC', 'PA']
+# Grades with no enrolled credit points in the extract
+ZERO_ENROLLED_GRADES = ['UP', 'UF', 'F']
+FAILING_GRADES = ['N', 'N+', 'FN', 'FC', 'F']
+
+# Share of failed units taken again the next year, and of students part way through their degree
+RETAKE_SHARE = 0.7
+IN_PROGRESS_SHARE = 0.1
+
+FIRST_PERSON_ID = 23000000
+FIRST_YEAR = 2020
+SURNAMES = ['Alban', 'Brown', 'Chen', 'Dang', 'Evans', 'Fraser', 'Gupta', 'Harris', 'Ito', 'Jones', 'Kaur', 'Lee']
+GIVEN_NAMES = ['Robert', 'Amelia', 'Wei', 'Linh', 'Oliver', 'Isla', 'Arjun', 'Grace', 'Haruto', 'Mia', 'Noah', 'Zara']
+TEACHING_PERIODS = ['SEM-1', 'SEM-2']
+
+
+def major_prefix(position):
+    """
+    Four letter unit code prefix of the major at a position, e.g. 'SYNA'.
+    """
+    return "SY" + chr(ord('A') + position // 26) + chr(ord('A') + position % 26)
+
+
+def build_handbook(majors=len(MAJOR_NAMES)):
+    """
+    Build the units and rules of a synthetic handbook.
+
+    Parameters:
+    - majors (int): The number of majors.
+
+    Returns:
+    dict: 'units' [(unit code, credit points)], 'electives' [unit codes] and 'majors',
+          major name -> {'units': [unit codes], 'rules': [(credit points, [unit codes])]}.
+    """
+    units = list(CORE_UNITS) + list(CAPSTONE_UNITS)
+    electives = [f"ELEC{1 + number % 3}{number:03d}" for number in range(ELECTIVE_COUNT)]
+    units += [(unit_code, 6) for unit_code in electives]
+
+    handbook_majors = {}
+    for position in range(majors):
+        name = MAJOR_NAMES[position % len(MAJOR_NAMES)]
+        if position >= len(MAJOR_NAMES):
+            name = f"{name} {position // len(MAJOR_NAMES) + 1}"
+
+        major_units = [f"{major_prefix(position)}{level}{number:03d}"
+                       for level in MAJOR_UNIT_LEVELS for number in range(MAJOR_UNITS_PER_LEVEL)]
+        units += [(unit_code, 6) for unit_code in major_units]
+
+        half = len(major_units) // 2
+        handbook_majors[name] = {
+            'units': major_units,
+            'rules': [
+                (CORE_RULE_CREDIT_POINTS, [unit_code for unit_code, _ in CORE_UNITS]),
+                (INTERMEDIATE_RULE_CREDIT_POINTS, major_units[:half]),
+                (ADVANCED_RULE_CREDIT_POINTS, major_units[half:] + [unit_code for unit_code, _ in CAPSTONE_UNITS]),
+            ],
+        }
+
+    return {'units': units, 'electives': electives, 'majors': handbook_majors}
+
+
+def write_handbook_db(handbook, db_path, year=2023, template_db_path=TEMPLATE_DB_PATH):
+    """
+    Write a synthetic handbook to a new SQLite database with the schema of the shipped handbook.db.
+
+    Parameters:
+    - handbook (dict): The handbook from build_handbook.
+    - db_path (str): The path to the database to create. An existing file is replaced.
+    - year (int): The year of every major.
+    - template_db_path (str): The database the schema is copied from.
+    """
+    template = sqlite3.connect(template_db_path)
+    try:
+        schema = [sql for name, sql in template.execute("SELECT name, sql FROM sqlite_master WHERE sql IS NOT NULL")
+                  if not name.startswith('sqlite_')]
+    finally:
+        template.close()
+
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        for sql in schema:
+            conn.execute(sql)
+
+        conn.executemany("INSERT INTO Units(unit_code, credit_pts) VALUES(?, ?)", handbook['units'])
+        for name, major in handbook['majors'].items():
+            major_id = conn.execute("INSERT INTO Major(name, year) VALUES(?, ?)", (name, year)).lastrowid
+            for credit_points, unit_codes in major['rules']:
+                rule_id = conn.execute("INSERT INTO Rules(value) VALUES(?)", (credit_points,)).lastrowid
+                conn.execute("INSERT INTO MajorRules(major_id, rule_id) VALUES(?, ?)", (major_id, rule_id))
+                conn.executemany("INSERT INTO RuleUnits(unit_code, rule_id) VALUES(?, ?)",
+                                 [(unit_code, rule_id) for unit_code in unit_codes])
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def cohort_chunks(handbook, students, units_per_student=40, grade_distribution=None, seed=0, block_size=10_000):
+    """
+    Generate the extract of a synthetic cohort, a block of students at a time.
+
+    Parameters:
+    - handbook (dict): The handbook from build_handbook.
+    - students (int): The number of students.
+    - units_per_student (int): The average number of units a student has attempted.
+    - grade_distribution (dict, optional): Grade -> share of attempts, DEFAULT_GRADE_DISTRIBUTION if not given.
+    - seed (int): Seed for the random generator. The same arguments always give the same extract.
+    - block_size (int): The number of students in each chunk.
+
+    Yields:
+    pd.DataFrame: The rows of the next block of students, sorted by Person_ID, YEAR and Teaching_Period.
+    """
+    rng = np.random.default_rng(seed)
+    grade_distribution = grade_distribution or DEFAULT_GRADE_DISTRIBUTION
+    grades = np.array(list(grade_distribution))
+    grade_shares = np.array(list(grade_distribution.values()), dtype=float)
+    grade_shares /= grade_shares.sum()
+
+    credit_points = dict(handbook['units'])
+    major_names = list(handbook['majors'])
+    person_ids = FIRST_PERSON_ID + rng.permutation(students * 4)[:students]
+
+    for block_start in range(0, students, block_size):
+        block_ids = np.sort(person_ids[block_start:block_start + block_size])
+        block_majors = rng.integers(len(major_names), size=len(block_ids))
+
+        frames = []
+        for major_position, major_name in enumerate(major_names):
+            major_ids = block_ids[block_majors == major_position]
+            if len(major_ids):
+                frames.append(major_attempts(rng, handbook, major_name, major_ids, units_per_student))
+        attempts = pd.concat(frames, ignore_index=True)
+
+        attempts['Grade'] = rng.choice(grades, size=len(attempts), p=grade_shares)
+        attempts.loc[attempts['Unit_Code'].map(credit_points) == 0, 'Grade'] = ZERO_CREDIT_POINT_GRADE
+        attempts = add_retakes(rng, attempts)
+        yield extract_rows(rng, attempts, credit_points)
+
+
+def major_attempts(rng, handbook, major_name, major_ids, units_per_student):
+    """
+    Pick the units attempted by the students of one major.
+
+    Returns:
+    pd.DataFrame: 'Person_ID', 'Major_Deg' and 'Unit_Code' of every attempt.
+    """
+    core = [unit_code for unit_code, _ in CORE_UNITS + CAPSTONE_UNITS]
+    major_units = handbook['majors'][major_name]['units']
+    electives = list(rng.choice(handbook['electives'], size=ELECTIVES_PER_STUDENT, replace=False))
+    catalogue = np.array(core + major_units + electives)
+
+    # Core units come first, then major units before most electives, in a random order per student
+    keys = rng.random((len(major_ids), len(catalogue)))
+    keys[:, :len(core)] -= 2
+    keys[:, len(core) + len(major_units):] += 0.5
+
+    # Students part way through their degree have attempted fewer units, not always the core
+    unit_counts = np.clip(rng.normal(units_per_student, 3, size=len(major_ids)).round().astype(int), 1, len(catalogue))
+    in_progress = rng.random(len(major_ids)) < IN_PROGRESS_SHARE
+    unit_counts[in_progress] = np.maximum(unit_counts[in_progress] // 2, 1)
+    keys[in_progress, :len(core)] += 2
+
+    order = np.argsort(keys, axis=1)
+    taken = np.arange(len(catalogue)) < unit_counts[:, None]
+
+    return pd.DataFrame({
+        'Person_ID': np.repeat(major_ids, unit_counts),
+        'Major_Deg': major_name,
+        'Unit_Code': catalogue[order[taken]],
+    })
+
+
+def add_retakes(rng, attempts):
+    """
+    Add a passing attempt, the next year, for some of the failed units.
+    """
+    failed = attempts[attempts['Grade'].isin(FAILING_GRADES)]
+    retakes = failed[rng.random(len(failed)) < RETAKE_SHARE].assign(Grade='P', Retake=1)
+    return pd.concat([attempts.assign(Retake=0), retakes], ignore_index=True)
+
+
+def extract_rows(rng, attempts, credit_points):
+    """
+    Fill in the remaining extract columns of unit attempts.
+
+    Returns:
+    pd.DataFrame: The rows, in the column order of the registrar's extract.
+    """
+    row_count = len(attempts)
+    grade = attempts['Grade']
+    unit_code = attempts['Unit_Code']
+
+    marks = np.full(row_count, np.nan)
+    for grade_name, (low, high) in GRADE_MARKS.items():
+        graded = (grade == grade_name).to_numpy()
+        marks[graded] = rng.integers(low, high + 1, size=graded.sum())
+
+    unit_credit_points = unit_code.map(credit_points).to_numpy()
+    enrolled = np.where(grade.isin(ZERO_ENROLLED_GRADES), 0, unit_credit_points)
+    achievable = np.where(grade.isin(PASSING_GRADES), enrolled, 0)
+    level = unit_code.str[4].astype(int).to_numpy()
+
+    person_position = attempts['Person_ID'].to_numpy() % len(SURNAMES)
+    rows = pd.DataFrame({
+        'Person_ID': attempts['Person_ID'],
+        'Surname': np.array(SURNAMES)[person_position],
+        'Given Names': np.array(GIVEN_NAMES)[(attempts['Person_ID'].to_numpy() // 7) % len(GIVEN_NAMES)],
+        'Student_Title': np.where(person_position % 2 == 0, 'Mr', 'Miss'),
+        'Course_Code': 'BH011',
+        'Course_Title': 'Bachelor of Engineering (Honours)',
+        'Major_Deg': attempts['Major_Deg'],
+        'Unit_Code': unit_code,
+        'Unit_Title': 'Synthetic unit ' + unit_code,
+        'YEAR': (FIRST_YEAR + np.minimum(level, 4) - 1 + attempts['Retake'].to_numpy()).astype(float),
+        'Teaching_Period': rng.choice(TEACHING_PERIODS, size=row_count),
+        'Enrolled_Credit_Points': enrolled,
+        'Achievable_Credit_Points': achievable,
+        'Grade': grade,
+        'Mark': marks,
+    })
+    return rows.sort_values(['Person_ID', 'YEAR', 'Teaching_Period'], kind='stable').reset_index(drop=True)
+
+
+def write_cohort(output_filepath, handbook, students, units_per_student=40, grade_distribution=None, seed=0):
+    """
+    Write the extract of a synthetic cohort to a CSV, Excel or Parquet file.
+
+    CSV files are written a block of students at a time, so any number of students fits in memory.
+
+    Returns:
+    int: The number of rows written.
+    """
+    chunks = cohort_chunks(handbook, students, units_per_student, grade_distribution, seed)
+    extension = os.path.splitext(output_filepath)[1].lower()
+
+    if extension == '.csv':
+        row_count = 0
+        for number, chunk in enumerate(chunks):
+            chunk.to_csv(output_filepath, mode='w' if number == 0 else 'a', header=number == 0, index=False)
+            row_count += len(chunk)
+        return row_count
+
+    data = pd.concat(chunks, ignore_index=True)
+    if extension in ('.xlsx', '.xls'):
+        data.to_excel(output_filepath, index=False)
+    elif extension == '.parquet':
+        data.to_parquet(output_filepath, index=False)
+    else:
+        raise ValueError(f"Unsupported file type: {extension}")
+    return len(data)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic cohort extract and a matching handbook database.")
+    parser.add_argument("output", help="extract file to write (.csv, .xlsx or .parquet)")
+    parser.add_argument("handbook", help="handbook database to write")
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--units-per-student", type=int, default=40)
+    parser.add_argument("--majors", type=int, default=len(MAJOR_NAMES))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    handbook = build_handbook(args.majors)
+    write_handbook_db(handbook, args.handbook)
+    row_count = write_cohort(args.output, handbook, args.students, args.units_per_student, seed=args.seed)
+    print(f"Wrote {row_count} rows for {args.students} students to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,23 @@
 import tkinter as tk
 from tkinter import filedialog
+from tkinter import messagebox
+from tkinter import ttk
 
 import os
+import queue
+import threading
 
-from app.TkinterGui.output_window import Output_window
 from app.TkinterGui.major_edit_window import Major_edit_window
+from app.logic.progress import Processing_cancelled
+
+# How often the Tk thread checks on the processing thread, in milliseconds
+PROGRESS_POLL_MS = 100
 
 
 class Main_window():
-    def __init__(self, marks_processor, handbook_db) -> None:
+    def __init__(self, handbook_db, marks_processor=None) -> None:
         self.root = tk.Tk()
+        # Created on first use by get_marks_processor, so pandas is not imported before the window appears
         self.marks_processor = marks_processor
         self.handbook_db = handbook_db
 
@@ -18,8 +26,31 @@ class Main_window():
         # else if input path is set first - set output path to the same
         self.input_filepath = os.path.expanduser("~")
         self.output_filepath = None
+        # Output file of the last successful run, rewritten after a handbook edit only if the user agrees
+        self.processed_output_filepath = None
+        self.output_window = None
 
         self.process_file_button = None
+        self.process_file_label = None
+        self.cancel_button = None
+        self.reevaluate_button = None
+        self.progress_bar = None
+        self.cache_checkbutton = None
+        self.clear_cache_button = None
+        # Parsed input files are only cached on disk once the user turns the cache on
+        self.use_ingest_cache = None
+
+        # Processing, re-evaluation and saving run in a worker thread which sends its progress and result
+        # through a queue; processing_task is which of 'process', 'reevaluate' or 'save' is running
+        self.processing_thread = None
+        self.processing_task = None
+        self.processing_messages = None
+        self.cancel_event = None
+
+        # The handbook was edited since the last output was built, and the output file is older than last_output
+        self.handbook_edited = False
+        self.handbook_edited_before_task = False
+        self.unsaved_output = False
 
 
     def draw_window(self):
@@ -38,6 +69,16 @@ class Main_window():
                                            command=self.open_major_edit_window)
         modify_handbook_button.grid(row=0, column=1, sticky='w', **menu_frame_button_options)
 
+        self.use_ingest_cache = tk.BooleanVar(
+            value=self.marks_processor is not None and self.marks_processor.ingest_cache is not None
+        )
+        self.cache_checkbutton = tk.Checkbutton(menu_frame, text="Cache Input Files", variable=self.use_ingest_cache,
+                                                command=self.toggle_ingest_cache)
+        self.cache_checkbutton.grid(row=0, column=2, sticky='w', **menu_frame_button_options)
+
+        self.clear_cache_button = tk.Button(menu_frame, text="Clear Cache", command=self.clear_ingest_cache)
+        self.clear_cache_button.grid(row=0, column=3, sticky='w', **menu_frame_button_options)
+
 
         # File selection frame
         file_select_frame = tk.LabelFrame(window_frame, text="File Processing")
@@ -75,6 +116,25 @@ class Main_window():
 
         process_file_label = tk.Label(file_select_frame, text="")
         process_file_label.grid(row=2, column=1, **file_select_label_options)
+        self.process_file_label = process_file_label
+
+        self.cancel_button = tk.Button(
+            file_select_frame, width=file_select_button_width, text="Cancel",
+            command=self.cancel_processing
+        )
+        self.cancel_button.grid(row=3, column=0, **file_select_button_options)
+        self.cancel_button.config(state="disabled")
+
+        self.progress_bar = ttk.Progressbar(file_select_frame, mode="determinate", maximum=100)
+        self.progress_bar.grid(row=3, column=1, **file_select_button_options)
+
+        # Only the students affected by handbook edits are re-evaluated, once the user asks for it
+        self.reevaluate_button = tk.Button(
+            file_select_frame, width=file_select_button_width, text="Re-evaluate",
+            command=self.reevaluate
+        )
+        self.reevaluate_button.grid(row=4, column=0, **file_select_button_options)
+        self.reevaluate_button.config(state="disabled")
 
         # Configure row and column weights to make frames expand
         self.root.grid_rowconfigure(0, weight=1)
@@ -82,11 +142,20 @@ class Main_window():
         window_frame.grid_rowconfigure(1, weight=1)
         window_frame.grid_columnconfigure(0, weight=1)
         menu_frame.grid_rowconfigure(1, weight=1)
-        menu_frame.grid_columnconfigure(1, weight=1)
+        menu_frame.grid_columnconfigure(3, weight=1)
 
         self.root.mainloop()
 
     
+    def get_marks_processor(self):
+        if self.marks_processor is None:
+            # Loaded when first needed, like the preview, as it imports pandas
+            from app.logic.marks_processor import Marks_processor
+
+            self.marks_processor = Marks_processor(handbookDB=self.handbook_db)
+        return self.marks_processor
+
+
     def are_files_selected(self):
         return os.path.isfile(self.input_filepath) and self.output_filepath
 
@@ -138,28 +207,235 @@ class Main_window():
         
 
     def process_file(self, label):
+        if self.processing_thread is not None:
+            return
+
         try:
-            output_df = self.marks_processor.process_file(self.input_filepath, self.output_filepath)
-            label.config(text=f"Success!")
+            # The database connection belongs to this thread, so the worker gets a snapshot of the handbook
+            handbook = self.get_marks_processor().load_handbook()
+        except Exception as e:
+            print(str(e))
+            label.config(text=f"Something went wrong :(")
+            return
 
-            output_window = Output_window(output_df)
-            output_window.draw_window()
+        label.config(text=f"Processing...")
+        self.start_worker('process', self.run_processing, self.input_filepath, self.output_filepath, handbook)
 
-        except IsADirectoryError:
-            label.config(text=f"Input file not selected")
 
+    def start_worker(self, task, target, *args):
+        # Edits made from here on are not in a new output; the earlier ones are if the task succeeds
+        self.handbook_edited_before_task = self.handbook_edited
+        if task != 'save':
+            self.handbook_edited = False
+        self.processing_task = task
+        self.cancel_event = threading.Event()
+        self.processing_messages = queue.Queue()
+        self.processing_thread = threading.Thread(target=target, args=args, daemon=True)
+
+        self.process_file_button.config(state="disabled")
+        # Only processing checks for cancellation
+        self.cancel_button.config(state="normal" if task == 'process' else "disabled")
+        self.reevaluate_button.config(state="disabled")
+        self.cache_checkbutton.config(state="disabled")
+        self.clear_cache_button.config(state="disabled")
+        self.progress_bar['value'] = 0
+
+        self.processing_thread.start()
+        self.root.after(PROGRESS_POLL_MS, self.poll_processing)
+
+
+    def run_processing(self, input_filepath, output_filepath, handbook):
+        # Runs in the worker thread, so it must not touch any widget
+        def report_progress(stage, fraction):
+            self.processing_messages.put(('progress', stage, fraction))
+
+        try:
+            output_df = self.marks_processor.process_file(
+                input_filepath, output_filepath, handbook=handbook,
+                progress=report_progress, cancel_event=self.cancel_event
+            )
+            self.processing_messages.put(('done', output_df, output_filepath))
         except Exception as e:
-            print(str(e))
+            self.processing_messages.put(('error', e, output_filepath))
+
+
+    def run_task(self, function, output_filepath, *args):
+        # Runs a re-evaluation or save in the worker thread, so it must not touch any widget
+        try:
+            result = function(*args)
+            self.processing_messages.put(('done', result, output_filepath))
+        except Exception as e:
+            self.processing_messages.put(('error', e, output_filepath))
+
+
+    def poll_processing(self):
+        while True:
+            try:
+                message = self.processing_messages.get_nowait()
+            except queue.Empty:
+                break
+
+            if message[0] == 'progress':
+                _, stage, fraction = message
+                self.progress_bar['value'] = fraction * 100
+                if not self.cancel_event.is_set():
+                    self.process_file_label.config(text=f"Processing: {stage}...")
+            else:
+                self.finish_processing(*message)
+                return
+
+        self.root.after(PROGRESS_POLL_MS, self.poll_processing)
+
+
+    def finish_processing(self, outcome, result, output_filepath):
+        label = self.process_file_label
+        task = self.processing_task
+        self.processing_thread = None
+        self.processing_task = None
+        self.cancel_button.config(state="disabled")
+        self.process_file_button.config(state="normal")
+        self.cache_checkbutton.config(state="normal")
+        self.clear_cache_button.config(state="normal")
+        self.update_reevaluate_button()
+
+        if outcome == 'done':
+            self.progress_bar['value'] = 100
+            if task == 'reevaluate':
+                self.finish_reevaluation(result, output_filepath)
+                return
+            if task == 'save':
+                self.unsaved_output = False
+                label.config(text=f"Saved the updated output")
+                return
+
+            self.processed_output_filepath = output_filepath
+            self.unsaved_output = False
+            self.update_reevaluate_button()
+            if self.handbook_edited:
+                label.config(text=f"Success! The handbook was edited while processing, press Re-evaluate to update")
+            else:
+                label.config(text=f"Success!")
+
+            # Loaded on the first preview so starting the GUI does not pay for the preview
+            from app.TkinterGui.output_window import Output_window
+
+            self.output_window = Output_window(self.marks_processor.last_output)
+            self.output_window.draw_window()
+            return
+
+        self.progress_bar['value'] = 0
+        self.handbook_edited = self.handbook_edited or self.handbook_edited_before_task
+        self.update_reevaluate_button()
+        if isinstance(result, Processing_cancelled):
+            label.config(text=f"Cancelled")
+        elif isinstance(result, IsADirectoryError):
+            label.config(text=f"Input file not selected")
+        else:
+            print(str(result))
             if not (self.input_filepath and self.output_filepath):
                 label.config(text=f"File not selected")
             else:
                 label.config(text=f"Something went wrong :(")
 
+
+    def cancel_processing(self):
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+            self.process_file_label.config(text=f"Cancelling...")
+
+
+    def open_ingest_cache(self):
+        """
+        Open the per user ingest cache, or run without it if its directory is not safe to use.
+        """
+        # Loaded when the cache is first used, like the preview
+        from app.logic.ingest_cache import Ingest_cache
+
+        try:
+            return Ingest_cache()
+        except OSError as e:
+            messagebox.showerror("Cache Input Files", f"Parsed input files cannot be cached: {e}", parent=self.root)
+            return None
+
+
+    def toggle_ingest_cache(self):
+        if not self.use_ingest_cache.get():
+            if self.marks_processor is not None:
+                self.marks_processor.ingest_cache = None
+            return
+
+        self.get_marks_processor().ingest_cache = self.open_ingest_cache()
+        if self.marks_processor.ingest_cache is None:
+            self.use_ingest_cache.set(False)
+
+
+    def clear_ingest_cache(self):
+        ingest_cache = self.get_marks_processor().ingest_cache or self.open_ingest_cache()
+        if ingest_cache is None:
+            return
+
+        cleared_entries = len(ingest_cache.entries())
+        ingest_cache.clear()
+        messagebox.showinfo("Clear Cache", f"Removed {cleared_entries} cached input files", parent=self.root)
+
     
     def open_major_edit_window(self):
         try:
-            major_edit_window = Major_edit_window(handbook_db=self.handbook_db, root=self.root)
+            major_edit_window = Major_edit_window(handbook_db=self.handbook_db, root=self.root,
+                                                  on_handbook_changed=self.handbook_changed)
             major_edit_window.initialize_UI()
         except Exception as e:
             print(e)
 
+
+    def handbook_changed(self):
+        # Called after every edit, so it only notes that the output is out of date
+        self.handbook_edited = True
+        self.update_reevaluate_button()
+        if self.processing_thread is None and self.processed_output_filepath is not None:
+            self.process_file_label.config(text=f"Handbook edited, press Re-evaluate to update the output")
+
+
+    def update_reevaluate_button(self):
+        can_reevaluate = (self.processing_thread is None and self.handbook_edited
+                          and self.processed_output_filepath is not None)
+        self.reevaluate_button.config(state="normal" if can_reevaluate else "disabled")
+
+
+    def reevaluate(self):
+        if self.processing_thread is not None:
+            return
+
+        try:
+            # The database connection belongs to this thread, so the worker gets a snapshot of the handbook
+            handbook = self.get_marks_processor().load_handbook()
+        except Exception as e:
+            print(str(e))
+            self.process_file_label.config(text=f"Something went wrong :(")
+            return
+
+        self.process_file_label.config(text=f"Re-evaluating...")
+        self.start_worker('reevaluate', self.run_task, self.marks_processor.reevaluate,
+                          self.processed_output_filepath, handbook)
+
+
+    def finish_reevaluation(self, changed_rows, output_filepath):
+        label = self.process_file_label
+        label.config(text=f"Updated {len(changed_rows)} students after the handbook edit")
+        if self.output_window is not None:
+            self.output_window.refresh(self.marks_processor.last_output)
+
+        if len(changed_rows) > 0:
+            self.unsaved_output = True
+        if not self.unsaved_output:
+            return
+
+        # The output file was written by the user, so it is only overwritten if they agree
+        if messagebox.askyesno("Save Updated Output",
+                               f"Updated {len(changed_rows)} students after the handbook edit.\n\n"
+                               f"Overwrite {output_filepath} with the updated output?", parent=self.root):
+            label.config(text=f"Saving...")
+            self.start_worker('save', self.run_task, self.marks_processor.write_output, output_filepath,
+                              self.marks_processor.last_output, output_filepath)
+        else:
+            label.config(text=f"Updated {len(changed_rows)} students, the output file was not changed")
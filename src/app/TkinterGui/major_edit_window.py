@@ -1,17 +1,57 @@
+import sqlite3
 import tkinter as tk
+from tkinter import messagebox
 from tkinter import ttk
 
+from app.databases.unit_index import Unit_index
+from app.TkinterGui.rules_view_model import Rules_view_model
+
 WINDOW_HEIGHT = 1080
 WINDOW_WIDTH = 1920
 
+# Shown in an empty unit search bar, and searched as an empty term
+SEARCH_PLACEHOLDER = "Search for a unit"
+
+
+def sync_tree_rows(tree, rows):
+    """
+    Make a Treeview show rows, deleting, inserting or moving only the rows that differ from what is shown.
+
+    Parameters:
+    - tree (ttk.Treeview): The Treeview.
+    - rows (list): (item ID, values) of each row, in display order.
+    """
+    wanted = {item_id for item_id, _ in rows}
+    shown = tree.get_children()
+    hidden = [item_id for item_id in shown if item_id not in wanted]
+    if hidden:
+        tree.delete(*hidden)
+
+    # Rows still shown only need moving when their order changed
+    kept = [item_id for item_id in shown if item_id in wanted]
+    shown = set(kept)
+    reorder = kept != [item_id for item_id, _ in rows if item_id in shown]
+
+    # Going through the rows in order, each is inserted or moved to its final position
+    for position, (item_id, values) in enumerate(rows):
+        if item_id not in shown:
+            tree.insert("", position, iid=item_id, values=values)
+        elif reorder:
+            tree.move(item_id, "", position)
+
 
 class Major_edit_window:
-    def __init__(self, handbook_db, root):
+    def __init__(self, handbook_db, root, on_handbook_changed=None):
         self.handbook_db = handbook_db
+        # Called after every edit to the handbook, e.g. to re-evaluate the last processed file
+        self.on_handbook_changed = on_handbook_changed
         # Array of rule_id, x,y,width,height
         # Used to store the position of each rule table for drag and drop
         self.dragging_unit = None  # To keep track of the unit being dragged
         self.tables = []
+        # Rules of the selected major, and rule ID -> (frame, label, unit tree, delete tree) showing each
+        self.rules_view = Rules_view_model(handbook_db)
+        self.rule_tables = {}
         self.root = root
 
     def initialize_UI(self):
@@ -30,6 +70,9 @@ class Major_edit_window:
         notebook.add(self.rules_search_frame, text="Rules")
         notebook.pack(expand=1, fill="both")
 
+        # Loaded once, and kept up to date as units are created and deleted
+        self.unit_index = Unit_index.from_db(self.handbook_db)
+
         self.initialize_units_tab()
         self.initialize_majors_tab()
         self.initialize_rules_tab()
@@ -202,16 +245,13 @@ class Major_edit_window:
                 print("Please enter a valid integer for credit points.")
                 return
 
-            # Add the rule and get its ID
-            rule_id = self.handbook_db.create_rule_and_get_id(credit_points)
-            
-            # Link the rule to the current selected major
-            major_id = self.handbook_db.get_major_id(self.major_var.get(), self.year_var.get())  # Assuming you have a method to get major_id based on major name and year
-            self.handbook_db.link_major_rule(major_id, rule_id)
+            # Add the rule to the current selected major, and a table for it only
+            rule_id = self.rules_view.add_rule(credit_points)
 
-            
             dialog.destroy()
-            self.refresh_rules_section()
+            self.create_rule_table(self.rules_frame, rule_id)
+            self.record_table_positions()
+            self.handbook_changed()
 
         tk.Button(dialog, text="OK", command=add_rule).grid(row=1, columnspan=2, padx=10, pady=10)
 
@@ -222,13 +262,14 @@ class Major_edit_window:
 
         # Create and place a search bar at the top of the frame
         search_entry = tk.Entry(all_units_frame)
-        search_entry.insert(0, "Search for a unit")
+        search_entry.insert(0, SEARCH_PLACEHOLDER)
         search_entry.bind(
             "<FocusIn>", lambda event: self.clear_placeholder(event, search_entry))
         search_entry.bind(
             "<FocusOut>", lambda event: self.add_placeholder(event, search_entry))
         search_entry.bind("<KeyRelease>", self.update_search_major)
         search_entry.pack(side="top", fill="x", padx=5, pady=5)
+        self.all_units_search_entry = search_entry
 
         # Create a Treeview to display all units
         self.all_units_tree = ttk.Treeview(all_units_frame, columns=(
@@ -260,25 +301,31 @@ class Major_edit_window:
         print(self.unit_selection)
         
     def populate_all_units(self):
-        for unit in self.handbook_db.fetch_all_units_with_credit():
-            self.all_units_tree.insert("", "end", values=unit)
-            #self.unit_select_tree.insert("", "end", values=("Select",))
+        self.show_units(self.all_units_tree, "")
 
     def update_search_major(self, event):
-        search_term = event.widget.get().lower()
-        # Clear current tree view
-        self.all_units_tree.delete(*self.all_units_tree.get_children())
-        #self.unit_select_tree.delete(*self.unit_select_tree.get_children())
-        for unit in self.handbook_db.fetch_all_units_with_credit():
-            unit_name, credit_points = unit
-            if search_term in unit_name.lower():
-                self.all_units_tree.insert(
-                    "", "end", values=(unit_name, credit_points))
-                #self.unit_select_tree.insert("", "end", values=("Select",))
+        self.show_units(self.all_units_tree, event.widget.get())
                 
     def refresh_major_units(self):
-        self.all_units_tree.delete(*self.all_units_tree.get_children())
-        self.populate_all_units()
+        self.show_units(self.all_units_tree, self.all_units_search_entry.get())
+
+    def show_units(self, tree, search_term):
+        """
+        Show the units matching a search term in a unit Treeview.
+
+        Only the rows that differ from what is shown are deleted, inserted or moved. Rows are
+        identified by their unit code and kept in the order of the unit index.
+
+        Parameters:
+        - tree (ttk.Treeview): The Treeview, with "Unit Code" and "Credit Points" columns.
+        - search_term (str): The text in the search bar.
+        """
+        if search_term == SEARCH_PLACEHOLDER:
+            search_term = ""
+        unit_codes = self.unit_index.search(search_term)
+
+        credit_points = self.unit_index.credit_points
+        sync_tree_rows(tree, [(unit_code, (unit_code, credit_points[unit_code])) for unit_code in unit_codes])
 
     def initialize_rules_section(self):
         # Create a canvas and a vertical scrollbar and link them
@@ -299,37 +346,38 @@ class Major_edit_window:
         scrollbar.pack(side="right", fill="y")
 
     def refresh_rules_section(self, *args):
+        # Redraws every rule table, when another major is selected. Edits to the rules
+        # of the selected major only patch the tables they touch.
+
         # Clear existing rules if any
         for widget in self.rules_frame.winfo_children():
             widget.destroy()
+        self.rule_tables = {}
 
         # Fetch new rules and populate
-        rules_data = self.handbook_db.fetch_major_rules_verbose(
-            major=self.major_var.get(),
-            year=self.year_var.get()
-        )
-
-        print(rules_data)
-
-        for index, (rule_id, credit_points, units) in enumerate(rules_data):
-            self.create_rule_table(self.rules_frame, index+1, credit_points, units,rule_id)
+        self.rules_view.load(major=self.major_var.get(), year=self.year_var.get())
 
+        for rule_id in self.rules_view.rules:
+            self.create_rule_table(self.rules_frame, rule_id)
+        self.record_table_positions()
 
-    def create_rule_table(self, frame, rule_name, credit_points, units, rule_id):
+    def create_rule_table(self, frame, rule_id):
         def add_unit():
             if(self.unit_selection != ""):
                 self.add_unit_to_rule(rule_id, self.unit_selection)
                 self.unit_selection = ""
         
         def delete_rule():
-            print(f"Deleting {rule_name}")
-            self.handbook_db.delete_rule( rule_id)
-            self.refresh_rules_section()
+            print(f"Deleting {self.rules_view.rule_number(rule_id)}")
+            self.rules_view.delete_rule(rule_id)
+            self.remove_rule_table(rule_id)
+            self.handbook_changed()
 
         def delete_unit(unit_name, rule_id):
-            print(f"Deleting {unit_name} from {rule_name}")
-            self.handbook_db.unlink_unit_rule(unit_name, rule_id)
-            self.refresh_rules_section()
+            print(f"Deleting {unit_name} from {self.rules_view.rule_number(rule_id)}")
+            self.rules_view.remove_unit(rule_id, unit_name)
+            self.show_rule_units(rule_id)
+            self.handbook_changed()
 
         def on_delete_tree_select(event):
             item = delete_tree.selection()[0]
@@ -341,7 +389,8 @@ class Major_edit_window:
         header_frame = tk.Frame(rule_frame)
         header_frame.pack(fill="x")
 
-        tk.Label(header_frame, text=f"{rule_name} - Credit Points: {credit_points}", font=("Arial", 16)).pack(side="left")
+        label = tk.Label(header_frame, font=("Arial", 16))
+        label.pack(side="left")
         tk.Button(header_frame, text="Delete Rule", command=delete_rule).pack(side="right")
         tk.Button(header_frame, text="Add Unit", command=add_unit).pack(side="right")
 
@@ -354,21 +403,46 @@ class Major_edit_window:
         delete_tree = ttk.Treeview(rule_frame, columns=("Actions"), show="headings")
         delete_tree.heading("#1", text="Actions")
 
-        for unit in units:
-            unit_name, unit_credit_points = unit
-            tree.insert("", "end", values=(unit_name, unit_credit_points))
-            delete_tree.insert("", "end", values=("Delete",))
-
         delete_tree.bind("<ButtonRelease-1>", on_delete_tree_select)
 
         tree.pack(side="left", fill="x")
         delete_tree.pack(side="right", fill="x")
 
         rule_frame.pack(fill="x", padx=10, pady=5)
+
+        self.rule_tables[rule_id] = (rule_frame, label, tree, delete_tree)
+        self.update_rule_label(rule_id)
+        self.show_rule_units(rule_id)
+
+    def update_rule_label(self, rule_id):
+        _, label, _, _ = self.rule_tables[rule_id]
+        credit_points, _ = self.rules_view.rules[rule_id]
+        label.configure(text=f"{self.rules_view.rule_number(rule_id)} - Credit Points: {credit_points}")
+
+    def show_rule_units(self, rule_id):
+        # Both trees use the unit codes as item IDs, so a row of one finds its row in the other
+        _, _, tree, delete_tree = self.rule_tables[rule_id]
+        _, units = self.rules_view.rules[rule_id]
+        sync_tree_rows(tree, [(unit_name, (unit_name, unit_credit_points)) for unit_name, unit_credit_points in units])
+        sync_tree_rows(delete_tree, [(unit_name, ("Delete",)) for unit_name, _ in units])
+
+    def remove_rule_table(self, rule_id):
+        rule_frame, _, _, _ = self.rule_tables.pop(rule_id)
+        rule_frame.destroy()
+
+        # The rules after it move up a number
+        for remaining_rule_id in self.rule_tables:
+            self.update_rule_label(remaining_rule_id)
+        self.record_table_positions()
+
+    def record_table_positions(self):
+        # Lay out the rule tables once, then record where each is for drag and drop
         self.handbook_window.update_idletasks()
+        self.tables = [
+            (rule_id, rule_frame.winfo_x(), rule_frame.winfo_y(), rule_frame.winfo_width(), rule_frame.winfo_height())
+            for rule_id, (rule_frame, _, _, _) in self.rule_tables.items()
+        ]
 
-        x, y, width, height = rule_frame.winfo_x(), rule_frame.winfo_y(), rule_frame.winfo_width(), rule_frame.winfo_height()
-        self.tables.append((rule_id, x, y, width, height))
     def start_drag(self, event):
         try:
             selected_item = self.all_units_tree.selection()[0]  # Get selected item
@@ -391,8 +465,17 @@ class Major_edit_window:
         if unit is None:
             return
         print(f"Adding {unit} to {rule_id}")  # Debugging print statement
-        self.handbook_db.link_unit_rule(unit, rule_id)
-        self.refresh_rules_section()
+        if not self.rules_view.add_unit(rule_id, unit, self.unit_index.credit_points.get(unit)):
+            messagebox.showinfo("Add Unit", f"{unit} is already in rule {self.rules_view.rule_number(rule_id)}",
+                                parent=self.handbook_window)
+            return
+        self.show_rule_units(rule_id)
+        self.handbook_changed()
+
+    def handbook_changed(self):
+        if self.on_handbook_changed is not None:
+            self.on_handbook_changed()
+
     def update_major_dropdown(self, selected_year): 
         # Update the Major dropdown based on the selected year
         # Fetch majors for the selected year from the database
@@ -469,16 +552,22 @@ class Major_edit_window:
             year = year_entry.get()
             print(self.major_var_dup.get())
             print(self.year_var_dup.get())
-            if self.major_var_dup.get() == "Select Major" or self.year_var_dup.get() == "Select Year":
-                # Add code here to insert the new major into the database
-                self.handbook_db.create_major(major_name, year)
-            else:
-                print("HIHI")
-                self.handbook_db.duplicate_major(self.major_var_dup.get(), int(self.year_var_dup.get()), major_name, int(year))
-                print(self.handbook_db.fetch_major_rules_verbose(major_name, int(year)))
+            try:
+                if self.major_var_dup.get() == "Select Major" or self.year_var_dup.get() == "Select Year":
+                    # Add code here to insert the new major into the database
+                    self.handbook_db.create_major(major_name, year)
+                else:
+                    print("HIHI")
+                    self.handbook_db.duplicate_major(self.major_var_dup.get(), int(self.year_var_dup.get()), major_name, int(year))
+                    print(self.handbook_db.fetch_major_rules_verbose(major_name, int(year)))
+            except sqlite3.IntegrityError:
+                # Majors are unique by name and year, keep the dialog open to pick another
+                print(f"Major {major_name} already exists in {year}")
+                return
             
             dialog.destroy()
             self.refresh_majors_tab()
+            self.handbook_changed()
 
         tk.Button(dialog, text="OK", command=add_major).grid(
             row=5, columnspan=2)
@@ -491,6 +580,7 @@ class Major_edit_window:
             self.handbook_db.delete_major(major_id)
             self.refresh_majors_tab()
             self.refresh_unit_section()
+            self.handbook_changed()
         else:
             print("No Major selected to delete.")
 
@@ -500,9 +590,12 @@ class Major_edit_window:
         def delete_unit_tree(unit_name):
             print(f"Deleting {unit_name}")
             self.handbook_db.delete_unit(unit_name)
-            self.refresh_unit_section()
+            self.unit_index.remove(unit_name)
+            self.refresh_units()
             self.refresh_major_units()
-            self.refresh_rules_section()
+            for rule_id in self.rules_view.unit_deleted(unit_name):
+                self.show_rule_units(rule_id)
+            self.handbook_changed()
         
         def delete_unit():
             if self.delete_unit_selection != "":
@@ -528,7 +621,7 @@ class Major_edit_window:
 
         # Create a search bar with placeholder
         search_bar = tk.Entry(top_frame, width=40)
-        search_bar.insert(0, "Search for a unit")
+        search_bar.insert(0, SEARCH_PLACEHOLDER)
         search_bar.bind(
             '<FocusIn>', lambda event: self.clear_placeholder(event, search_bar))
         search_bar.bind(
@@ -536,6 +629,7 @@ class Major_edit_window:
         search_bar.bind('<KeyRelease>', self.update_search)
         # Pack to the left side of the frame
         search_bar.pack(side='left', pady=10)
+        self.units_search_bar = search_bar
 
         # Create New Unit Button
         tk.Button(top_frame, text="Create New Unit", command=self.show_add_unit_dialog).pack(
@@ -558,25 +652,21 @@ class Major_edit_window:
         self.populate_units()
 
     def clear_placeholder(self, event, entry):
-        if entry.get() == "Search for a unit":
+        if entry.get() == SEARCH_PLACEHOLDER:
             entry.delete(0, tk.END)
 
     def add_placeholder(self, event, entry):
         if not entry.get():
-            entry.insert(0, "Search for a unit")
+            entry.insert(0, SEARCH_PLACEHOLDER)
 
     def update_search(self, event):
-        search_term = event.widget.get().lower()
-        self.tree.delete(*self.tree.get_children())
-        for unit in self.handbook_db.fetch_all_units_with_credit():
-            unit_name, credit_points = unit
-            if search_term in unit_name.lower():
-                self.tree.insert("", "end", values=(unit_name, credit_points))
-                
+        self.show_units(self.tree, event.widget.get())
 
     def populate_units(self):
-        for unit in self.handbook_db.fetch_all_units_with_credit():
-            self.tree.insert("", "end", values=unit)
+        self.show_units(self.tree, "")
+
+    def refresh_units(self):
+        self.show_units(self.tree, self.units_search_bar.get())
     
     def refresh_unit_section(self, *args):
         # Clear existing rules if any
@@ -604,9 +694,17 @@ class Major_edit_window:
 
         def add_unit():
             unit_name = unit_name_entry.get()
-            credit_points = credit_points_entry.get()
-            self.tree.insert("", "end", values=(unit_name, credit_points))
+            if not unit_name:
+                messagebox.showerror("Add Unit", "Please enter a unit code.", parent=dialog)
+                return
+            try:
+                credit_points = int(credit_points_entry.get())
+            except ValueError:
+                messagebox.showerror("Add Unit", "Please enter a valid integer for credit points.", parent=dialog)
+                return
             self.handbook_db.create_unit(unit_name, credit_points)
+            self.unit_index.add(unit_name, credit_points)
+            self.refresh_units()
             self.refresh_major_units()
             dialog.destroy()
 
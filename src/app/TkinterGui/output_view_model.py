@@ -0,0 +1,177 @@
+"""
+This file holds the rows shown by the output preview: a filtered and sorted view of the output
+DataFrame, kept as row positions so the frame itself is never copied
+"""
+import numpy as np
+import pandas as pd
+
+# Rows the flagged pane shows
+FLAG_COLUMN = 'Missing Information (Y/N)'
+FLAG_VALUE = 'Y'
+
+
+class Column_indexes():
+    def __init__(self, output_df) -> None:
+        """
+        Constructor of the Column_indexes class.
+
+        Indexes of the columns of a DataFrame, each computed the first time it is needed and
+        then shared by every view of the frame.
+
+        Parameters:
+        - output_df (pandas.DataFrame): The frame indexed.
+        """
+        self.output_df = output_df
+        # Column -> (codes, {shown value: code}); codes number the values in sorted order, -1 for missing
+        self.codes = {}
+        # (column, ascending) -> row positions in sorted order, missing values last
+        self.orders = {}
+
+    def column_codes(self, column):
+        """
+        The values of a column as integer codes, numbered in sorted order.
+
+        Returns:
+        tuple: The codes (numpy.ndarray, -1 for missing values) and shown value -> code.
+        """
+        if column not in self.codes:
+            values = self.output_df[column]
+            try:
+                codes, uniques = pd.factorize(values, sort=True)
+            except TypeError:
+                # Values that cannot be compared with each other (e.g. numbers and text) sort as text
+                codes, uniques = pd.factorize(values.where(values.isna(), values.astype(str)), sort=True)
+            self.codes[column] = (codes, {format_value(value): code for code, value in enumerate(uniques)})
+        return self.codes[column]
+
+    def sort_order(self, column, ascending=True):
+        """
+        The row positions of the frame sorted by a column. Ties keep their order in the frame
+        and missing values come last either way.
+
+        Returns:
+        numpy.ndarray: The row positions.
+        """
+        if (column, ascending) not in self.orders:
+            codes, value_codes = self.column_codes(column)
+            value_count = len(value_codes)
+            keys = codes if ascending else (value_count - 1) - codes
+            keys = np.where(codes == -1, value_count, keys)
+            self.orders[(column, ascending)] = np.argsort(keys, kind='stable')
+        return self.orders[(column, ascending)]
+
+    def matching_rows(self, column, value):
+        """
+        Whether each row has a value in a column, compared as shown.
+
+        Returns:
+        numpy.ndarray: A boolean mask of the rows.
+        """
+        codes, value_codes = self.column_codes(column)
+        code = value_codes.get(value)
+        if code is None:
+            return np.zeros(len(codes), dtype=bool)
+        return codes == code
+
+
+class Output_view_model():
+    def __init__(self, output_df, indexes=None, filters=None) -> None:
+        """
+        Constructor of the Output_view_model class.
+
+        Parameters:
+        - output_df (pandas.DataFrame): The processed output.
+        - indexes (Column_indexes, optional): Indexes of output_df to share with other views.
+        - filters (dict, optional): Column -> value the rows shown must have, compared as shown,
+          e.g. {FLAG_COLUMN: FLAG_VALUE} for the flagged rows.
+        """
+        self.output_df = output_df
+        self.indexes = indexes if indexes is not None else Column_indexes(output_df)
+        self.columns = list(output_df.columns)
+        self.filters = dict(filters or {})
+        self.sort_column = None
+        self.ascending = True
+        self.update_rows()
+
+    @property
+    def row_count(self):
+        return len(self.rows)
+
+    def update_rows(self):
+        """
+        Work out the positions of the rows shown, in order, from the filters and sort.
+        """
+        if self.sort_column is None:
+            order = np.arange(len(self.output_df))
+        else:
+            order = self.indexes.sort_order(self.sort_column, self.ascending)
+
+        if self.filters:
+            mask = np.ones(len(self.output_df), dtype=bool)
+            for column, value in self.filters.items():
+                mask &= self.indexes.matching_rows(column, value)
+            order = order[mask[order]]
+
+        self.rows = order
+
+    def set_filter(self, column, value):
+        """
+        Show only the rows with a value in a column, on top of the other filters.
+
+        Parameters:
+        - column (str): The column.
+        - value (str): The value, as shown.
+        """
+        self.filters[column] = value
+        self.update_rows()
+
+    def clear_filters(self, keep=None):
+        """
+        Show the rows again whatever their values, except for the filters kept.
+
+        Parameters:
+        - keep (dict, optional): Filters to keep, as column -> value.
+        """
+        self.filters = dict(keep or {})
+        self.update_rows()
+
+    def sort(self, column, ascending=None):
+        """
+        Sort the rows shown by a column.
+
+        Parameters:
+        - column (str): The column.
+        - ascending (bool, optional): The direction. If not given, sorting by the column the rows
+          are already sorted by reverses it, and sorting by another column is ascending.
+        """
+        if ascending is None:
+            ascending = not self.ascending if column == self.sort_column else True
+        self.sort_column = column
+        self.ascending = ascending
+        self.update_rows()
+
+    def page(self, start, count):
+        """
+        The values of some of the rows shown, formatted for display.
+
+        Parameters:
+        - start (int): The position of the first row, among the rows shown.
+        - count (int): The number of rows.
+
+        Returns:
+        list: A tuple of the shown values of each row.
+        """
+        positions = self.rows[start:start + count]
+        page_df = self.output_df.iloc[positions]
+        return [tuple(format_value(value) for value in row) for row in page_df.itertuples(index=False, name=None)]
+
+
+def format_value(value):
+    """
+    A value as the preview shows it: missing values are blank, whole floats have no decimals.
+    """
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if pd.isna(value):
+        return ""
+    return str(value)
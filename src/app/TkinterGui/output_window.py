@@ -2,12 +2,110 @@
 This file handles the excel preview, filtering, and output statistics
 """
 import tkinter as tk
-from pandastable import Table
+from tkinter import ttk
+
+from app.TkinterGui.output_view_model import FLAG_COLUMN, FLAG_VALUE, Column_indexes, Output_view_model
 
 WIDTH = 1000
-HEIGHT = 400
+HEIGHT = 700
+
+# Rows drawn at a time by the output preview and the flagged pane
+PAGE_SIZE = 20
+FLAGGED_PAGE_SIZE = 8
+COLUMN_WIDTH = 120
+
+# Heading suffix of the column the rows are sorted by
+SORT_MARKERS = {True: " ▲", False: " ▼"}
+
+
+class Paged_table():
+    def __init__(self, frame, view, page_size=PAGE_SIZE) -> None:
+        """
+        Constructor of the Paged_table class.
+
+        A Treeview that only ever holds the rows that are visible. Scrolling changes the values
+        of those rows to the next page of the view, instead of inserting every row of the frame.
+
+        Parameters:
+        - frame (tk.Widget): The frame to draw the table in.
+        - view (Output_view_model): The rows to show.
+        - page_size (int): The number of rows visible at a time.
+        """
+        self.view = view
+        self.page_size = page_size
+        self.start = 0
+
+        self.tree = ttk.Treeview(frame, columns=view.columns, show="headings", height=page_size)
+        for column in view.columns:
+            self.tree.heading(column, text=column, command=lambda column=column: self.sort(column))
+            self.tree.column(column, width=COLUMN_WIDTH, stretch=False)
+
+        self.scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.on_scroll)
+        x_scrollbar = ttk.Scrollbar(frame, orient="horizontal", command=self.tree.xview)
+        self.tree.configure(xscrollcommand=x_scrollbar.set)
+
+        # Windows and macOS send <MouseWheel>, X11 sends buttons 4 and 5
+        self.tree.bind("<MouseWheel>", lambda event: self.scroll_to(self.start - (1 if event.delta > 0 else -1) * 3))
+        self.tree.bind("<Button-4>", lambda event: self.scroll_to(self.start - 3))
+        self.tree.bind("<Button-5>", lambda event: self.scroll_to(self.start + 3))
+
+        self.tree.grid(row=0, column=0, sticky='nsew')
+        self.scrollbar.grid(row=0, column=1, sticky='ns')
+        x_scrollbar.grid(row=1, column=0, sticky='ew')
+        frame.grid_rowconfigure(0, weight=1)
+        frame.grid_columnconfigure(0, weight=1)
+
+        self.render()
+
+    def on_scroll(self, action, amount, unit=None):
+        """
+        Scroll as asked by the scrollbar: ('moveto', fraction) or ('scroll', steps, 'units' or 'pages').
+        """
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * self.view.row_count))
+        elif action == "scroll":
+            step = self.page_size if unit == "pages" else 1
+            self.scroll_to(self.start + int(amount) * step)
+
+    def scroll_to(self, start):
+        start = max(0, min(start, self.view.row_count - self.page_size))
+        if start != self.start:
+            self.start = start
+            self.render()
+
+    def sort(self, column):
+        self.view.sort(column)
+        self.refresh()
+
+    def refresh(self):
+        """
+        Show the view again from its first row, after its filters or sort changed.
+        """
+        self.start = 0
+        self.render()
+
+    def render(self):
+        rows = self.view.page(self.start, self.page_size)
+
+        # Reuse the items already drawn, only adding or removing items when the page is not full
+        items = self.tree.get_children()
+        for item, values in zip(items, rows):
+            self.tree.item(item, values=values)
+        for values in rows[len(items):]:
+            self.tree.insert("", "end", values=values)
+        if len(items) > len(rows):
+            self.tree.delete(*items[len(rows):])
+
+        row_count = self.view.row_count
+        if row_count:
+            self.scrollbar.set(self.start / row_count, (self.start + len(rows)) / row_count)
+        else:
+            self.scrollbar.set(0, 1)
+
+        for column in self.view.columns:
+            marker = SORT_MARKERS[self.view.ascending] if column == self.view.sort_column else ""
+            self.tree.heading(column, text=column + marker)
 
-TABLE_PADDING = 70
 
 class Output_window():
 
@@ -18,25 +116,102 @@ class Output_window():
             output_df (pandas.DataFrame): dataframe of processed file - used for preview
         """
         self.output_df = output_df
+        # Shared by the preview and the flagged pane, so each column is indexed once
+        self.indexes = Column_indexes(output_df)
+        self.root = None
+        self.window_frame = None
 
     def draw_window(self) -> None:
-        root = tk.Tk()
-        root.geometry(f"{WIDTH}x{HEIGHT}")
-        root.title("Output Preview")
-        window_frame = tk.Frame(root)
+        self.root = tk.Tk()
+        self.root.geometry(f"{WIDTH}x{HEIGHT}")
+        self.root.title("Output Preview")
+        self.root.grid_rowconfigure(0, weight=1)
+        self.root.grid_columnconfigure(0, weight=1)
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+        self.draw_contents()
+
+        self.root.mainloop()
+
+    def refresh(self, output_df) -> None:
+        """
+        Show new output, e.g. after a handbook edit was re-evaluated, if the window is still open.
+
+        Args:
+            output_df (pandas.DataFrame): dataframe of processed file - used for preview
+        """
+        self.output_df = output_df
+        self.indexes = Column_indexes(output_df)
+        if self.root is not None:
+            self.draw_contents()
+
+    def close(self) -> None:
+        self.root.destroy()
+        self.root = None
+
+    def draw_contents(self) -> None:
+        if self.window_frame is not None:
+            self.window_frame.destroy()
+        window_frame = tk.Frame(self.root)
+        self.window_frame = window_frame
         window_frame.grid(row=0, column=0, padx=10, pady=10, sticky='nsew')
+        window_frame.grid_columnconfigure(0, weight=1)
+        window_frame.grid_rowconfigure(0, weight=3)
+        window_frame.grid_rowconfigure(1, weight=1)
 
-        # flagged output
-        flagged_window = tk.LabelFrame(window_frame, text="Flagged Rows")
-        flagged_window.grid(row=0, column=0, padx=10, pady=10, sticky='nsew')
-        
         # output frame
         output_window = tk.LabelFrame(window_frame, text="Output Preview")
         output_window.grid(row=0, column=0, padx=10, pady=10, sticky='nsew')
         self.draw_preview(output_window)
 
-        root.mainloop()
+        # flagged output
+        flagged_window = tk.LabelFrame(window_frame, text="Flagged Rows")
+        flagged_window.grid(row=1, column=0, padx=10, pady=10, sticky='nsew')
+        self.draw_flagged(flagged_window)
 
     def draw_preview(self, frame):
-        table = Table(frame, dataframe=self.output_df, width=WIDTH-TABLE_PADDING)
-        table.show()
\ No newline at end of file
+        view = Output_view_model(self.output_df, self.indexes)
+
+        filter_frame = tk.Frame(frame)
+        filter_frame.pack(side="top", fill="x")
+        table_frame = tk.Frame(frame)
+        table_frame.pack(side="top", fill="both", expand=True)
+
+        tk.Label(filter_frame, text="Show rows where").pack(side="left")
+        column_var = tk.StringVar(value=view.columns[0])
+        ttk.Combobox(filter_frame, textvariable=column_var, values=view.columns, state="readonly", width=30).pack(side="left", padx=5)
+        # Values are compared as the table shows them, e.g. a mark of 1.0 is shown and matched as 1
+        tk.Label(filter_frame, text="is exactly (as shown, e.g. 1 for 1.0)").pack(side="left")
+        value_entry = tk.Entry(filter_frame, width=20)
+        value_entry.pack(side="left", padx=5)
+        row_count_label = tk.Label(filter_frame)
+
+        table = Paged_table(table_frame, view)
+
+        def show_row_count():
+            row_count_label.config(text=f"{view.row_count} of {len(self.output_df)} rows")
+
+        def apply_filter(event=None):
+            view.set_filter(column_var.get(), value_entry.get())
+            table.refresh()
+            show_row_count()
+
+        def clear_filters():
+            view.clear_filters()
+            table.refresh()
+            show_row_count()
+
+        value_entry.bind("<Return>", apply_filter)
+        tk.Button(filter_frame, text="Filter", command=apply_filter).pack(side="left")
+        tk.Button(filter_frame, text="Clear", command=clear_filters).pack(side="left", padx=5)
+        row_count_label.pack(side="right")
+        show_row_count()
+
+    def draw_flagged(self, frame):
+        if FLAG_COLUMN not in self.output_df.columns:
+            tk.Label(frame, text=f"No '{FLAG_COLUMN}' column to flag rows by").pack()
+            return
+
+        view = Output_view_model(self.output_df, self.indexes, filters={FLAG_COLUMN: FLAG_VALUE})
+        table_frame = tk.Frame(frame)
+        table_frame.pack(fill="both", expand=True)
+        Paged_table(table_frame, view, page_size=FLAGGED_PAGE_SIZE)
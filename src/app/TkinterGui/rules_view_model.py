@@ -0,0 +1,118 @@
+"""
+This file keeps the rules of the major shown in the handbook editor in memory, applying each
+edit to the database and to the copy shown, so only the rule tables an edit touches are redrawn
+"""
+
+
+class Rules_view_model():
+    def __init__(self, handbook_db) -> None:
+        """
+        Constructor of the Rules_view_model class.
+
+        Parameters:
+        - handbook_db (Sqlite_handbookDB): The handbook database edits are applied to.
+        """
+        self.handbook_db = handbook_db
+        self.major = None
+        self.year = None
+        # Rule ID -> (credit points, [(unit code, unit credit points)]), in display order
+        self.rules = {}
+
+    def load(self, major, year):
+        """
+        Load the rules of a major from the database.
+
+        Parameters:
+        - major (str): The name of the major.
+        - year (int): The year of the major.
+        """
+        self.major = major
+        self.year = year
+        self.rules = {
+            rule_id: (credit_points, list(units))
+            for rule_id, credit_points, units in self.handbook_db.fetch_major_rules_verbose(major, year)
+        }
+
+    def rule_number(self, rule_id):
+        """
+        The number a rule is shown with, counting from 1 in display order.
+        """
+        return list(self.rules).index(rule_id) + 1
+
+    def add_rule(self, credit_points):
+        """
+        Create a rule and link it to the major.
+
+        Parameters:
+        - credit_points (int): The credit points of the rule.
+
+        Returns:
+        int: The ID of the new rule.
+        """
+        major_id = self.handbook_db.get_major_id(self.major, self.year)
+
+        # Add the rule and link it to the major, both or neither
+        with self.handbook_db.transaction():
+            rule_id = self.handbook_db.create_rule(credit_points).lastrowid
+            self.handbook_db.link_major_rule(major_id, rule_id)
+
+        self.rules[rule_id] = (credit_points, [])
+        return rule_id
+
+    def delete_rule(self, rule_id):
+        """
+        Delete a rule.
+
+        Parameters:
+        - rule_id (int): The ID of the rule.
+        """
+        self.handbook_db.delete_rule(rule_id)
+        del self.rules[rule_id]
+
+    def add_unit(self, rule_id, unit_code, unit_credit_points):
+        """
+        Link a unit to a rule. A unit already in the rule is left where it is.
+
+        Parameters:
+        - rule_id (int): The ID of the rule.
+        - unit_code (str): The code of the unit.
+        - unit_credit_points (int): The credit points of the unit, as shown.
+
+        Returns:
+        bool: Whether the unit was added.
+        """
+        units = self.rules[rule_id][1]
+        if any(code == unit_code for code, _ in units):
+            return False
+        self.handbook_db.link_unit_rule(unit_code, rule_id)
+        units.append((unit_code, unit_credit_points))
+        return True
+
+    def remove_unit(self, rule_id, unit_code):
+        """
+        Unlink a unit from a rule.
+
+        Parameters:
+        - rule_id (int): The ID of the rule.
+        - unit_code (str): The code of the unit.
+        """
+        self.handbook_db.unlink_unit_rule(unit_code, rule_id)
+        credit_points, units = self.rules[rule_id]
+        self.rules[rule_id] = (credit_points, [unit for unit in units if unit[0] != unit_code])
+
+    def unit_deleted(self, unit_code):
+        """
+        Drop a unit deleted from the handbook from the rules shown. The database is not changed.
+
+        Parameters:
+        - unit_code (str): The code of the deleted unit.
+
+        Returns:
+        list: The IDs of the rules the unit was in.
+        """
+        changed = []
+        for rule_id, (credit_points, units) in self.rules.items():
+            if any(code == unit_code for code, _ in units):
+                self.rules[rule_id] = (credit_points, [unit for unit in units if unit[0] != unit_code])
+                changed.append(rule_id)
+        return changed
@@ -0,0 +1,102 @@
+"""
+Command line entry point, run from the src directory with:
+    python -m app process INPUT OUTPUT
+
+Only the standard library is imported up front. The processing modules (pandas, openpyxl and the
+handbook layer) are imported when a command runs, and Tk is never imported.
+"""
+import argparse
+import os
+import sys
+
+DEFAULT_HANDBOOK_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "handbook.db")
+
+# The values of file_backends.FILE_FORMATS, listed here so building the parser does not import pandas
+FILE_FORMATS = ["excel", "csv", "parquet", "feather"]
+
+
+def process(args):
+    """
+    Process one input file into one output file.
+
+    Parameters:
+    - args (argparse.Namespace): The parsed command line arguments.
+
+    Returns:
+    int: The exit code.
+    """
+    from app.databases.sqlite_handbookDB import Sqlite_handbookDB
+    from app.logic.marks_processor import Marks_processor
+
+    if not os.path.isfile(args.handbook):
+        print(f"Handbook database not found: {args.handbook}", file=sys.stderr)
+        return 1
+
+    ingest_cache = None
+    if args.cache:
+        from app.logic.ingest_cache import Ingest_cache
+        try:
+            ingest_cache = Ingest_cache()
+        except OSError as e:
+            print(f"Cannot use the ingest cache: {e}", file=sys.stderr)
+            return 1
+
+    instrumentation = None
+    if args.report or args.profile:
+        from app.logic.instrumentation import Instrumentation
+        instrumentation = Instrumentation(track_memory=not args.no_memory, profiler=args.profiler if args.profile else None,
+                                          report_path=args.report, profile_path=args.profile)
+
+    handbook_db = Sqlite_handbookDB(args.handbook, read_only=True)
+    try:
+        marks_processor = Marks_processor(handbookDB=handbook_db, ingest_cache=ingest_cache)
+        output_df = marks_processor.process_file(
+            args.input, args.output, chunksize=args.chunksize, input_format=args.input_format,
+            output_format=args.output_format, workers=args.workers, instrumentation=instrumentation
+        )
+    finally:
+        handbook_db.conn.close()
+
+    print(f"Processed {output_df['Person_ID'].nunique()} students into {args.output}")
+    if instrumentation is not None:
+        for stage in instrumentation.report['stages']:
+            print(f"  {stage['stage']:<12} {stage['seconds']:>9.3f}s {stage['rows']:>10} rows")
+            if stage['note']:
+                print(f"    {stage['note']}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m app", description="BE(Hons) marks processor.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    process_parser = commands.add_parser("process", help="process a marks input file")
+    process_parser.add_argument("input", help="input Excel, CSV, Parquet or Feather file")
+    process_parser.add_argument("output", help="output Excel, CSV, Parquet or Feather file")
+    process_parser.add_argument("--handbook", default=DEFAULT_HANDBOOK_PATH, help="handbook database")
+    process_parser.add_argument("--chunksize", type=int, help="stream the input in chunks of this many rows")
+    process_parser.add_argument("--workers", type=int, help="process the students in this many worker processes")
+    process_parser.add_argument("--input-format", choices=FILE_FORMATS, help="input file format (default: from extension)")
+    process_parser.add_argument("--output-format", choices=FILE_FORMATS, help="output file format (default: from extension)")
+    process_parser.add_argument("--cache", action="store_true", help="keep the parsed input in the ingest cache")
+    process_parser.add_argument("--report", help="write a JSON report of the time, rows and memory of each stage")
+    process_parser.add_argument("--no-memory", action="store_true", help="leave peak memory (tracemalloc) out of the report")
+    process_parser.add_argument("--profile", help="write a profile of the run to this file")
+    process_parser.add_argument("--profiler", choices=["cprofile", "pyinstrument"], default="cprofile",
+                                help="profiler used with --profile (default: cprofile)")
+    process_parser.set_defaults(run=process)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.run(args)
+    except (OSError, ValueError, ImportError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""
+This file brings the schema of a handbook database up to date when it is opened
+
+The tables are created by the shipped handbook.db; each migration adds to them and the schema
+version reached is recorded in PRAGMA user_version, so a migration only ever runs once per file.
+The shipped handbook.db is kept at SCHEMA_VERSION, so opening the app does not change it; commit the
+migrated file along with any new migration.
+"""
+import sqlite3
+
+# Each migration is a list of statements, run in order. Migration n (counting from 1) takes the
+# schema from version n - 1 to version n.
+MIGRATIONS = [
+    [
+        # A major is looked up by name and year (fetch_major_rules, get_major_id, ...) and there is
+        # only ever one major of a name in a year
+        "CREATE UNIQUE INDEX IF NOT EXISTS Major_name_year ON Major(name, year)",
+        # Majors of a year, for the year and major drop downs
+        "CREATE INDEX IF NOT EXISTS Major_year_name ON Major(year, name)",
+        # The primary keys cover major -> rules and unit -> rules; these cover the other direction
+        "CREATE INDEX IF NOT EXISTS MajorRules_rule_major ON MajorRules(rule_id, major_id)",
+        "CREATE INDEX IF NOT EXISTS RuleUnits_rule_unit ON RuleUnits(rule_id, unit_code)",
+    ],
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def schema_version(conn):
+    """
+    The schema version recorded in a handbook database.
+
+    Parameters:
+    - conn (sqlite3.Connection): Connection to the database.
+
+    Returns:
+    int: The version, 0 for a database that has never been migrated.
+    """
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """
+    Run the migrations a handbook database has not had yet, each in a transaction of its own.
+
+    If the database has duplicate majors (same name and year), the unique index on majors cannot
+    be created; a plain index is created instead and a warning printed, so the database still opens.
+
+    Parameters:
+    - conn (sqlite3.Connection): Connection to the database.
+
+    Returns:
+    int: The schema version of the database afterwards.
+    """
+    version = schema_version(conn)
+    for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+        # Explicit, as sqlite3 only opens a transaction by itself before INSERT, UPDATE and DELETE
+        conn.execute("BEGIN")
+        try:
+            for statement in statements:
+                try:
+                    conn.execute(statement)
+                except sqlite3.IntegrityError:
+                    print(f"\033[91mWarning: the handbook has duplicate entries, "
+                          f"so this index is not unique: {statement}\033[0m")
+                    conn.execute(statement.replace("UNIQUE INDEX", "INDEX"))
+            # PRAGMA does not take parameters; number is always an int
+            conn.execute(f"PRAGMA user_version = {int(number)}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    return max(version, SCHEMA_VERSION)
@@ -0,0 +1,131 @@
+"""
+This file holds an in-memory copy of the handbook used while processing marks
+"""
+import pandas as pd
+
+
+class Handbook_snapshot():
+    def __init__(self, major_ids, major_rules, major_units) -> None:
+        """
+        Constructor of the Handbook_snapshot class.
+
+        Parameters:
+        - major_ids (dict): Major name -> list of major IDs (one per year).
+        - major_rules (dict): Major ID -> list of (rule_id, credit_points, [(unit_code, credit_points)]).
+        - major_units (dict): Major name -> set of unit codes that are part of the major.
+        """
+        self.major_ids = major_ids
+        self.major_rules = major_rules
+        self.major_units = major_units
+
+        # (major name, unit code) index used for vectorized membership checks
+        pairs = [(major, unit_code) for major, unit_codes in major_units.items() for unit_code in unit_codes]
+        self.major_unit_index = pd.MultiIndex.from_arrays(
+            [[pair[0] for pair in pairs], [pair[1] for pair in pairs]],
+            names=['Major_Deg', 'Unit_Code']
+        )
+
+    @classmethod
+    def from_db(cls, handbook_db):
+        """
+        Load a snapshot of the handbook from the database.
+
+        Parameters:
+        - handbook_db (Sqlite_handbookDB): The handbook database to load from.
+
+        Returns:
+        Handbook_snapshot: The loaded snapshot.
+        """
+        major_ids = {}
+        for major, major_id in handbook_db.fetch_all_major_ids():
+            major_ids.setdefault(major, []).append(major_id)
+
+        major_rules = handbook_db.fetch_all_major_rules_verbose()
+
+        major_units = {}
+        for major, unit_code in handbook_db.fetch_all_major_units():
+            major_units.setdefault(major, set()).add(unit_code)
+
+        return cls(major_ids, major_rules, major_units)
+
+    def get_major_ids(self, major):
+        """
+        Fetch the IDs of all majors with a specified name.
+
+        Parameters:
+        - major (str): The name of the major.
+
+        Returns:
+        list: A list of major IDs associated with the given name.
+        """
+        return self.major_ids.get(major, [])
+
+    def fetch_major_rules_verbose_by_id(self, major_id):
+        """
+        Fetch the rules for a major using its ID, including unit codes and credit points for each unit.
+
+        Parameters:
+        - major_id (int): The ID of the major.
+
+        Returns:
+        list: A list containing rule details along with unit codes and credit points for each unit.
+        """
+        return self.major_rules.get(major_id, [])
+
+    def unit_in_major(self, unit_code, major):
+        """
+        Determine whether a unit is part of a major.
+
+        Parameters:
+        - unit_code (str): The code of the unit.
+        - major (str): The name of the major.
+
+        Returns:
+        bool: True if the unit is part of the major, False otherwise.
+        """
+        return unit_code in self.major_units.get(major, ())
+
+    def units_in_majors(self, unit_codes, majors):
+        """
+        Determine, row by row, whether each unit is part of the matching major.
+
+        Vectorized equivalent of calling unit_in_major on every row.
+
+        Parameters:
+        - unit_codes (pd.Series): Unit codes.
+        - majors (pd.Series): Major names, aligned with unit_codes.
+
+        Returns:
+        np.ndarray: Boolean mask, True where the unit is part of the major.
+        """
+        rows = pd.MultiIndex.from_arrays([majors, unit_codes], names=['Major_Deg', 'Unit_Code'])
+        return rows.isin(self.major_unit_index)
+
+    def major_definition(self, major):
+        """
+        Collect everything processing reads about a major, in a form that can be compared.
+
+        Parameters:
+        - major (str): The name of the major.
+
+        Returns:
+        tuple: The major's IDs with their sorted rules, and the set of its unit codes.
+        """
+        rules = [
+            (major_id, sorted((rule_id, value, tuple(sorted(units))) for rule_id, value, units in self.fetch_major_rules_verbose_by_id(major_id)))
+            for major_id in self.get_major_ids(major)
+        ]
+        return rules, self.major_units.get(major, set())
+
+    def changed_majors(self, other):
+        """
+        Find the majors whose rules or units differ between this snapshot and another one.
+
+        Parameters:
+        - other (Handbook_snapshot): The snapshot to compare with.
+
+        Returns:
+        set: The names of the changed majors, including majors only in one of the snapshots.
+        """
+        majors = set(self.major_ids) | set(self.major_units) | set(other.major_ids) | set(other.major_units)
+        return {major for major in majors if self.major_definition(major) != other.major_definition(major)}
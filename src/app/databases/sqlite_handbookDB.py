@@ -1,17 +1,133 @@
+import os
 import sqlite3
+import time
+from contextlib import contextmanager
+from urllib.request import pathname2url
+
+from app.databases.handbook_schema import migrate, schema_version
+
+# Settings of every connection to a handbook database
+CONNECTION_PRAGMAS = {
+    'cache_size': -16000,       # 16 MB page cache (negative values are in KiB)
+    'mmap_size': 64 * 1024 ** 2,  # read the file through a 64 MB memory map
+    'temp_store': 'MEMORY',     # GROUP BY / DISTINCT temp b-trees stay in memory
+}
+# Journal mode of read-write connections that ask for it. WAL lets the editor write while the file
+# is read, but it is kept in the database file itself, and a file in WAL mode needs -wal and -shm
+# files next to it even to be read, so it is off by default (e.g. for the shipped handbook).
+JOURNAL_MODE = 'WAL'
+# Journal mode of other read-write connections, SQLite's default. Setting it also checkpoints a
+# file left in WAL mode and takes it out of it.
+ROLLBACK_JOURNAL_MODE = 'DELETE'
+# Prepared statements kept per connection; every handbook query is a fixed string
+CACHED_STATEMENTS = 256
+
+
+class Timed_cursor(sqlite3.Cursor):
+    """
+    Cursor that adds the statements it runs, and the time spent running and fetching them,
+    to the query statistics of its Timed_connection.
+    """
+    def timed(self, method, *args, counted=False):
+        start_time = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            if counted:
+                self.connection.query_count += 1
+            self.connection.query_seconds += time.perf_counter() - start_time
+
+    def execute(self, *args):
+        return self.timed(super().execute, *args, counted=True)
+
+    def executemany(self, *args):
+        return self.timed(super().executemany, *args, counted=True)
+
+    def fetchone(self):
+        return self.timed(super().fetchone)
+
+    def fetchmany(self, *args):
+        return self.timed(super().fetchmany, *args)
+
+    def fetchall(self):
+        return self.timed(super().fetchall)
+
+
+class Timed_connection(sqlite3.Connection):
+    """
+    Connection whose cursors keep count of the statements run and the time spent in them.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.query_count = 0
+        self.query_seconds = 0.0
+
+    def cursor(self, factory=Timed_cursor):
+        return super().cursor(factory)
+
 
 class Sqlite_handbookDB():
-    def __init__(self, handbook_db_path) -> None:
+    def __init__(self, handbook_db_path, read_only=False, pragmas=None, wal=False) -> None:
         """
         Constructor of the Sqlite_handbookDB class.
         
         Connects to the SQLite database located at `handbook_db_path` 
-        and initializes the connection object.
+        and initializes the connection object, then brings its schema
+        (indexes and constraints) up to date. A database file that cannot
+        be written is opened without bringing its schema up to date.
         
         Parameters:
         - handbook_db_path (str): Path to the SQLite database file.
+        - read_only (bool): Open the database with a mode=ro URI, for consumers that only
+          read the handbook (e.g. processing from the command line). Its schema is not migrated.
+          The file is opened as immutable, so no lock or -wal/-shm file is needed and it can be
+          read from a read-only directory; it must not be written while it is open.
+        - pragmas (dict, optional): PRAGMA name -> value set on the connection,
+          CONNECTION_PRAGMAS if not given.
+        - wal (bool): Put a read-write database in WAL mode (see JOURNAL_MODE) rather than
+          ROLLBACK_JOURNAL_MODE.
+        """
+        self.read_only = read_only
+        if read_only:
+            uri = "file:" + pathname2url(os.path.abspath(handbook_db_path)) + "?mode=ro&immutable=1"
+            self.conn = sqlite3.connect(uri, uri=True, factory=Timed_connection, cached_statements=CACHED_STATEMENTS)
+        else:
+            self.conn = sqlite3.connect(handbook_db_path, factory=Timed_connection, cached_statements=CACHED_STATEMENTS)
+
+        self.configure_connection(CONNECTION_PRAGMAS if pragmas is None else pragmas, wal)
+        if read_only:
+            self.schema_version = schema_version(self.conn)
+        else:
+            try:
+                self.schema_version = migrate(self.conn)
+            except sqlite3.OperationalError as e:
+                if "readonly" not in str(e):
+                    raise
+                print(f"\033[91mWarning: the handbook cannot be written, so its schema is not brought up to date: {e}\033[0m")
+                self.schema_version = schema_version(self.conn)
+
+    def configure_connection(self, pragmas, wal=False):
+        """
+        Set the PRAGMAs of the connection, and the journal mode if it can write.
+
+        Parameters:
+        - pragmas (dict): PRAGMA name -> value. An empty dict leaves SQLite's defaults.
+        - wal (bool): Use JOURNAL_MODE rather than ROLLBACK_JOURNAL_MODE.
+        """
+        # PRAGMA does not take parameters; the names and values are the constants above
+        for name, value in pragmas.items():
+            self.conn.execute(f"PRAGMA {name} = {value}")
+        if not self.read_only:
+            self.conn.execute(f"PRAGMA journal_mode = {JOURNAL_MODE if wal else ROLLBACK_JOURNAL_MODE}")
+
+    def query_stats(self):
         """
-        self.conn = sqlite3.connect(handbook_db_path)
+        Number of statements run through the handbook's cursors, and the time spent running and fetching them.
+
+        Returns:
+        dict: 'queries' (int) and 'seconds' (float) since the database was opened.
+        """
+        return {'queries': self.conn.query_count, 'seconds': self.conn.query_seconds}
 
     def db_commit(self):
         """
@@ -26,34 +142,62 @@ class Sqlite_handbookDB():
         except Exception as e:
             print(f"Error committing changes: {e}")
 
+    @contextmanager
+    def transaction(self):
+        """
+        Run a group of writes as a whole: if any of them fails, none of them is kept.
+
+        The writes run in a savepoint, so transactions can be nested, and edits made
+        before it that are not committed yet stay pending (the editor commits when it closes).
+        Do not call methods that commit (e.g. create_rule_and_get_id) inside it.
+
+        Yields:
+            sqlite3.Cursor: A cursor to run the writes with.
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("SAVEPOINT handbook_write")
+        try:
+            yield cursor
+        except BaseException:
+            cursor.execute("ROLLBACK TO handbook_write")
+            cursor.execute("RELEASE handbook_write")
+            raise
+        cursor.execute("RELEASE handbook_write")
+
     def duplicate_major(self, src_major, src_yr, nw_major, nw_yr):
         """
         Duplicates a major from a specified year to a new major and year.
+
+        Runs as one transaction, copying the units of each rule with a single INSERT ... SELECT.
         
         Parameters:
         - src_major (str): Name of the source major.
         - src_yr (int): Year of the source major.
         - nw_major (str): Name of the new major.
         - nw_yr (int): Year of the new major.
+        
+        Returns:
+        - nw_major_id (int): ID of the new major.
         """
-        cursor_major = self.create_major(nw_major, nw_yr)
-        nw_major_id = cursor_major.lastrowid
-        cursor_major.close()
-
         # Get a list of all rules for the current major
         rules_to_create = self.fetch_major_rules(src_major, src_yr)
 
-        # Iterate through every rule that needs to be created
-        for rule in rules_to_create:
-            cursor_rule = self.create_rule(rule[1])
-            new_rule_id = cursor_rule.lastrowid
-            cursor_rule.close()
-            self.link_major_rule(nw_major_id, new_rule_id)
+        with self.transaction() as cursor:
+            cursor.execute("INSERT INTO Major(name, year) VALUES(?,?)", (nw_major, nw_yr))
+            nw_major_id = cursor.lastrowid
+
+            # Iterate through every rule that needs to be created
+            for rule_id, rule_value in rules_to_create:
+                cursor.execute("INSERT INTO Rules(value) VALUES(?)", (rule_value,))
+                new_rule_id = cursor.lastrowid
+                cursor.execute(
+                    "INSERT INTO MajorRules(major_id, rule_id) VALUES(?,?)", (nw_major_id, new_rule_id))
+                cursor.execute("""
+                    INSERT INTO RuleUnits(unit_code, rule_id)
+                    SELECT unit_code, ? FROM RuleUnits WHERE rule_id = ?
+                    """, (new_rule_id, rule_id))
 
-            # Get all units to link
-            units_to_link = self.fetch_unit_rules(rule[0])
-            for unit in units_to_link:
-                self.link_unit_rule(unit, new_rule_id)
+        return nw_major_id
 
     def select_all_rules(self, major, yr):
         """
@@ -217,6 +361,50 @@ class Sqlite_handbookDB():
         cursor.execute(
             "INSERT INTO RuleUnits(unit_code, rule_id) VALUES(?, ?)", (unit_code, rule_id))
 
+    def link_units_to_rule(self, unit_codes, rule_id):
+        """
+        Links many units to a rule in the database, in one transaction.
+
+        Parameters:
+            unit_codes (list): The codes of the units to be linked.
+            rule_id (int): The ID of the rule to which the units will be linked.
+
+        If any link fails (e.g. a unit is already linked), none of them is made.
+        """
+        with self.transaction() as cursor:
+            cursor.executemany(
+                "INSERT INTO RuleUnits(unit_code, rule_id) VALUES(?, ?)", [(unit_code, rule_id) for unit_code in unit_codes])
+
+    def import_units(self, units):
+        """
+        Creates many units in the database, in one transaction.
+
+        Units that already exist are left as they are, with a warning if their credit points
+        differ, as create_unit does.
+
+        Parameters:
+            units (list): A list of tuples containing the unit code and credit points.
+
+        Returns:
+            int: The number of units created.
+        """
+        known_units = dict(self.fetch_all_units_with_credit())
+
+        new_units = []
+        for unit_code, credit_pts in units:
+            if unit_code in known_units:
+                if known_units[unit_code] != credit_pts:
+                    print(
+                        f"\033[91mWarning: Unit {unit_code} already exists in the database with different credit points\033[0m")
+                continue
+            known_units[unit_code] = credit_pts
+            new_units.append((unit_code, credit_pts))
+
+        with self.transaction() as cursor:
+            cursor.executemany("INSERT INTO Units(unit_code, credit_pts) VALUES(?, ?)", new_units)
+
+        return len(new_units)
+
     def create_major(self, major_name, major_year):
         """
         Creates a new major in the database.
@@ -274,6 +462,20 @@ class Sqlite_handbookDB():
         cursor.execute(
             "INSERT INTO MajorRules(major_id, rule_id) VALUES(?,?)", (major_id, rule_id))
 
+    def link_rules_to_major(self, major_id, rule_ids):
+        """
+        Links many rules to a major in the database, in one transaction.
+
+        Parameters:
+            major_id (int): The ID of the major to be linked.
+            rule_ids (list): The IDs of the rules to which the major will be linked.
+
+        If any link fails, none of them is made.
+        """
+        with self.transaction() as cursor:
+            cursor.executemany(
+                "INSERT INTO MajorRules(major_id, rule_id) VALUES(?,?)", [(major_id, rule_id) for rule_id in rule_ids])
+
     def unlink_unit_rule(self, unit_code, rule_id):
         """
         Unlinks a unit from a rule in the database.
@@ -430,6 +632,43 @@ class Sqlite_handbookDB():
 
         return results
     
+    def fetch_all_major_rules_verbose(self):
+        """
+        Fetch the rules for every major in a single query, including unit codes and credit points for each unit.
+
+        Bulk counterpart of fetch_major_rules_verbose_by_id.
+
+        Returns:
+            dict: Major ID -> list containing rule details along with unit codes and credit points for each unit.
+        """
+
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT m.major_id, r.*, GROUP_CONCAT(u.UNIT_CODE), GROUP_CONCAT(u.CREDIT_PTS)
+            FROM Rules r
+            INNER JOIN MajorRules rm ON r.rule_id = rm.rule_id
+            INNER JOIN RuleUnits ur ON r.rule_id = ur.rule_id
+            INNER JOIN Units u ON ur.unit_code = u.unit_code
+            INNER JOIN Major m ON rm.major_id = m.major_ID
+            GROUP BY m.major_id, r.rule_id
+            ORDER BY m.major_id, r.rule_id
+            """)
+        rows = cursor.fetchall()
+        results = {}
+        for row in rows:
+            major_id = row[0]
+            rule_id = row[1]
+            credit_points = row[2]
+            unit_names = row[3].split(',')
+            unit_credits = list(map(int, row[4].split(',')))
+
+            # Zip unit_names and unit_credits into a list of tuples
+            unit_list = list(zip(unit_names, unit_credits))
+
+            results.setdefault(major_id, []).append((rule_id, credit_points, unit_list))
+
+        return results
+
     def fetch_rule_major(self, rule_id):
         """
         Fetch the name and year of a major associated with a given rule ID.
@@ -674,6 +913,30 @@ class Sqlite_handbookDB():
         rows = cursor.fetchall()
         return len(rows) > 0
 
+    def fetch_all_major_units(self):
+        """
+        Fetch every (major name, unit code) pair where the unit is part of the major.
+
+        Bulk counterpart of unit_in_major, using the same joins.
+
+        Returns:
+            list: A list of tuples containing the major name and unit code.
+        """
+
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT DISTINCT M.name, U.unit_code
+            FROM Units U
+            JOIN RuleUnits RU ON U.unit_code = RU.unit_code
+            JOIN Rules R ON RU.rule_id = R.rule_id
+            JOIN MajorRules MR ON R.rule_id = MR.rule_id
+            JOIN Major M ON MR.major_id = M.major_id
+        """)
+
+        rows = cursor.fetchall()
+        results = [row for row in rows]
+        return results
+
     def create_rule_with_units(self, units, credit_points):
         """
         Create a new rule with specified credit points, and assigns units to this rule.
@@ -687,10 +950,11 @@ class Sqlite_handbookDB():
         """
 
         # 1. creates a rule with the right credit_points
-        # 2. then for each unit, assigns the unit to the rule
-        rule_id = self.create_rule_and_get_id(credit_points)
-        for unit in units:
-            self.link_unit_rule(unit, rule_id)
+        # 2. then assigns the units to the rule, all or nothing
+        with self.transaction() as cursor:
+            cursor.execute("INSERT INTO Rules(value) VALUES(?)", (credit_points,))
+            rule_id = cursor.lastrowid
+            self.link_units_to_rule(units, rule_id)
 
         return rule_id
 
@@ -705,10 +969,11 @@ class Sqlite_handbookDB():
         """
 
         # 1. creates a major with the right year
-        # 2. then for each rule, assigns the rule to the major
-        major_id = self.create_major_and_get_id(major, year)
-        for rule in rules:
-            self.link_major_rule(major_id, rule)
+        # 2. then assigns the rules to the major, all or nothing
+        with self.transaction() as cursor:
+            cursor.execute("INSERT INTO Major(name, year) VALUES(?,?)", (major, year))
+            major_id = cursor.lastrowid
+            self.link_rules_to_major(major_id, rules)
 
     # Given a major name, returns all the major ids
     def get_major_ids(self, major):
@@ -728,3 +993,20 @@ class Sqlite_handbookDB():
         rows = cursor.fetchall()
         results = [row[0] for row in rows]
         return results
+
+    def fetch_all_major_ids(self):
+        """
+        Fetch the names and IDs of all majors.
+
+        Bulk counterpart of get_major_ids.
+
+        Returns:
+            list: A list of tuples containing the name and ID for all majors.
+        """
+
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT name, major_id from Major")
+
+        rows = cursor.fetchall()
+        results = [row for row in rows]
+        return results
@@ -0,0 +1,104 @@
+"""
+This file holds an in-memory, sorted index of the handbook's units, searched as the user types
+"""
+from bisect import bisect_left, insort
+
+# Sorts after any character a unit code can contain, to find the end of a range of prefixed codes
+PREFIX_END = '\U0010ffff'
+
+
+class Unit_index():
+    def __init__(self, units) -> None:
+        """
+        Constructor of the Unit_index class.
+
+        Parameters:
+        - units (list): A list of tuples containing the unit code and credit points.
+        """
+        self.credit_points = dict(units)
+        # (lower case unit code, unit code) in order, so searches ignore case
+        self.entries = sorted((unit_code.lower(), unit_code) for unit_code in self.credit_points)
+        # The last search term and its results, narrowed down when the term is typed further
+        self.last_search = None
+
+    @classmethod
+    def from_db(cls, handbook_db):
+        """
+        Load the index of every unit from the database.
+
+        Parameters:
+        - handbook_db (Sqlite_handbookDB): The handbook database to load from.
+
+        Returns:
+        Unit_index: The loaded index.
+        """
+        return cls(handbook_db.fetch_all_units_with_credit())
+
+    def add(self, unit_code, credit_points):
+        """
+        Add a unit to the index. A unit that is already in it is left as it is, as create_unit does.
+
+        Parameters:
+        - unit_code (str): The code of the unit.
+        - credit_points (int): The credit points of the unit.
+        """
+        if unit_code in self.credit_points:
+            return
+        self.credit_points[unit_code] = credit_points
+        insort(self.entries, (unit_code.lower(), unit_code))
+        self.last_search = None
+
+    def remove(self, unit_code):
+        """
+        Remove a unit from the index, if it is in it.
+
+        Parameters:
+        - unit_code (str): The code of the unit.
+        """
+        if unit_code not in self.credit_points:
+            return
+        del self.credit_points[unit_code]
+        del self.entries[bisect_left(self.entries, (unit_code.lower(), unit_code))]
+        self.last_search = None
+
+    def prefix_search(self, prefix):
+        """
+        Find the units whose code starts with a prefix, ignoring case.
+
+        Parameters:
+        - prefix (str): The prefix.
+
+        Returns:
+        list: The unit codes, in order.
+        """
+        prefix = prefix.lower()
+        start = bisect_left(self.entries, (prefix,))
+        end = bisect_left(self.entries, (prefix + PREFIX_END,))
+        return [unit_code for _, unit_code in self.entries[start:end]]
+
+    def search(self, term):
+        """
+        Find the units whose code contains a search term, ignoring case.
+
+        Codes starting with the term come first, then the other matches, each in order. When
+        the term extends the previous one (the user typed another character), only the previous
+        results are searched.
+
+        Parameters:
+        - term (str): The search term. An empty term matches every unit.
+
+        Returns:
+        list: The unit codes.
+        """
+        term = term.lower()
+        if self.last_search is not None and term.startswith(self.last_search[0]):
+            candidates = self.last_search[1]
+        else:
+            candidates = self.entries
+
+        prefixed = self.prefix_search(term)
+        contained = [entry for entry in candidates if term in entry[0]]
+        results = prefixed + [unit_code for lower_code, unit_code in contained if not lower_code.startswith(term)]
+
+        self.last_search = (term, contained)
+        return results
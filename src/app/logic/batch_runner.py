@@ -0,0 +1,176 @@
+"""
+This file processes many marks input files in one run, without the GUI
+"""
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from app.databases.handbook_snapshot import Handbook_snapshot
+from app.logic import file_backends
+from app.logic.marks_processor import Marks_processor
+
+# Appended to the input file name to name its output file
+OUTPUT_SUFFIX = "_processed"
+
+SUMMARY_FILE_NAME = "batch_summary.csv"
+HONOURS_CLASSES = ['H1', 'H2A', 'H2B', 'H3']
+
+
+def find_input_files(inputs):
+    """
+    Expand input directories and glob patterns into a list of input files.
+
+    Parameters:
+    - inputs (list): Input files, directories (every supported file directly inside) or glob patterns.
+
+    Returns:
+    list: The sorted, de-duplicated paths of the input files.
+    """
+    input_files = []
+    for input_path in inputs:
+        if os.path.isdir(input_path):
+            candidates = [os.path.join(input_path, file_name) for file_name in os.listdir(input_path)]
+        else:
+            candidates = glob.glob(input_path) or [input_path]
+
+        for candidate in candidates:
+            extension = os.path.splitext(candidate)[1].lower()
+            # Skip Excel lock files (~$name.xlsx) and files of other types found in directories
+            if os.path.basename(candidate).startswith('~$'):
+                continue
+            if os.path.isdir(input_path) and extension not in file_backends.FILE_FORMATS:
+                continue
+            input_files.append(os.path.abspath(candidate))
+
+    return sorted(dict.fromkeys(input_files))
+
+
+def output_path_for(input_filepath, output_dir, output_extension=None):
+    """
+    Name the output file of an input file.
+
+    Parameters:
+    - input_filepath (str): The path to the input file.
+    - output_dir (str): The directory output files are written to.
+    - output_extension (str, optional): The output file extension, the input's extension if not given.
+
+    Returns:
+    str: The path to the output file.
+    """
+    stem, extension = os.path.splitext(os.path.basename(input_filepath))
+    return os.path.join(output_dir, f"{stem}{OUTPUT_SUFFIX}{output_extension or extension}")
+
+
+def new_summary(input_filepath, output_filepath):
+    """
+    The summary row of a file that has not been processed yet.
+
+    Parameters:
+    - input_filepath (str): The path to the input file.
+    - output_filepath (str): The path to the output file.
+
+    Returns:
+    dict: The summary row, with every count zero.
+    """
+    return {'Input File': input_filepath, 'Output File': output_filepath, 'Status': 'OK', 'Students': 0,
+            'Missing Information': 0, **{honours_class: 0 for honours_class in HONOURS_CLASSES},
+            'Seconds': 0.0, 'Error': ''}
+
+
+def record_failure(summary, error):
+    """
+    Mark a summary row as failed with the error that stopped its file.
+    """
+    summary['Status'] = 'Failed'
+    summary['Error'] = f"{type(error).__name__}: {error}"
+
+
+def process_input_file(handbook, input_filepath, output_filepath):
+    """
+    Process one input file against a handbook snapshot, reporting failures instead of raising them.
+
+    Parameters:
+    - handbook (Handbook_snapshot): The handbook shared by every file of the batch.
+    - input_filepath (str): The path to the input file.
+    - output_filepath (str): The path to the output file to be created.
+
+    Returns:
+    dict: The summary row of the file.
+    """
+    summary = new_summary(input_filepath, output_filepath)
+
+    start_time = time.perf_counter()
+    try:
+        output_df = Marks_processor(handbookDB=None).process_file(input_filepath, output_filepath, handbook=handbook)
+
+        # Students with more than one GENG4412 attempt have more than one row, count them once
+        students = output_df.drop_duplicates('Person_ID')
+        summary['Students'] = len(students)
+        summary['Missing Information'] = int((students['Missing Information (Y/N)'] == 'Y').sum())
+        honours_counts = students['Honours Class'].value_counts()
+        for honours_class in HONOURS_CLASSES:
+            summary[honours_class] = int(honours_counts.get(honours_class, 0))
+    except Exception as e:
+        record_failure(summary, e)
+    summary['Seconds'] = round(time.perf_counter() - start_time, 3)
+
+    return summary
+
+
+def run_batch(handbook_db, input_files, output_dir, output_extension=None, jobs=None, summary_filepath=None):
+    """
+    Process input files concurrently, one output file per input, and write a combined summary.
+
+    The handbook is loaded from the database once and shared by every file. A file that
+    fails, or whose worker process dies, is recorded in the summary and does not stop the
+    rest of the batch.
+
+    Parameters:
+    - handbook_db (Sqlite_handbookDB): The handbook database.
+    - input_files (list): The paths to the input files.
+    - output_dir (str): The directory output files are written to, created if missing.
+    - output_extension (str, optional): The output file extension, e.g. '.csv'. Each input's extension if not given.
+    - jobs (int, optional): The number of files processed at once, the number of CPUs if not given.
+    - summary_filepath (str, optional): The path to the summary CSV file, batch_summary.csv in output_dir if not given.
+
+    Returns:
+    pd.DataFrame: The summary, one row per input file, with the wall time of the batch in
+    seconds in attrs['elapsed_seconds'].
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    handbook = Handbook_snapshot.from_db(handbook_db)
+    output_files = []
+    for input_filepath in input_files:
+        output_filepath = output_path_for(input_filepath, output_dir, output_extension)
+        # Inputs with the same name in different directories or of different types get numbered outputs
+        stem, extension = os.path.splitext(output_filepath)
+        number = 1
+        while output_filepath in output_files:
+            number += 1
+            output_filepath = f"{stem}_{number}{extension}"
+        output_files.append(output_filepath)
+
+    summaries = []
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(process_input_file, handbook, input_filepath, output_filepath)
+                   for input_filepath, output_filepath in zip(input_files, output_files)]
+        for input_filepath, output_filepath, future in zip(input_files, output_files, futures):
+            try:
+                summary = future.result()
+            except Exception as e:
+                # e.g. BrokenProcessPool when a worker process dies, which also fails the files still queued
+                summary = new_summary(input_filepath, output_filepath)
+                record_failure(summary, e)
+            print(f"{summary['Status']:<6} {summary['Seconds']:>8.2f}s {summary['Input File']} {summary['Error']}".rstrip())
+            summaries.append(summary)
+
+    elapsed_seconds = time.perf_counter() - start_time
+
+    summary_df = pd.DataFrame(summaries, columns=list(summaries[0]) if summaries else None)
+    summary_df.attrs['elapsed_seconds'] = round(elapsed_seconds, 3)
+    summary_df.to_csv(summary_filepath or os.path.join(output_dir, SUMMARY_FILE_NAME), index=False)
+    return summary_df
@@ -0,0 +1,177 @@
+"""
+This file holds the per student state built up while reading marks, so the input can be fed in chunks
+
+Each chunk is reduced to per student summaries as it is added, so the state grows with the number of
+students and the units they attempted rather than with the number of input rows.
+"""
+import pandas as pd
+
+from app.logic import grading
+
+# Columns describing the student, taken from their last row with a value
+PERSONAL_COLUMNS = ['Surname', 'Given Names', 'Course_Code', 'Course_Title', 'Major_Deg']
+
+# Unit levels (5th character of the unit code) that count towards the EH-WAM
+EH_WAM_UNIT_LEVELS = ['3', '4', '5']
+
+# EH-WAM totals are kept per unit of each student, so units can still be counted or not as the handbook changes
+WAM_KEYS = ['Person_ID', 'Major_Deg', 'Unit_Code']
+
+
+class Cohort_state():
+    def __init__(self, handbook) -> None:
+        """
+        Constructor of the Cohort_state class.
+
+        Parameters:
+        - handbook (Handbook_snapshot): The handbook used to decide which units count towards the EH-WAM.
+        """
+        self.handbook = handbook
+        self.row_count = 0
+
+        # Partial results of every chunk added since the last consolidate
+        self.parts = {
+            'student_units': [],
+            'credit_totals': [],
+            'wam_inputs': [],
+            'geng4412_marks': [],
+            'personal_data': [],
+        }
+
+        # Combined results, set by consolidate
+        # - student_units (pd.DataFrame): Passed (Person_ID, Major_Deg, Unit_Code), unit codes stripped
+        # - credit_totals (pd.Series): Passed credit points by (Person_ID, Major_Deg)
+        # - wam_inputs (pd.DataFrame): EH-WAM totals by WAM_KEYS of level 3/4/5 units with a mark, which
+        #   may count towards the EH-WAM
+        # - geng4412_marks (pd.DataFrame): Person_ID and Mark of every GENG4412 attempt
+        # - personal_data (pd.DataFrame): Personal columns by Person_ID
+        self.student_units = None
+        self.credit_totals = None
+        self.wam_inputs = None
+        self.geng4412_marks = None
+        self.personal_data = None
+
+    def add(self, unit_data):
+        """
+        Fold a chunk of unit attempt rows into the per student state.
+
+        A student's rows may be spread over any number of chunks.
+
+        Parameters:
+        - unit_data (pd.DataFrame): Rows of the input file. Adjusted_Mark and
+          Relevant_Credit_Points columns are added to it.
+        """
+        self.row_count += len(unit_data)
+
+        # Adjust marks and choose the correct credit points based on the provided rules
+        unit_data['Adjusted_Mark'] = grading.adjust_marks(unit_data)
+        unit_data['Relevant_Credit_Points'] = grading.choose_credit_points(unit_data)
+
+        # Eligability works on the passed units of each (Person_ID, Major_Deg)
+        passed = unit_data[grading.passed_mask(unit_data)]
+        self.parts['student_units'].append(passed[['Person_ID', 'Major_Deg']].assign(
+            Unit_Code=passed['Unit_Code'].str.strip()
+        ).drop_duplicates())
+        # Summed as floats so the totals do not overflow the small integer dtype of the input
+        credit_points = passed['Relevant_Credit_Points'].astype(float)
+        self.parts['credit_totals'].append(credit_points.groupby([passed['Person_ID'], passed['Major_Deg']], observed=True).sum())
+
+        # Filter out rows with missing or None values and for Level 3/4/5 units
+        # Whether the unit is in the major is left to wam_totals, so it follows handbook changes
+        relevant = unit_data.dropna(subset=['Adjusted_Mark', 'Relevant_Credit_Points'])
+        relevant = relevant[relevant['Unit_Code'].str[4].isin(EH_WAM_UNIT_LEVELS)]
+        self.parts['wam_inputs'].append(grading.eh_wam_totals(relevant, by=WAM_KEYS).reset_index())
+
+        # Every GENG4412 attempt, in the order they were read, with marks as floats as in the output
+        geng4412_marks = unit_data.loc[unit_data['Unit_Code'] == 'GENG4412', ['Person_ID', 'Mark']]
+        self.parts['geng4412_marks'].append(geng4412_marks.astype({'Mark': float}))
+
+        # Last value of each personal column for each Person_ID
+        self.parts['personal_data'].append(unit_data.groupby('Person_ID')[PERSONAL_COLUMNS].last())
+
+    def consolidate(self):
+        """
+        Combine the partial results of every chunk into one result per student.
+
+        More chunks can still be added afterwards; they are combined on the next call.
+        """
+        if not self.parts['student_units']:
+            return
+
+        self.student_units = pd.concat(self.parts['student_units']).drop_duplicates()
+        self.credit_totals = pd.concat(self.parts['credit_totals']).groupby(level=['Person_ID', 'Major_Deg'], observed=True).sum()
+        self.wam_inputs = pd.concat(self.parts['wam_inputs']).groupby(
+            WAM_KEYS, observed=True, dropna=False, as_index=False, sort=False)[['Weighted_Mark', 'Relevant_Credit_Points']].sum()
+        self.geng4412_marks = pd.concat(self.parts['geng4412_marks'])
+        self.personal_data = pd.concat(self.parts['personal_data']).groupby(level='Person_ID').last()
+
+        # The combined results become the first part of the next consolidate
+        self.parts = {
+            'student_units': [self.student_units],
+            'credit_totals': [self.credit_totals],
+            'wam_inputs': [self.wam_inputs],
+            'geng4412_marks': [self.geng4412_marks],
+            'personal_data': [self.personal_data],
+        }
+
+    def wam_totals(self):
+        """
+        Sum the EH-WAM weighted marks and credit points of every student, counting only the
+        units that are part of the student's major in the current handbook.
+
+        Returns:
+        pd.DataFrame: 'Weighted_Mark' and 'Relevant_Credit_Points' totals, indexed by Person_ID.
+        """
+        # Get the major - make sure that the unitcode is in the major
+        in_major = self.handbook.units_in_majors(self.wam_inputs['Unit_Code'], self.wam_inputs['Major_Deg'])
+        return self.wam_inputs[in_major].groupby('Person_ID')[['Weighted_Mark', 'Relevant_Credit_Points']].sum()
+
+    def students_in_majors(self, majors):
+        """
+        Find the students with any unit attempts under one of the given majors.
+
+        Parameters:
+        - majors (set): Major names.
+
+        Returns:
+        pd.Index: The Person_IDs of the students.
+        """
+        group_persons = self.credit_totals.index.get_level_values('Person_ID')
+        group_majors = self.credit_totals.index.get_level_values('Major_Deg')
+        wam_persons = self.wam_inputs.loc[self.wam_inputs['Major_Deg'].isin(majors), 'Person_ID']
+
+        return group_persons[group_majors.isin(majors)].union(pd.Index(wam_persons.unique()))
+
+    def subset(self, person_ids):
+        """
+        Copy the consolidated state of some students only.
+
+        Parameters:
+        - person_ids (pd.Index): The Person_IDs of the students to keep.
+
+        Returns:
+        Cohort_state: The consolidated state of those students.
+        """
+        cohort = Cohort_state(self.handbook)
+        cohort.parts = {
+            'student_units': [self.student_units[self.student_units['Person_ID'].isin(person_ids)]],
+            'credit_totals': [self.credit_totals[self.credit_totals.index.get_level_values('Person_ID').isin(person_ids)]],
+            'wam_inputs': [self.wam_inputs[self.wam_inputs['Person_ID'].isin(person_ids)]],
+            'geng4412_marks': [self.geng4412_marks[self.geng4412_marks['Person_ID'].isin(person_ids)]],
+            'personal_data': [self.personal_data[self.personal_data.index.isin(person_ids)]],
+        }
+        cohort.consolidate()
+        return cohort
+
+    def merge(self, other):
+        """
+        Fold in the state of another cohort of students, e.g. one built in a worker process.
+
+        The students of the two cohorts should not overlap.
+
+        Parameters:
+        - other (Cohort_state): The cohort to fold in.
+        """
+        self.row_count += other.row_count
+        for name, frames in other.parts.items():
+            self.parts[name].extend(frames)
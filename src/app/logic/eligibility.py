@@ -0,0 +1,194 @@
+"""
+This file checks a whole cohort of students against their majors' rules at once
+"""
+import numpy as np
+import pandas as pd
+
+REQUIRED_TOTAL_CREDIT_POINTS = 192
+IGNORED_ZERO_CREDIT_POINT_UNITS = ['GENG4411']
+
+
+class Compiled_major_rules():
+    def __init__(self, rules) -> None:
+        """
+        Constructor of the Compiled_major_rules class.
+
+        Compiles the rules of one major into a unit x rule credit matrix and the
+        zero credit point units each rule requires.
+
+        Parameters:
+        - rules (list): List of (rule_id, credit_points, [(unit_code, credit_points)]) for the major.
+        """
+        self.rules = rules
+
+        # Column of each unit in the student x unit membership matrix
+        unit_codes = list(dict.fromkeys(unit[0] for rule in rules for unit in rule[2]))
+        self.unit_index = {unit_code: column for column, unit_code in enumerate(unit_codes)}
+
+        # Unit x rule incidence matrix holding the credit points each unit adds to each rule
+        self.credit_matrix = np.zeros((len(unit_codes), len(rules)), dtype=np.int64)
+        self.required_credit_points = np.array([rule[1] for rule in rules])
+
+        # Per rule, the (unit_code, column) of every zero credit point unit the student must complete
+        # GENG4411 is left out since GENG4412 is taken sequentially and would flag as not eligable
+        self.zero_cp_units = []
+        for rule_position, rule in enumerate(rules):
+            for unit_code, credit_points in rule[2]:
+                self.credit_matrix[self.unit_index[unit_code], rule_position] += credit_points
+
+            self.zero_cp_units.append([
+                (unit_code, self.unit_index[unit_code]) for unit_code, credit_points in rule[2]
+                if credit_points == 0 and unit_code not in IGNORED_ZERO_CREDIT_POINT_UNITS
+            ])
+
+        self.zero_cp_columns = np.array([unit[1] for units in self.zero_cp_units for unit in units], dtype=np.int64)
+
+    def evaluate(self, membership):
+        """
+        Check a cohort of students against the rules.
+
+        Parameters:
+        - membership (np.ndarray): Boolean student x unit matrix, True where the student passed the unit.
+
+        Returns:
+        dict: Row of membership -> list of comments, only for students that do not meet the rules.
+        """
+        credit_totals = membership.astype(np.int64) @ self.credit_matrix
+        short_of_credit = credit_totals < self.required_credit_points
+        missing_zero_cp = ~membership[:, self.zero_cp_columns]
+
+        failing_rows = np.flatnonzero(short_of_credit.any(axis=1) | missing_zero_cp.any(axis=1))
+
+        failures = {}
+        for row in failing_rows:
+            comments = []
+            for rule_position, rule in enumerate(self.rules):
+                for unit_code, column in self.zero_cp_units[rule_position]:
+                    if not membership[row, column]:
+                        comments.append(f'Student has not completed 0 credit point unit: {unit_code}')
+
+                if short_of_credit[row, rule_position]:
+                    # Missing [number of missing credit points] credit points for [rule id]
+                    missing_credit_points = rule[1] - int(credit_totals[row, rule_position])
+                    comments.append(f'Missing {missing_credit_points} credit points for rule {rule[0]}')
+            failures[row] = comments
+
+        return failures
+
+
+class Eligibility_evaluator():
+    def __init__(self, handbook) -> None:
+        """
+        Constructor of the Eligibility_evaluator class.
+
+        Parameters:
+        - handbook (Handbook_snapshot): The handbook to check students against.
+        """
+        self.handbook = handbook
+        self.compiled_majors = {}
+
+    def compiled_major(self, major_id):
+        """
+        Get the compiled rules of a major, compiling them on first use.
+
+        Parameters:
+        - major_id (int): The ID of the major.
+
+        Returns:
+        Compiled_major_rules: The compiled rules of the major.
+        """
+        if major_id not in self.compiled_majors:
+            rules = self.handbook.fetch_major_rules_verbose_by_id(major_id)
+            self.compiled_majors[major_id] = Compiled_major_rules(rules)
+        return self.compiled_majors[major_id]
+
+    def evaluate(self, student_units, credit_totals):
+        """
+        Check every (Person_ID, Major_Deg) group against the rules of each year of its major.
+
+        Parameters:
+        - student_units (pd.DataFrame): Passed units with 'Person_ID', 'Major_Deg' and stripped 'Unit_Code' columns.
+        - credit_totals (pd.Series): Passed credit points indexed by (Person_ID, Major_Deg), in group order.
+
+        Returns:
+        tuple: (comments, student_eligable) where comments is Person_ID -> {major_id: [comment]} and
+        student_eligable is Person_ID -> list of eligable major IDs or 'Not Eligable'.
+        """
+        groups = credit_totals.index
+        group_majors = groups.get_level_values('Major_Deg')
+
+        unit_groups = groups.get_indexer(pd.MultiIndex.from_frame(student_units[['Person_ID', 'Major_Deg']]))
+        unit_majors = student_units['Major_Deg'].to_numpy()
+        unit_codes = student_units['Unit_Code']
+
+        # Evaluate each major's cohort against each year of the major in a few array operations
+        # failures is (group position, major_id) -> list of comments
+        failures = {}
+        for major in pd.unique(group_majors):
+            cohort = np.flatnonzero(group_majors == major)
+            cohort_units = np.flatnonzero(unit_majors == major)
+            cohort_rows = np.searchsorted(cohort, unit_groups[cohort_units])
+
+            for major_id in self.handbook.get_major_ids(major):
+                compiled = self.compiled_major(major_id)
+
+                columns = unit_codes.iloc[cohort_units].map(compiled.unit_index).to_numpy(dtype=float)
+                in_major = ~np.isnan(columns)
+
+                membership = np.zeros((len(cohort), len(compiled.unit_index)), dtype=bool)
+                membership[cohort_rows[in_major], columns[in_major].astype(np.int64)] = True
+
+                for row, comments in compiled.evaluate(membership).items():
+                    failures[(cohort[row], major_id)] = comments
+
+        # Fold the per group results into per student results, in group order
+        comments = {}
+        student_eligable = {}
+        for position, (person_id, major) in enumerate(groups):
+            eligable = False
+            for major_id in self.handbook.get_major_ids(major):
+                major_comments = failures.get((position, major_id))
+                if major_comments:
+                    comments.setdefault(person_id, {}).setdefault(major_id, []).extend(major_comments)
+                else:
+                    eligable = True
+                    student_eligable.setdefault(person_id, []).append(major_id)
+
+            if eligable:
+                units_done = int(credit_totals.iat[position])
+                eligable = (units_done >= REQUIRED_TOTAL_CREDIT_POINTS)
+                if not eligable:
+                    comments.setdefault(person_id, {}).setdefault(major_id, []).append(
+                        f"Insufficient credit points to graduate. Completed {units_done} credit points of {REQUIRED_TOTAL_CREDIT_POINTS}")
+                    student_eligable[person_id][0] = 'Not Eligable'
+            if not eligable:
+                student_eligable.setdefault(person_id, []).append('Not Eligable')
+
+        return comments, student_eligable
+
+
+def eligibility_results(comments, student_eligable):
+    """
+    Build the per student eligibility columns of the output.
+
+    Parameters:
+    - comments (dict): Person_ID -> {major_id: [comment]} as returned by Eligibility_evaluator.evaluate.
+    - student_eligable (dict): Person_ID -> list of eligable major IDs or 'Not Eligable'.
+
+    Returns:
+    pd.DataFrame: 'Missing Information (Y/N)' and 'Comments (missing information)' columns keyed by Person_ID,
+    only for students that are not eligable.
+    """
+    flagged = [person_id for person_id in comments if student_eligable[person_id][0] == 'Not Eligable']
+
+    # One line of comments per major
+    comment_strings = [
+        ''.join(', '.join(major_comments) + '\n' for major_comments in comments[person_id].values())
+        for person_id in flagged
+    ]
+
+    return pd.DataFrame({
+        'Person_ID': flagged,
+        'Missing Information (Y/N)': 'Y',
+        'Comments (missing information)': comment_strings,
+    })
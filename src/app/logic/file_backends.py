@@ -0,0 +1,361 @@
+"""
+This file handles reading the marks input files and writing the processed output files
+"""
+import os
+
+import numpy as np
+import openpyxl
+import pandas as pd
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import CellIsRule
+from openpyxl.styles import Alignment, Border, Font, Side
+from openpyxl.utils import get_column_letter
+
+# Nullable dtype of marks and credit points, which are small whole numbers
+SMALL_INTEGER_DTYPE = 'Int8'
+
+# Declared dtypes of the input columns the pipeline uses, in the order of the extract; no other
+# columns are read. Text repeated on every unit attempt of a student is kept as categories.
+INPUT_DTYPES = {
+    'Person_ID': 'int64',
+    'Surname': 'category',
+    'Given Names': 'category',
+    'Course_Code': 'category',
+    'Course_Title': 'category',
+    'Major_Deg': 'category',
+    'Unit_Code': 'category',
+    'Enrolled_Credit_Points': SMALL_INTEGER_DTYPE,
+    'Achievable_Credit_Points': SMALL_INTEGER_DTYPE,
+    'Grade': 'category',
+    'Mark': SMALL_INTEGER_DTYPE,
+}
+
+# Input columns compared as text, whatever their values look like
+TEXT_COLUMNS = ['Unit_Code']
+
+# Input columns every row needs; rows without a value (e.g. trailing empty rows of an extract) are dropped
+REQUIRED_COLUMNS = ['Person_ID']
+
+# Dtypes the CSV parser can produce directly, so text is never held as one string per row
+CSV_DTYPES = {column: dtype for column, dtype in INPUT_DTYPES.items() if dtype == 'category'}
+
+# Excel output: the sheet name, and the values of a column highlighted in red as column -> value
+OUTPUT_SHEET_NAME = 'Sheet1'
+HIGHLIGHTED_VALUES = {'Completed GENG4412 (Y/N)': 'N'}
+HIGHLIGHT_FONT = Font(color='FF0000')
+
+# Style of the Excel output's header row, the same as pandas' to_excel
+HEADER_FONT = Font(bold=True)
+HEADER_BORDER = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+HEADER_ALIGNMENT = Alignment(horizontal='center', vertical='top')
+
+# File extension -> file format
+FILE_FORMATS = {
+    '.xlsx': 'excel',
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.feather': 'feather',
+}
+
+# File format -> the extension output files of that format are written with
+FORMAT_EXTENSIONS = {file_format: extension for extension, file_format in FILE_FORMATS.items()}
+
+# File extensions that can only be read whole by pd.read_excel; openpyxl can neither stream nor write them
+WHOLE_INPUT_FILE_FORMATS = {
+    '.xls': 'excel',
+}
+
+
+def file_format(filepath, requested_format=None, whole_input=False):
+    """
+    Work out the format of a file from its extension, unless a format is requested.
+
+    Parameters:
+    - filepath (str): The path to the file.
+    - requested_format (str, optional): One of 'excel', 'csv', 'parquet' or 'feather'.
+    - whole_input (bool, optional): The file is an input read whole, so the extensions in
+      WHOLE_INPUT_FILE_FORMATS are accepted too.
+
+    Returns:
+    str: The file format.
+    """
+    extension = os.path.splitext(filepath)[1].lower()
+    if extension in WHOLE_INPUT_FILE_FORMATS and not whole_input:
+        raise ValueError(f"{extension} files can only be read whole, not streamed in chunks or written; "
+                         f"save the file as .xlsx instead")
+
+    if requested_format is not None:
+        if requested_format not in FILE_FORMATS.values():
+            raise ValueError(f"Unsupported file format: {requested_format}")
+        return requested_format
+
+    if whole_input and extension in WHOLE_INPUT_FILE_FORMATS:
+        return WHOLE_INPUT_FILE_FORMATS[extension]
+    if extension not in FILE_FORMATS:
+        raise ValueError(f"Unsupported file type: {extension or filepath} (expected one of {', '.join(FILE_FORMATS)})")
+    return FILE_FORMATS[extension]
+
+
+def is_input_column(column):
+    """
+    Whether the pipeline uses a column of the input file. Other columns are not read.
+    """
+    return column in INPUT_DTYPES
+
+
+def input_columns(columns):
+    """
+    The columns of an input file the pipeline uses, in file order.
+
+    Parameters:
+    - columns (list): The names of the columns of the file.
+
+    Returns:
+    list: The names of the columns to read.
+    """
+    return [column for column in columns if is_input_column(column)]
+
+
+def declare_input_dtypes(data):
+    """
+    Convert the columns in INPUT_DTYPES to their declared dtypes, leaving missing values missing.
+
+    Rows missing a value in REQUIRED_COLUMNS are dropped. Numbers that do not fit their declared
+    dtype (e.g. half marks or Person_IDs that are not numeric) keep the dtype they were read with.
+
+    Parameters:
+    - data (pd.DataFrame): Rows of the input file.
+
+    Returns:
+    pd.DataFrame: The rows with declared dtypes.
+    """
+    for column in REQUIRED_COLUMNS:
+        if column in data:
+            missing = data[column].isna()
+            if missing.any():
+                data = data[~missing].copy()
+
+    for column, dtype in INPUT_DTYPES.items():
+        if column not in data or data[column].dtype == dtype:
+            continue
+
+        values = data[column]
+        if column in TEXT_COLUMNS:
+            values = values.where(values.isna(), values.astype(str))
+
+        if dtype == 'category':
+            data[column] = values.astype(dtype)
+        else:
+            try:
+                data[column] = values.astype(dtype)
+            except (TypeError, ValueError):
+                pass
+    return data
+
+
+def import_pyarrow():
+    """
+    Import pyarrow, which Parquet and Feather files need.
+
+    Returns:
+    module: The pyarrow module.
+    """
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Parquet and Feather files need pyarrow to be installed") from e
+    return pyarrow
+
+
+def read_input(input_filepath, input_format=None):
+    """
+    Read a whole marks input file.
+
+    Parameters:
+    - input_filepath (str): The path to the input file.
+    - input_format (str, optional): The file format, worked out from the extension if not given.
+
+    Returns:
+    pd.DataFrame: The rows of the input file.
+    """
+    input_format = file_format(input_filepath, input_format, whole_input=True)
+
+    if input_format == 'excel':
+        data = pd.read_excel(input_filepath, usecols=is_input_column)
+    elif input_format == 'csv':
+        data = pd.read_csv(input_filepath, usecols=is_input_column, dtype=CSV_DTYPES)
+    elif input_format == 'parquet':
+        pyarrow = import_pyarrow()
+        columns = input_columns(pyarrow.parquet.read_schema(input_filepath).names)
+        data = pd.read_parquet(input_filepath, columns=columns)
+    else:
+        pyarrow = import_pyarrow()
+        with pyarrow.memory_map(input_filepath) as source:
+            columns = input_columns(pyarrow.ipc.open_file(source).schema.names)
+        data = pd.read_feather(input_filepath, columns=columns)
+
+    return declare_input_dtypes(data)
+
+
+def read_input_chunks(input_filepath, chunksize, input_format=None):
+    """
+    Read a marks input file in chunks of rows, without loading the whole file.
+
+    Parameters:
+    - input_filepath (str): The path to the input file.
+    - chunksize (int): The number of rows in each chunk.
+    - input_format (str, optional): The file format, worked out from the extension if not given.
+
+    Yields:
+    pd.DataFrame: The next chunk of rows.
+    """
+    input_format = file_format(input_filepath, input_format)
+
+    if input_format == 'excel':
+        chunks = read_excel_chunks(input_filepath, chunksize, usecols=is_input_column)
+    elif input_format == 'csv':
+        chunks = pd.read_csv(input_filepath, usecols=is_input_column, dtype=CSV_DTYPES, chunksize=chunksize)
+    elif input_format == 'parquet':
+        pyarrow = import_pyarrow()
+        parquet_file = pyarrow.parquet.ParquetFile(input_filepath)
+        columns = input_columns(parquet_file.schema_arrow.names)
+        chunks = (batch.to_pandas() for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns))
+    else:
+        pyarrow = import_pyarrow()
+        chunks = read_feather_chunks(pyarrow, input_filepath, chunksize, usecols=is_input_column)
+
+    for chunk in chunks:
+        yield declare_input_dtypes(chunk)
+
+
+def read_feather_chunks(pyarrow, input_filepath, chunksize, usecols=None):
+    """
+    Read a Feather file one record batch at a time, split into chunks of rows.
+
+    Parameters:
+    - pyarrow (module): The pyarrow module.
+    - input_filepath (str): The path to the input Feather file.
+    - chunksize (int): The largest number of rows in each chunk.
+    - usecols (callable, optional): Only read the columns whose name it returns True for.
+
+    Yields:
+    pd.DataFrame: The next chunk of rows.
+    """
+    with pyarrow.memory_map(input_filepath) as source:
+        reader = pyarrow.ipc.open_file(source)
+        columns = [name for name in reader.schema.names if usecols is None or usecols(name)]
+        for batch_number in range(reader.num_record_batches):
+            batch = reader.get_batch(batch_number).select(columns)
+            for offset in range(0, batch.num_rows, chunksize):
+                yield batch.slice(offset, chunksize).to_pandas()
+
+
+def read_excel_chunks(input_filepath, chunksize, usecols=None):
+    """
+    Read the first sheet of an Excel file in chunks of rows, without loading the whole workbook.
+
+    The first row is used as the column names and empty rows are skipped, as with pd.read_excel.
+
+    Parameters:
+    - input_filepath (str): The path to the input Excel file.
+    - chunksize (int): The number of rows in each chunk.
+    - usecols (callable, optional): Only read the columns whose name it returns True for, as with pd.read_excel.
+
+    Yields:
+    pd.DataFrame: The next chunk of rows.
+    """
+    workbook = openpyxl.load_workbook(input_filepath, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+
+        # Leave out trailing columns with no name
+        used_columns = [position for position, name in enumerate(header)
+                        if name is not None and (usecols is None or usecols(name))]
+        columns = [header[position] for position in used_columns]
+
+        def to_frame(chunk):
+            # Empty cells come through as None, pd.read_excel gives NaN
+            return pd.DataFrame(chunk, columns=columns).fillna(np.nan).infer_objects()
+
+        chunk = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            chunk.append([row[position] if position < len(row) else None for position in used_columns])
+
+            if len(chunk) >= chunksize:
+                yield to_frame(chunk)
+                chunk = []
+
+        if chunk:
+            yield to_frame(chunk)
+    finally:
+        workbook.close()
+
+
+def write_output(output_data, output_filepath, output_format=None):
+    """
+    Write the processed student data to an output file.
+
+    Parameters:
+    - output_data (pd.DataFrame): The processed student data DataFrame.
+    - output_filepath (str): The path to the output file to be created.
+    - output_format (str, optional): The file format, worked out from the extension if not given.
+    """
+    output_format = file_format(output_filepath, output_format)
+
+    if output_format == 'excel':
+        write_excel_output(output_data, output_filepath)
+    elif output_format == 'csv':
+        output_data.to_csv(output_filepath, index=False)
+    elif output_format == 'parquet':
+        import_pyarrow()
+        output_data.to_parquet(output_filepath, index=False)
+    else:
+        import_pyarrow()
+        output_data.reset_index(drop=True).to_feather(output_filepath)
+
+
+def write_excel_output(output_data, output_filepath):
+    """
+    Write the processed student data to an output Excel file with an auto-filter, with the
+    values in HIGHLIGHTED_VALUES in red.
+
+    The workbook is write-only, so rows are streamed to the file as they are added instead of
+    the whole sheet being built in memory first (openpyxl only streams with lxml installed).
+    The filter and highlight are set on the ranges of the sheet rather than on each cell.
+
+    Parameters:
+    - output_data (pd.DataFrame): The processed student data DataFrame.
+    - output_filepath (str): The path to the output Excel file to be created.
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    worksheet = workbook.create_sheet(OUTPUT_SHEET_NAME)
+
+    last_row = len(output_data) + 1
+    worksheet.auto_filter.ref = f"A1:{get_column_letter(max(len(output_data.columns), 1))}{last_row}"
+    for column, value in HIGHLIGHTED_VALUES.items():
+        if column in output_data.columns and len(output_data) > 0:
+            column_letter = get_column_letter(output_data.columns.get_loc(column) + 1)
+            worksheet.conditional_formatting.add(f"{column_letter}2:{column_letter}{last_row}",
+                                                 CellIsRule(operator='equal', formula=[f'"{value}"'], font=HIGHLIGHT_FONT))
+
+    header = []
+    for column in output_data.columns:
+        cell = WriteOnlyCell(worksheet, value=column)
+        cell.font = HEADER_FONT
+        cell.border = HEADER_BORDER
+        cell.alignment = HEADER_ALIGNMENT
+        header.append(cell)
+    worksheet.append(header)
+
+    # Missing values are left as empty cells, as pandas' to_excel does
+    for row in output_data.itertuples(index=False, name=None):
+        worksheet.append([None if pd.isna(value) else value for value in row])
+
+    workbook.save(output_filepath)
@@ -0,0 +1,127 @@
+"""
+This file holds the column-wise (vectorized) grading rules used by the marks processor
+"""
+import numpy as np
+import pandas as pd
+
+# Grades that replace the recorded mark with a fixed mark
+FIXED_GRADE_MARKS = {'FN': 0, 'FC': 48, 'PS': 50}
+
+# Grades that keep the recorded mark
+MARKED_GRADES = ['N', 'N+', 'P', 'CR', 'D', 'HD']
+
+# Grades that count as a pass
+PASSING_GRADES = ['HD', 'D', 'CR', 'P', 'UP', 'PS', 'PA', 'AC']
+
+# Marks below this are assessed against the enrolled credit points
+PASS_MARK = 50
+
+
+def adjust_marks(data):
+    """
+    Adjust student marks for every row of a DataFrame at once.
+
+    Column-wise equivalent of Marks_processor.adjust_mark.
+
+    Parameters:
+    - data (pd.DataFrame): Student unit data with 'Grade' and 'Mark' columns.
+
+    Returns:
+    pd.Series: The adjusted marks, NaN where the grade has no mark.
+    """
+    grade = data['Grade']
+    conditions = [grade == fixed_grade for fixed_grade in FIXED_GRADE_MARKS]
+    choices = list(FIXED_GRADE_MARKS.values())
+
+    conditions.append(grade.isin(MARKED_GRADES))
+    choices.append(data['Mark'].to_numpy(dtype=float, na_value=np.nan))
+
+    adjusted = np.select(conditions, choices, default=np.nan)
+    return pd.Series(adjusted, index=data.index, dtype=float)
+
+
+def choose_credit_points(data):
+    """
+    Choose the relevant credit points for every row of a DataFrame at once.
+
+    Column-wise equivalent of Marks_processor.choose_credit_points. As with the row
+    version, a missing adjusted mark falls through to the achievable credit points.
+
+    Parameters:
+    - data (pd.DataFrame): Student unit data with 'Adjusted_Mark', 'Enrolled_Credit_Points'
+      and 'Achievable_Credit_Points' columns.
+
+    Returns:
+    pd.Series: The relevant credit points.
+    """
+    below_pass = data['Adjusted_Mark'] < PASS_MARK
+    return data['Enrolled_Credit_Points'].where(below_pass, data['Achievable_Credit_Points'])
+
+
+def passed_mask(data):
+    """
+    Flag the rows of a DataFrame that have a passing grade.
+
+    Column-wise equivalent of Marks_processor.passed.
+
+    Parameters:
+    - data (pd.DataFrame): Student unit data with a 'Grade' column.
+
+    Returns:
+    pd.Series: Boolean mask, True where the grade is passing.
+    """
+    return data['Grade'].isin(PASSING_GRADES)
+
+
+def eh_wam_totals(data, by=None):
+    """
+    Sum the weighted marks and credit points of every student.
+
+    Uses built-in groupby sums of a precomputed weighted mark column instead of a
+    Python function per student. Totals of separate parts of the data can be added
+    together before calling eh_wam_from_totals.
+
+    Parameters:
+    - data (pd.DataFrame): Student unit data with 'Adjusted_Mark', 'Relevant_Credit_Points'
+      and the columns in by.
+    - by (list, optional): The columns to total by, e.g. ['Person_ID', 'Unit_Code'] for a total per unit
+      of each student. Defaults to ['Person_ID'].
+
+    Returns:
+    pd.DataFrame: 'Weighted_Mark' and 'Relevant_Credit_Points' totals, indexed by the columns in by.
+    """
+    by = by or ['Person_ID']
+    # Credit points may be read as small integers, which the totals could overflow
+    credit_points = data['Relevant_Credit_Points'].astype(float)
+    weighted = data[by].assign(
+        Relevant_Credit_Points=credit_points,
+        Weighted_Mark=data['Adjusted_Mark'] * credit_points
+    )
+    return weighted.groupby(by, observed=True, dropna=False)[['Weighted_Mark', 'Relevant_Credit_Points']].sum()
+
+
+def eh_wam_from_totals(totals):
+    """
+    Calculate the credit point weighted average mark of every student from their totals.
+
+    Parameters:
+    - totals (pd.DataFrame): Totals as returned by eh_wam_totals.
+
+    Returns:
+    pd.Series: The weighted average mark, indexed by Person_ID.
+    """
+    return totals['Weighted_Mark'] / totals['Relevant_Credit_Points']
+
+
+def eh_wam(data):
+    """
+    Calculate the credit point weighted average mark of every student.
+
+    Parameters:
+    - data (pd.DataFrame): Student unit data with 'Person_ID', 'Adjusted_Mark' and
+      'Relevant_Credit_Points' columns.
+
+    Returns:
+    pd.Series: The weighted average mark, indexed by Person_ID.
+    """
+    return eh_wam_from_totals(eh_wam_totals(data))
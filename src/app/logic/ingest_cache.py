@@ -0,0 +1,287 @@
+"""
+This file keeps parsed input files on disk, so re-processing an unchanged file skips parsing it
+
+Entries are pickles, so they are kept in a directory only the current user can use and each one is
+signed with a key kept there. A file the cache did not write itself is never unpickled.
+"""
+import hashlib
+import hmac
+import os
+import pickle
+import secrets
+import stat
+import sys
+
+from app.logic import file_backends
+
+CACHE_DIR_NAME = os.path.join("marks_processor", "ingest_cache")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Bump when the parsed form of the input changes so older entries are no longer used
+CACHE_VERSION = 3
+
+CACHE_FILE_EXTENSION = ".pkl"
+READ_BLOCK_SIZE = 1024 * 1024
+
+# Permissions of the cache directory and of the files in it
+CACHE_DIR_MODE = 0o700
+CACHE_FILE_MODE = 0o600
+
+# Every entry starts with an HMAC-SHA256 signature of the rest of the file, made with the key in KEY_FILE_NAME
+KEY_FILE_NAME = "signing.key"
+KEY_SIZE = 32
+SIGNATURE_SIZE = hashlib.sha256().digest_size
+
+
+def default_cache_dir():
+    """
+    The per user cache directory: under %LOCALAPPDATA% on Windows, ~/Library/Caches on macOS and
+    $XDG_CACHE_HOME (or ~/.cache) elsewhere.
+
+    Returns:
+    str: The path to the directory.
+    """
+    if sys.platform == "win32":
+        base_dir = os.environ.get("LOCALAPPDATA") or os.path.expanduser(os.path.join("~", "AppData", "Local"))
+    elif sys.platform == "darwin":
+        base_dir = os.path.expanduser(os.path.join("~", "Library", "Caches"))
+    else:
+        base_dir = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser(os.path.join("~", ".cache"))
+    return os.path.join(base_dir, CACHE_DIR_NAME)
+
+
+def prepare_cache_dir(cache_dir):
+    """
+    Create the cache directory if it is missing, readable by the current user only, and check
+    that nobody else can have put files in it.
+
+    Parameters:
+    - cache_dir (str): The path to the directory.
+
+    Raises:
+    PermissionError: If the path is a symbolic link or not a directory, or belongs to another user.
+    """
+    os.makedirs(cache_dir, mode=CACHE_DIR_MODE, exist_ok=True)
+
+    dir_stat = os.lstat(cache_dir)
+    if not stat.S_ISDIR(dir_stat.st_mode):
+        raise PermissionError(f"Ingest cache {cache_dir} is not a directory")
+    # Windows has no owner IDs, but the default directory is under the user's own profile
+    if hasattr(os, "getuid") and dir_stat.st_uid != os.getuid():
+        raise PermissionError(f"Ingest cache {cache_dir} belongs to another user")
+    if stat.S_IMODE(dir_stat.st_mode) != CACHE_DIR_MODE:
+        os.chmod(cache_dir, CACHE_DIR_MODE)
+
+
+def open_private(path):
+    """
+    Open a new file for writing that only the current user can read, replacing any file at path.
+    """
+    return os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, CACHE_FILE_MODE), 'wb')
+
+
+class Ingest_cache():
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES, hash_contents=False) -> None:
+        """
+        Constructor of the Ingest_cache class.
+
+        Parameters:
+        - cache_dir (str, optional): Directory the cache entries are kept in, created if missing.
+          Defaults to default_cache_dir().
+        - max_bytes (int): Total size of the entries above which the least recently used are removed.
+        - hash_contents (bool): Key entries on a hash of the file contents instead of its modification
+          time, so a file that is touched or copied back unchanged still hits the cache.
+
+        Raises:
+        PermissionError: If the cache directory is not a private directory of the current user.
+        """
+        self.cache_dir = cache_dir if cache_dir is not None else default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hash_contents = hash_contents
+        prepare_cache_dir(self.cache_dir)
+        self.signing_key = self.load_signing_key()
+
+    def load_signing_key(self):
+        """
+        Read the key entries are signed with, creating it the first time the cache is used.
+
+        Returns:
+        bytes: The key.
+        """
+        key_path = os.path.join(self.cache_dir, KEY_FILE_NAME)
+        try:
+            key_fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, CACHE_FILE_MODE)
+        except FileExistsError:
+            with open(key_path, 'rb') as key_file:
+                signing_key = key_file.read()
+            if len(signing_key) == KEY_SIZE:
+                return signing_key
+            # A truncated key is replaced, which makes every existing entry a miss
+            print(f"\033[91mWarning: replacing the invalid ingest cache key {key_path}\033[0m")
+            key_fd = os.open(key_path, os.O_WRONLY | os.O_TRUNC)
+
+        signing_key = secrets.token_bytes(KEY_SIZE)
+        with os.fdopen(key_fd, 'wb') as key_file:
+            key_file.write(signing_key)
+        return signing_key
+
+    def sign(self, payload):
+        """
+        The signature of the contents of an entry.
+        """
+        return hmac.new(self.signing_key, payload, hashlib.sha256).digest()
+
+    def key(self, input_filepath, input_format=None):
+        """
+        Build the cache key of an input file.
+
+        Parameters:
+        - input_filepath (str): The path to the input file.
+        - input_format (str, optional): The file format, worked out from the extension if not given.
+
+        Returns:
+        str: The cache key.
+        """
+        input_format = file_backends.file_format(input_filepath, input_format, whole_input=True)
+        file_stat = os.stat(input_filepath)
+
+        key = hashlib.sha256()
+        key.update(f"{CACHE_VERSION}|{os.path.abspath(input_filepath)}|{input_format}|{file_stat.st_size}".encode())
+        if self.hash_contents:
+            with open(input_filepath, 'rb') as input_file:
+                for block in iter(lambda: input_file.read(READ_BLOCK_SIZE), b''):
+                    key.update(block)
+        else:
+            key.update(f"|{file_stat.st_mtime_ns}".encode())
+
+        return key.hexdigest()
+
+    def entry_path(self, key):
+        """
+        Path of the cache entry for a key.
+        """
+        return os.path.join(self.cache_dir, key + CACHE_FILE_EXTENSION)
+
+    def get(self, input_filepath, input_format=None):
+        """
+        Fetch the parsed rows of an input file, if they are cached.
+
+        Parameters:
+        - input_filepath (str): The path to the input file.
+        - input_format (str, optional): The file format, worked out from the extension if not given.
+
+        Returns:
+        pd.DataFrame or None: The rows of the input file, or None on a cache miss.
+        """
+        entry_path = self.entry_path(self.key(input_filepath, input_format))
+        try:
+            with open(entry_path, 'rb') as entry_file:
+                contents = entry_file.read()
+        except FileNotFoundError:
+            return None
+
+        # Only entries signed with this cache's key are unpickled
+        signature, payload = contents[:SIGNATURE_SIZE], contents[SIGNATURE_SIZE:]
+        if not hmac.compare_digest(signature, self.sign(payload)):
+            print(f"\033[91mWarning: removing ingest cache entry {entry_path}: its signature does not match\033[0m")
+            self.remove(entry_path)
+            return None
+        try:
+            data = pickle.loads(payload)
+        except Exception as e:
+            # A broken entry is treated as a miss and removed
+            print(f"\033[91mWarning: removing unreadable ingest cache entry {entry_path}: {e}\033[0m")
+            self.remove(entry_path)
+            return None
+
+        # Mark the entry as recently used
+        os.utime(entry_path)
+        return data
+
+    def put(self, input_filepath, data, input_format=None):
+        """
+        Store the parsed rows of an input file, then evict old entries if the cache is too large.
+
+        Parameters:
+        - input_filepath (str): The path to the input file.
+        - data (pd.DataFrame): The rows of the input file. It is not modified.
+        - input_format (str, optional): The file format, worked out from the extension if not given.
+        """
+        entry_path = self.entry_path(self.key(input_filepath, input_format))
+
+        # The rows are stored as read, already in the compact dtypes of file_backends.INPUT_DTYPES
+        # Write to a temporary file first so a half written entry is never read
+        payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        temp_path = entry_path + ".tmp"
+        with open_private(temp_path) as entry_file:
+            entry_file.write(self.sign(payload))
+            entry_file.write(payload)
+        os.replace(temp_path, entry_path)
+
+        self.evict()
+
+    def read(self, input_filepath, input_format=None):
+        """
+        Read a whole input file through the cache.
+
+        Parameters:
+        - input_filepath (str): The path to the input file.
+        - input_format (str, optional): The file format, worked out from the extension if not given.
+
+        Returns:
+        pd.DataFrame: The rows of the input file.
+        """
+        data = self.get(input_filepath, input_format)
+        if data is None:
+            data = file_backends.read_input(input_filepath, input_format)
+            self.put(input_filepath, data, input_format)
+        return data
+
+    def entries(self):
+        """
+        List the cache entries, least recently used first.
+
+        Returns:
+        list: A list of tuples containing the path, last use time and size of each entry.
+        """
+        entries = []
+        for file_name in os.listdir(self.cache_dir):
+            if not file_name.endswith(CACHE_FILE_EXTENSION):
+                continue
+            entry_path = os.path.join(self.cache_dir, file_name)
+            try:
+                entry_stat = os.stat(entry_path)
+            except FileNotFoundError:
+                continue
+            entries.append((entry_path, entry_stat.st_mtime_ns, entry_stat.st_size))
+
+        entries.sort(key=lambda entry: entry[1])
+        return entries
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache fits in max_bytes.
+        """
+        entries = self.entries()
+        total_bytes = sum(entry[2] for entry in entries)
+        for entry_path, _, size in entries:
+            if total_bytes <= self.max_bytes:
+                break
+            self.remove(entry_path)
+            total_bytes -= size
+
+    def clear(self):
+        """
+        Remove every cache entry.
+        """
+        for entry_path, _, _ in self.entries():
+            self.remove(entry_path)
+
+    def remove(self, entry_path):
+        """
+        Remove a cache entry, if it still exists.
+        """
+        try:
+            os.remove(entry_path)
+        except FileNotFoundError:
+            pass
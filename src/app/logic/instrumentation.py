@@ -0,0 +1,228 @@
+"""
+This file records where the time and memory go while processing a file, stage by stage
+"""
+import json
+import time
+import tracemalloc
+
+# Profilers that can be attached to a run
+PROFILERS = ['cprofile', 'pyinstrument']
+
+
+class Instrumentation():
+    def __init__(self, track_memory=True, profiler=None, report_path=None, profile_path=None) -> None:
+        """
+        Constructor of the Instrumentation class.
+
+        Pass an instance to Marks_processor.process_file to record, for each stage, the wall time,
+        the rows worked on, the peak memory and the handbook queries run. A stage that runs in
+        several steps between other stages (e.g. once per chunk) gets one row with the steps added up.
+
+        Parameters:
+        - track_memory (bool): Record the peak memory allocated in each stage with tracemalloc,
+          which slows processing down.
+        - profiler (str, optional): 'cprofile' or 'pyinstrument' to profile the whole run.
+          pyinstrument must be installed to use it.
+        - report_path (str, optional): Write the report to this JSON file once the run ends.
+        - profile_path (str, optional): Write the profile to this file once the run ends:
+          cProfile stats (for pstats or snakeviz) or a pyinstrument HTML page.
+        """
+        if profiler is not None and profiler not in PROFILERS:
+            raise ValueError(f"Unsupported profiler: {profiler} (expected one of {', '.join(PROFILERS)})")
+
+        self.track_memory = track_memory
+        self.profiler = profiler
+        self.report_path = report_path
+        self.profile_path = profile_path
+
+        self.report = None
+        self.handbook_db = None
+        self.current_stage = None
+        self.run_start_time = None
+        self.started_tracemalloc = False
+        self.active_profiler = None
+
+    def start(self, handbook_db=None, **details):
+        """
+        Start recording a run.
+
+        Parameters:
+        - handbook_db (Sqlite_handbookDB, optional): The handbook database whose queries are counted.
+        - details: Extra values to keep in the report, e.g. the input and output paths.
+        """
+        self.handbook_db = handbook_db
+        self.report = {**details, 'stages': []}
+        self.current_stage = None
+
+        # Started first, as it fails if the profiler is not installed
+        self.active_profiler = self.start_profiler()
+
+        if self.track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracemalloc = True
+
+        self.run_start_time = time.perf_counter()
+
+    def start_stage(self, stage):
+        """
+        Finish the current stage and start recording a new one. Starting the stage that is
+        already being recorded does nothing, and starting one recorded earlier adds to its row.
+
+        Parameters:
+        - stage (str): The name of the stage.
+        """
+        if self.current_stage is not None and self.current_stage['stage'] == stage:
+            return
+        self.finish_stage()
+
+        db_stats = self.db_stats()
+        self.current_stage = {
+            'stage': stage,
+            'rows': 0,
+            'start_time': time.perf_counter(),
+            'start_queries': db_stats['queries'],
+            'start_query_seconds': db_stats['seconds'],
+            'note': None,
+        }
+        if self.track_memory:
+            tracemalloc.reset_peak()
+
+    def note(self, text):
+        """
+        Note how the numbers of the current stage should be read, e.g. that they are approximate.
+
+        Parameters:
+        - text (str): The note, kept in the stage's row of the report.
+        """
+        if self.current_stage is not None:
+            self.current_stage['note'] = text
+
+    def add_rows(self, rows):
+        """
+        Add to the number of rows the current stage worked on.
+
+        Parameters:
+        - rows (int): The number of rows.
+        """
+        if self.current_stage is not None:
+            self.current_stage['rows'] += int(rows)
+
+    def finish_stage(self):
+        """
+        Finish recording the current stage, if there is one.
+        """
+        stage = self.current_stage
+        if stage is None:
+            return
+        self.current_stage = None
+
+        db_stats = self.db_stats()
+        step = {
+            'stage': stage['stage'],
+            'seconds': round(time.perf_counter() - stage['start_time'], 6),
+            'rows': stage['rows'],
+            'peak_memory_bytes': tracemalloc.get_traced_memory()[1] if self.track_memory else None,
+            'db_queries': db_stats['queries'] - stage['start_queries'],
+            'db_seconds': round(db_stats['seconds'] - stage['start_query_seconds'], 6),
+            'note': stage['note'],
+        }
+
+        # Steps of a stage recorded earlier are added to its row
+        row = next((row for row in self.report['stages'] if row['stage'] == step['stage']), None)
+        if row is None:
+            self.report['stages'].append(step)
+            return
+        row['seconds'] = round(row['seconds'] + step['seconds'], 6)
+        row['rows'] += step['rows']
+        if self.track_memory:
+            row['peak_memory_bytes'] = max(row['peak_memory_bytes'], step['peak_memory_bytes'])
+        row['db_queries'] += step['db_queries']
+        row['db_seconds'] = round(row['db_seconds'] + step['db_seconds'], 6)
+        row['note'] = row['note'] or step['note']
+
+    def finish(self, status='completed'):
+        """
+        Finish recording the run, then write the report and profile if paths were given.
+
+        Parameters:
+        - status (str): How the run ended, e.g. 'completed', 'cancelled' or 'failed'.
+
+        Returns:
+        dict: The report.
+        """
+        self.finish_stage()
+        self.report['status'] = status
+        self.report['total_seconds'] = round(time.perf_counter() - self.run_start_time, 6)
+        self.report['db_queries'] = sum(stage['db_queries'] for stage in self.report['stages'])
+        self.report['db_seconds'] = round(sum(stage['db_seconds'] for stage in self.report['stages']), 6)
+        if self.track_memory:
+            self.report['peak_memory_bytes'] = max((stage['peak_memory_bytes'] for stage in self.report['stages']), default=0)
+
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+            self.started_tracemalloc = False
+
+        self.stop_profiler()
+
+        if self.report_path is not None:
+            self.write_report(self.report_path)
+        return self.report
+
+    def db_stats(self):
+        """
+        Query statistics of the handbook database, zero if there is none.
+        """
+        if self.handbook_db is None:
+            return {'queries': 0, 'seconds': 0.0}
+        return self.handbook_db.query_stats()
+
+    def start_profiler(self):
+        """
+        Start the requested profiler, if any.
+
+        Returns:
+        object: The running profiler, or None.
+        """
+        if self.profiler == 'cprofile':
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+            return profiler
+        if self.profiler == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+            except ImportError as e:
+                raise ImportError("The pyinstrument profiler needs pyinstrument to be installed") from e
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+        return None
+
+    def stop_profiler(self):
+        """
+        Stop the running profiler, if any, and write its profile to profile_path.
+        """
+        profiler = self.active_profiler
+        if profiler is None:
+            return
+        self.active_profiler = None
+
+        if self.profiler == 'cprofile':
+            profiler.disable()
+            if self.profile_path is not None:
+                profiler.dump_stats(self.profile_path)
+        else:
+            profiler.stop()
+            if self.profile_path is not None:
+                with open(self.profile_path, 'w') as profile_file:
+                    profile_file.write(profiler.output_html())
+
+    def write_report(self, report_path):
+        """
+        Write the report to a JSON file.
+
+        Parameters:
+        - report_path (str): The path to the JSON file.
+        """
+        with open(report_path, 'w') as report_file:
+            json.dump(self.report, report_file, indent=2)
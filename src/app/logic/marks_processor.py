@@ -1,16 +1,40 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
-from pandas import ExcelWriter
 
-REQUIRED_TOTAL_CREDIT_POINTS = 192
-IGNORED_ZERO_CREDIT_POINT_UNITS = ['GENG4411']
+from app.databases.handbook_snapshot import Handbook_snapshot
+from app.logic import grading
+from app.logic.cohort_state import Cohort_state, PERSONAL_COLUMNS
+from app.logic.eligibility import Eligibility_evaluator, eligibility_results
+from app.logic import file_backends
+from app.logic.progress import Progress_reporter, Processing_cancelled
+
 
 class Marks_processor():
-    def __init__(self, handbookDB) -> None:
+    def __init__(self, handbookDB, ingest_cache=None) -> None:
+        """
+        Constructor of the Marks_processor class.
+
+        Parameters:
+        - handbookDB (Sqlite_handbookDB): The handbook database.
+        - ingest_cache (Ingest_cache, optional): Cache of parsed input files, so re-processing an
+          unchanged input file (e.g. after a handbook edit) skips parsing it.
+        """
         self.handbookDB = handbookDB
+        self.ingest_cache = ingest_cache
+
+        # State of the last processed file, kept so handbook edits can be re-evaluated incrementally
+        self.last_cohort = None
+        self.last_output = None
+        # Report of the last run processed with instrumentation
+        self.last_report = None
 
     def adjust_mark(self, row):
         """
         Adjust student marks based on specified conditions relating to grade.
+
+        Reference implementation of grading.adjust_marks, kept for tests.
         
         Parameters:
         - row (pd.Series): A row of a DataFrame containing student grade information.
@@ -36,6 +60,8 @@ class Marks_processor():
     def choose_credit_points(self, row):
         """
         Choose relevant credit points based on adjusted marks.
+
+        Reference implementation of grading.choose_credit_points, kept for tests.
         
         Parameters:
         - row (pd.Series): A row of a DataFrame containing student mark information.
@@ -73,25 +99,11 @@ class Marks_processor():
         else:
             return 'H3'
 
-    def completed_sufficient_units(self, student_data):
-        """
-        Calculate the total credit points from passed units for a student.
-        
-        Parameters:
-        - student_data (list): Data regarding student's units and grades.
-        
-        Returns:
-        int: Total credit points achieved from passed units.
-        """
-        credit_count = 0
-        for unit in student_data:
-            if self.passed(unit[1]):
-                credit_count += int(unit[2])
-        return credit_count
-        
     def passed(self, grade):
         """
         Determine if the given grade is considered passing.
+
+        Reference implementation of grading.passed_mask, kept for tests.
         
         Parameters:
         - grade (str): The grade to be checked.
@@ -106,174 +118,310 @@ class Marks_processor():
             return False
 
 
-    def process_file(self, input_filepath, output_filepath):
+    def process_file(self, input_filepath, output_filepath, chunksize=None, input_format=None, output_format=None, workers=None, handbook=None,
+                     progress=None, cancel_event=None, instrumentation=None):
         """
-        Process an input Excel file of student data, calculate various metrics, qualifications,
+        Process an input file of student data, calculate various metrics, qualifications,
         and assign honours classifications following predetermined logic and rules. The 
-        processed data is then written to an output Excel file.
+        processed data is then written to an output file.
         
         Parameters:
-        - input_filepath (str): The path to the input Excel file.
-        - output_filepath (str): The path to the output Excel file to be created.
+        - input_filepath (str): The path to the input Excel, CSV, Parquet or Feather file.
+        - output_filepath (str): The path to the output Excel, CSV, Parquet or Feather file to be created.
+        - chunksize (int, optional): Stream the input in chunks of this many rows instead of
+          loading the whole file, so memory is bounded by the chunk plus per student state
+          (see Cohort_state). With workers the rows are still gathered into shards first.
+        - input_format (str, optional): 'excel', 'csv', 'parquet' or 'feather', from the input extension if not given.
+        - output_format (str, optional): 'excel', 'csv', 'parquet' or 'feather', from the output extension if not given.
+        - workers (int, optional): Split the students into this many shards by Person_ID and process
+          them in parallel worker processes. The output is the same as with one process.
+        - handbook (Handbook_snapshot, optional): Use this snapshot of the handbook instead of loading one
+          from the database, e.g. when many files are processed against the same handbook.
+        - progress (callable, optional): Called as progress(stage, fraction) as each stage in
+          PROCESSING_STAGES starts, then as progress('done', 1.0).
+        - cancel_event (threading.Event, optional): Set from another thread to stop the run with
+          Processing_cancelled at the next stage or chunk. Nothing is written once cancelled.
+        - instrumentation (Instrumentation, optional): Record the time, rows, peak memory and handbook
+          queries of each stage. The report is kept in last_report and in the returned DataFrame's
+          attrs['report'], even if the run fails.
         
         Returns:
         pd.DataFrame: The processed student data DataFrame.
         """
-        # Load the input data
-        input_data = pd.read_excel(input_filepath)
+        reporter = Progress_reporter(progress, cancel_event, instrumentation)
+        if instrumentation is None:
+            merged_data_adjusted = self.run_stages(
+                reporter, input_filepath, output_filepath, chunksize, input_format, output_format, workers, handbook)
+            reporter.done()
+            return merged_data_adjusted
+
+        instrumentation.start(self.handbookDB, input_filepath=str(input_filepath), output_filepath=str(output_filepath),
+                              chunksize=chunksize, workers=workers)
+        status = 'failed'
+        try:
+            merged_data_adjusted = self.run_stages(
+                reporter, input_filepath, output_filepath, chunksize, input_format, output_format, workers, handbook)
+            status = 'completed'
+        except Processing_cancelled:
+            status = 'cancelled'
+            raise
+        finally:
+            self.last_report = instrumentation.finish(status)
+
+        merged_data_adjusted.attrs['report'] = self.last_report
+        reporter.done()
+        return merged_data_adjusted
+
+    def run_stages(self, reporter, input_filepath, output_filepath, chunksize, input_format, output_format, workers, handbook):
+        """
+        Run the stages of process_file, reporting each one.
 
-        # Adjust marks and choose the correct credit points based on the provided rules
-        input_data['Adjusted_Mark'] = input_data.apply(self.adjust_mark, axis=1)
-        input_data['Relevant_Credit_Points'] = input_data.apply(self.choose_credit_points, axis=1)
+        Parameters:
+        - reporter (Progress_reporter): Reports progress and checks for cancellation.
+        - The other parameters are those of process_file.
+
+        Returns:
+        pd.DataFrame: The processed student data DataFrame.
+        """
+        # Load the handbook once so lookups do not go back to the database for every row
+        reporter.stage('load')
+        if handbook is None:
+            handbook = self.load_handbook()
+        input_data = self.read_input(input_filepath, chunksize, input_format)
+
+        if workers is not None and workers > 1:
+            merged_data_adjusted, cohort = self.process_shards(handbook, input_data, workers, reporter)
+        else:
+            # Reading a chunk is timed as 'load' and folding it in as 'adjust', added up over the chunks
+            cohort = Cohort_state(handbook)
+            chunks = iter(input_data)
+            while True:
+                reporter.stage('load')
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                reporter.add_rows(len(chunk))
+                reporter.stage('adjust')
+                reporter.add_rows(len(chunk))
+                cohort.add(chunk)
+            merged_data_adjusted = self.build_output(cohort, reporter)
+
+        # Save the processed data to the output file
+        reporter.stage('write')
+        reporter.add_rows(len(merged_data_adjusted))
+        self.write_output(merged_data_adjusted, output_filepath, output_format)
+        self.last_cohort = cohort
+        self.last_output = merged_data_adjusted
+
+        return merged_data_adjusted
+
+    def load_handbook(self):
+        """
+        Load a snapshot of the handbook from the database, e.g. to pass to process_file when it runs
+        in another thread than the one the database connection belongs to.
+
+        Returns:
+        Handbook_snapshot: The loaded snapshot.
+        """
+        return Handbook_snapshot.from_db(self.handbookDB)
+
+    def read_input(self, input_filepath, chunksize=None, input_format=None):
+        """
+        Read the input data, through the ingest cache if there is one.
+
+        Parameters:
+        - input_filepath (str): The path to the input file.
+        - chunksize (int, optional): Read the input in chunks of this many rows instead of all at once.
+        - input_format (str, optional): The file format, worked out from the extension if not given.
+
+        Returns:
+        iterable: The input data, as one DataFrame or one DataFrame per chunk.
+        """
+        if chunksize is not None:
+            return file_backends.read_input_chunks(input_filepath, chunksize, input_format)
+        if self.ingest_cache is not None:
+            return [self.ingest_cache.read(input_filepath, input_format)]
+        return [file_backends.read_input(input_filepath, input_format)]
+
+    def process_shards(self, handbook, input_data, workers, reporter=None):
+        """
+        Split the students into shards by a hash of their Person_ID and build the output
+        of each shard in its own worker process.
+
+        Parameters:
+        - handbook (Handbook_snapshot): The handbook, sent to every worker.
+        - input_data (iterable): The input data, as one DataFrame or one DataFrame per chunk.
+        - workers (int): The number of shards and worker processes.
+        - reporter (Progress_reporter, optional): Reports progress and checks for cancellation.
+
+        Returns:
+        tuple: The processed student data DataFrame and the Cohort_state of every student.
+        """
+        # All the rows of a student go to the same shard
+        reporter = reporter or Progress_reporter()
+        shards = [[] for _ in range(workers)]
+        for chunk in input_data:
+            reporter.check_cancelled()
+            reporter.add_rows(len(chunk))
+            shard_numbers = pd.util.hash_array(chunk['Person_ID'].to_numpy()) % workers
+            for shard_number, shard_rows in chunk.groupby(shard_numbers):
+                shards[shard_number].append(shard_rows)
+
+        # The workers run every remaining stage but writing
+        reporter.stage('adjust')
+        reporter.note("Approximate: the wall time of the worker processes, which also run the eligibility and "
+                      "WAM stages; peak memory is that of the main process only")
+        shards = [pd.concat(shard_chunks) for shard_chunks in shards if shard_chunks]
+        reporter.add_rows(sum(len(shard) for shard in shards))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(process_shard, handbook, shard) for shard in shards]
+            results = []
+            for future in futures:
+                try:
+                    reporter.check_cancelled()
+                except Processing_cancelled:
+                    # Shards not started yet are dropped, running ones are left to finish
+                    executor.shutdown(cancel_futures=True)
+                    raise
+                results.append(future.result())
+
+        cohort = Cohort_state(handbook)
+        for _, shard_cohort in results:
+            cohort.merge(shard_cohort)
+        cohort.consolidate()
+
+        # Same Person_ID order as the serial path, which follows the consolidated cohort, keeping a
+        # student's rows in the order they were built. Person_IDs are not cast, as they need not be numbers.
+        output = pd.concat([shard_output for shard_output, _ in results])
+        order = cohort.personal_data.index.astype(str).get_indexer(output['Person_ID'].astype(str))
+        return output.iloc[np.argsort(order, kind='stable')].reset_index(drop=True), cohort
+
+    def build_output(self, cohort, reporter=None):
+        """
+        Calculate eligability, EH-WAM and honours classifications from the per student state.
+        
+        Parameters:
+        - cohort (Cohort_state): The per student state of the input data.
+        - reporter (Progress_reporter, optional): Reports progress and checks for cancellation.
+        
+        Returns:
+        pd.DataFrame: The processed student data DataFrame.
+        """
+        reporter = reporter or Progress_reporter()
+        reporter.stage('eligibility')
+        cohort.consolidate()
+        reporter.add_rows(len(cohort.student_units))
 
         # Calculate Eligability before WAM
-        # 1. Get all students by unique Person_ID and their major (person_id,major,list of [unit_code,grade,mark,credit_points])
-        # 2. only include units that have passed - use the passed function
-        eligability_data = input_data[input_data.apply(lambda x: self.passed(x['Grade']), axis=1)]
-        eligability_data = eligability_data.groupby(['Person_ID', 'Major_Deg']).apply(
-            lambda x: x[['Unit_Code','Grade','Relevant_Credit_Points']].values.tolist()
-        )
-
-        comments = {}
-        student_eligable = {}
-        # For each person id x major, get all the major_id for all years
-        for index, row in eligability_data.items():
-            eligable = False
-            # turns their unit_codes into a set
-            unit_codes = set([unit[0].strip() for unit in row])
-            major_ids = self.handbookDB.get_major_ids(index[1])
-            # for each major id, get the rules
-            # comments is user_id : {major_id: ['comment']}
-            for major_id in major_ids:
-                major_eligable = True
-                rules = self.handbookDB.fetch_major_rules_verbose_by_id(major_id)
-                for rule in rules:
-                    required_credit_points = rule[1]
-                    current_credit_points = 0
-
-                    # Zero credit point unit check
-                    zero_cp_units = [unit[0] for unit in rule[2] if unit[1] == 0]
-                    
-                    # Filter out GENG4411 since GENG4412 is taken sequentially and will flag as not eligable
-                    zero_cp_units = [unit for unit in zero_cp_units if unit not in IGNORED_ZERO_CREDIT_POINT_UNITS]
-
-                    for z_unit in zero_cp_units:
-                        if z_unit not in unit_codes:
-                            if index[0] not in comments:
-                                comments[index[0]] = {}
-                            if major_id not in comments[index[0]]:
-                                comments[index[0]][major_id] = []
-                            comments[index[0]][major_id].append(f'Student has not completed 0 credit point unit: {z_unit}')
-                            major_eligable = False
-
-                    for unit in rule[2]:
-                        if unit[0] in unit_codes:
-                            current_credit_points += unit[1]
-                    if current_credit_points < required_credit_points:
-                        if index[0] not in comments:
-                            comments[index[0]] = {}
-                        if major_id not in comments[index[0]]:
-                            comments[index[0]][major_id] = []
-                        # Missing [number of missing credit points] credit points for [rule id]
-                        comments[index[0]][major_id].append(f'Missing {required_credit_points - current_credit_points} credit points for rule {rule[0]}')
-                        major_eligable = False
-
-                if major_eligable:
-                    eligable = True
-                    if index[0] not in student_eligable:
-                        student_eligable[index[0]] = []
-                    student_eligable[index[0]].append(major_id)
-                    
-            if eligable:
-                units_done = self.completed_sufficient_units(row)
-                eligable = (units_done >= REQUIRED_TOTAL_CREDIT_POINTS)
-                if not eligable:
-                    if index[0] not in comments:
-                        comments[index[0]] = {}
-                    if major_id not in comments[index[0]]:
-                        comments[index[0]][major_id] = []
-                    if index[0] not in student_eligable:
-                        student_eligable[index[0]] = []    
-                    comments[index[0]][major_id].append(f"Insufficient credit points to graduate. Completed {units_done} credit points of {REQUIRED_TOTAL_CREDIT_POINTS}")
-                    student_eligable[index[0]][0] = 'Not Eligable'
-            if not eligable:
-                if index[0] not in student_eligable:
-                    student_eligable[index[0]] = []
-                student_eligable[index[0]].append('Not Eligable')
-
-        # removes all duplicate comments
+        # comments is user_id : {major_id: ['comment']}
+        comments, student_eligable = Eligibility_evaluator(cohort.handbook).evaluate(cohort.student_units, cohort.credit_totals)
+
+        # removes all duplicate comments, keeping the order they were found in
         for person_id in comments:
             for major_id in comments[person_id]:
-                comments[person_id][major_id] = list(set(comments[person_id][major_id]))
-
-        # Filter out rows with missing or None values and for Level 3/4/5 units
-        relevant_data_adjusted = input_data.dropna(subset=['Adjusted_Mark', 'Relevant_Credit_Points'])
-        relevant_units_adjusted = relevant_data_adjusted[relevant_data_adjusted['Unit_Code'].str[4].isin(['3', '4', '5'])]
-
-        # Get the major - make sure that the unitcode is in the major
-        # Filter out units that are not in the major
-        relevant_units_adjusted = relevant_units_adjusted[relevant_units_adjusted.apply(lambda x: self.handbookDB.unit_in_major(x['Unit_Code'], x['Major_Deg']), axis=1)]
+                comments[person_id][major_id] = list(dict.fromkeys(comments[person_id][major_id]))
 
         # Calculate the EH-WAM
-        eh_wam_values_adjusted = relevant_units_adjusted.groupby('Person_ID').apply(
-            lambda x: (x['Adjusted_Mark'] * x['Relevant_Credit_Points']).sum() / x['Relevant_Credit_Points'].sum()
-        )
-
-        eh_wam_adjusted = pd.DataFrame(eh_wam_values_adjusted, columns=['EH-WAM']).reset_index()
+        reporter.stage('WAM')
+        reporter.add_rows(len(cohort.wam_inputs))
+        eh_wam_adjusted = grading.eh_wam_from_totals(cohort.wam_totals()).rename('EH-WAM').reset_index()
         eh_wam_adjusted['EH-WAM'] = eh_wam_adjusted['EH-WAM'].round(3)
 
         # Determine GENG4412 completion and mark for each student
-        geng4412_data = input_data[input_data['Unit_Code'] == 'GENG4412'][['Person_ID', 'Mark']]
-        merged_data_adjusted = pd.merge(eh_wam_adjusted, geng4412_data, on='Person_ID', how='left')
+        merged_data_adjusted = pd.merge(eh_wam_adjusted, cohort.geng4412_marks, on='Person_ID', how='left')
 
-        # 1. Take the Surname, Given Names, Course_Code, Course_Title, Major_Deg from the lowest row number for each Person_ID
+        # 1. Take the Surname, Given Names, Course_Code, Course_Title, Major_Deg from the last row with a value for each Person_ID
         # Join on Person_ID
-        personal_data = input_data.groupby('Person_ID').last().reset_index()[['Person_ID', 'Surname', 'Given Names', 'Course_Code', 'Course_Title', 'Major_Deg']]
+        personal_data = cohort.personal_data.reset_index()[['Person_ID', 'Surname', 'Given Names', 'Course_Code', 'Course_Title', 'Major_Deg']]
+        # Categories are only kept while processing, the output has plain columns
+        personal_data = personal_data.astype({column: object for column in PERSONAL_COLUMNS})
         merged_data_adjusted = pd.merge(personal_data, merged_data_adjusted, on='Person_ID', how='left')
 
         merged_data_adjusted.rename(columns={'Mark': 'GENG4412 Mark'}, inplace=True)
 
         # Creates another column called 'Completed GENG4412 (Y/N)' and fills it with 'Y' if the student has completed GENG4412
-        # Highlights with a 'N' if the student has not completed GENG4412 in red
         merged_data_adjusted['Completed GENG4412 (Y/N)'] = merged_data_adjusted['GENG4412 Mark'].apply(lambda x: 'Y' if not pd.isna(x) else 'N')
-        merged_data_adjusted.style.apply(lambda x: ['color: red' if v == 'N' else '' for v in x], axis=1, subset=['Completed GENG4412 (Y/N)'])
 
         # Assign Honours classification
         merged_data_adjusted['Honours Class'] = merged_data_adjusted.apply(self.assign_honours, axis=1)
 
+        # Add in comments only if the student is not eligable
+        merged_data_adjusted = pd.merge(merged_data_adjusted, eligibility_results(comments, student_eligable), on='Person_ID', how='left')
+        merged_data_adjusted['Missing Information (Y/N)'] = merged_data_adjusted['Missing Information (Y/N)'].fillna('N')
+        merged_data_adjusted['Comments (missing information)'] = merged_data_adjusted['Comments (missing information)'].fillna('')
+
         # Turns Person_ID into a string
         merged_data_adjusted['Person_ID'] = merged_data_adjusted['Person_ID'].astype(str)
 
-        # Adds two empty columns - 'Missing Information (Y/N)' - 'Comments (missing information)'
-        merged_data_adjusted['Missing Information (Y/N)'] = ''
-        merged_data_adjusted['Comments (missing information)'] = ''
-
-        # Add in comments only if the student is not eligable
-        for index, row in merged_data_adjusted.iterrows():
-            person_id = int(row['Person_ID'])
-            if person_id in comments:
-                if student_eligable[person_id][0] == 'Not Eligable':
-                    merged_data_adjusted.at[index, 'Missing Information (Y/N)'] = 'Y'
-                    comment_string = ''
-                    for major_id in comments[person_id]:
-                        comment_string += ', '.join(comments[person_id][major_id])
-                        comment_string += '\n'
-                    merged_data_adjusted.at[index, 'Comments (missing information)'] = comment_string
-                else:
-                    merged_data_adjusted.at[index, 'Missing Information (Y/N)'] = 'N'
-                    merged_data_adjusted.at[index, 'Comments (missing information)'] = ''
-            else:
-                merged_data_adjusted.at[index, 'Missing Information (Y/N)'] = 'N'
-                merged_data_adjusted.at[index, 'Comments (missing information)'] = ''
-
         # Order of columns
         merged_data_adjusted = merged_data_adjusted[['Person_ID', 'Surname', 'Given Names', 'Course_Code', 'Course_Title', 'Major_Deg', 'Completed GENG4412 (Y/N)','GENG4412 Mark', 'EH-WAM',  'Honours Class', 'Missing Information (Y/N)', 'Comments (missing information)']]
-        # Save the processed data to an output Excel file (optional)
-        with ExcelWriter(output_filepath, engine='openpyxl') as writer:
-            merged_data_adjusted.to_excel(writer, index=False, sheet_name='Sheet1')
 
-            # Access the workbook and worksheet to set the auto-filter
-            worksheet = writer.sheets['Sheet1']
-            worksheet.auto_filter.ref = worksheet.dimensions
+        return merged_data_adjusted
+
+    def reevaluate(self, handbook=None):
+        """
+        Re-evaluate the last processed file after the handbook has been edited.
+
+        Eligability and EH-WAM are only recalculated for students with units under a major whose
+        rules or units changed since the last run. last_output is updated with the new rows.
+
+        Parameters:
+        - handbook (Handbook_snapshot, optional): Use this snapshot of the edited handbook instead of loading
+          one from the database, e.g. when re-evaluating in another thread than the database connection's.
+
+        Returns:
+        pd.DataFrame: The recalculated rows of the affected students (empty if none are affected).
+        """
+        if self.last_cohort is None:
+            raise ValueError("No file has been processed yet")
+
+        if handbook is None:
+            handbook = self.load_handbook()
+        changed_majors = self.last_cohort.handbook.changed_majors(handbook)
+        self.last_cohort.handbook = handbook
+
+        affected_person_ids = self.last_cohort.students_in_majors(changed_majors)
+        if len(affected_person_ids) == 0:
+            return self.last_output.iloc[0:0]
+
+        changed_rows = self.build_output(self.last_cohort.subset(affected_person_ids))
+
+        # Swap in the new rows, keeping the Person_ID order of the full output
+        kept_rows = self.last_output[~self.last_output['Person_ID'].isin(changed_rows['Person_ID'])]
+        output = pd.concat([kept_rows, changed_rows])
+        order = self.last_cohort.personal_data.index.astype(str).get_indexer(output['Person_ID'])
+        self.last_output = output.iloc[np.argsort(order, kind='stable')].reset_index(drop=True)
+
+        return changed_rows
+
+    def write_output(self, output_data, output_filepath, output_format=None):
+        """
+        Write the processed student data to an output file. Excel output gets an auto-filter and
+        students who have not completed GENG4412 highlighted in red.
+        
+        Parameters:
+        - output_data (pd.DataFrame): The processed student data DataFrame.
+        - output_filepath (str): The path to the output file to be created.
+        - output_format (str, optional): 'excel', 'csv', 'parquet' or 'feather', from the extension if not given.
+        """
+        file_backends.write_output(output_data, output_filepath, output_format)
+
+
+def process_shard(handbook, shard_data):
+    """
+    Build the output of one shard of students. Runs in a worker process.
+
+    Parameters:
+    - handbook (Handbook_snapshot): The handbook.
+    - shard_data (pd.DataFrame): Every input row of the students in the shard.
+
+    Returns:
+    tuple: The processed shard DataFrame and the Cohort_state of the shard, without its handbook.
+    """
+    cohort = Cohort_state(handbook)
+    cohort.add(shard_data)
+    shard_output = Marks_processor(handbookDB=None).build_output(cohort)
 
-        return merged_data_adjusted
\ No newline at end of file
+    # The parent process already has the handbook, so it is not sent back
+    cohort.handbook = None
+    return shard_output, cohort
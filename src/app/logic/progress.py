@@ -0,0 +1,89 @@
+"""
+This file reports the progress of processing a file, and stops it when it is cancelled
+"""
+
+# Stages of Marks_processor.process_file, in the order they run
+PROCESSING_STAGES = ['load', 'adjust', 'eligibility', 'WAM', 'write']
+
+# Reported once the output file has been written
+DONE_STAGE = 'done'
+
+
+class Processing_cancelled(Exception):
+    """
+    Raised by Marks_processor.process_file when the run has been cancelled.
+    """
+
+
+class Progress_reporter():
+    def __init__(self, callback=None, cancel_event=None, instrumentation=None) -> None:
+        """
+        Constructor of the Progress_reporter class.
+
+        Parameters:
+        - callback (callable, optional): Called as callback(stage, fraction) when a stage starts,
+          fraction being the share of the stages already finished (0 to 1).
+          It is called from the thread doing the processing.
+        - cancel_event (threading.Event, optional): Set from another thread to cancel the run.
+        - instrumentation (Instrumentation, optional): Records the time, rows and memory of each stage.
+        """
+        self.callback = callback
+        self.cancel_event = cancel_event
+        self.instrumentation = instrumentation
+        # Index in PROCESSING_STAGES of the furthest stage reported to the callback
+        self.furthest_stage = -1
+
+    def stage(self, stage):
+        """
+        Report that a stage has started, stopping first if the run has been cancelled.
+
+        A stage made of several steps (e.g. one per chunk) can be reported once per step, and
+        stages can take turns, e.g. reading and adjusting each chunk. Their time is added up per
+        stage, and the callback is only called the first time each stage is reached.
+
+        Parameters:
+        - stage (str): One of PROCESSING_STAGES.
+        """
+        self.check_cancelled()
+        if self.instrumentation is not None:
+            self.instrumentation.start_stage(stage)
+
+        stage_index = PROCESSING_STAGES.index(stage)
+        if stage_index > self.furthest_stage:
+            self.furthest_stage = stage_index
+            if self.callback is not None:
+                self.callback(stage, stage_index / len(PROCESSING_STAGES))
+
+    def note(self, text):
+        """
+        Note how the numbers of the current stage should be read, e.g. that they are approximate.
+
+        Parameters:
+        - text (str): The note.
+        """
+        if self.instrumentation is not None:
+            self.instrumentation.note(text)
+
+    def add_rows(self, rows):
+        """
+        Record the number of rows the current stage worked on.
+
+        Parameters:
+        - rows (int): The number of rows.
+        """
+        if self.instrumentation is not None:
+            self.instrumentation.add_rows(rows)
+
+    def done(self):
+        """
+        Report that the run has finished.
+        """
+        if self.callback is not None:
+            self.callback(DONE_STAGE, 1.0)
+
+    def check_cancelled(self):
+        """
+        Raise Processing_cancelled if the run has been cancelled.
+        """
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise Processing_cancelled("Processing was cancelled")
@@ -0,0 +1,47 @@
+from app.databases.sqlite_handbookDB import Sqlite_handbookDB
+from app.logic import file_backends
+from app.logic.batch_runner import find_input_files, run_batch
+
+import argparse
+import os
+import sys
+
+
+# Get the directory where the batch.py file is located
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Process many marks input files without the GUI.")
+    parser.add_argument("inputs", nargs="+", help="input files, directories or glob patterns")
+    parser.add_argument("-o", "--output-dir", required=True, help="directory the output files are written to")
+    parser.add_argument("-f", "--output-format", choices=list(file_backends.FORMAT_EXTENSIONS),
+                        help="output file format (default: the format of each input file)")
+    parser.add_argument("-j", "--jobs", type=int, help="number of files processed at once (default: number of CPUs)")
+    parser.add_argument("--summary", help="summary CSV file (default: OUTPUT_DIR/batch_summary.csv)")
+    parser.add_argument("--handbook", default=os.path.join(current_dir, "handbook.db"), help="handbook database")
+    args = parser.parse_args(argv)
+
+    if not os.path.isfile(args.handbook):
+        print(f"Handbook database not found: {args.handbook}", file=sys.stderr)
+        return 1
+
+    input_files = find_input_files(args.inputs)
+    if not input_files:
+        print("No input files found")
+        return 1
+
+    handbook_db = Sqlite_handbookDB(args.handbook, read_only=True)
+    try:
+        output_extension = file_backends.FORMAT_EXTENSIONS[args.output_format] if args.output_format else None
+        summary = run_batch(handbook_db, input_files, args.output_dir, output_extension, args.jobs, args.summary)
+    finally:
+        handbook_db.conn.close()
+
+    failed = (summary['Status'] != 'OK').sum()
+    print(f"Processed {len(summary) - failed} of {len(summary)} files in {summary.attrs['elapsed_seconds']:.2f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,5 @@
 from app.TkinterGui.main_window import Main_window
 from app.databases.sqlite_handbookDB import Sqlite_handbookDB
-from app.logic.marks_processor import Marks_processor
 
 import os
 
@@ -11,18 +10,18 @@ os.chdir(current_dir)
 
 handbook_db_file = 'handbook.db'
 handbook_db_path = os.path.join(current_dir, handbook_db_file)
-handbook_db = Sqlite_handbookDB(handbook_db_path)
 
 
 def main():
-    marks_processor = Marks_processor(handbookDB=handbook_db)
-
-    main_window = Main_window(marks_processor=marks_processor, handbook_db=handbook_db)
-    main_window.draw_window()
+    # Opened here rather than on import, so importing main does not touch the database
+    handbook_db = Sqlite_handbookDB(handbook_db_path)
+    try:
+        # The Marks_processor is created by the window when a file is first processed
+        main_window = Main_window(handbook_db=handbook_db)
+        main_window.draw_window()
+    finally:
+        handbook_db.db_commit()
 
 
 if __name__ == "__main__":
-    try:
-        main()
-    finally:
-        handbook_db.db_commit()
\ No newline at end of file
+    main()
@@ -0,0 +1,79 @@
+import unittest
+from unittest import mock
+
+# set path to the src dir so the app package can be imported
+import sys
+import os
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.append(src_dir)
+
+import shutil
+import tempfile
+
+import pandas as pd
+
+from app.databases.sqlite_handbookDB import Sqlite_handbookDB
+from app.logic import batch_runner
+from app.logic.batch_runner import find_input_files, run_batch
+
+HANDBOOK_DB_PATH = os.path.join(src_dir, "handbook.db")
+EXAMPLE_INPUT_PATH = os.path.abspath(os.path.join(src_dir, "..", "test_files", "Example Data BEHons.xlsx"))
+
+
+def crash_on_broken_file(handbook, input_filepath, output_filepath):
+    # Kill the worker process, as a crash in a native library would
+    if "broken" in input_filepath:
+        os._exit(1)
+    return batch_runner.process_input_file(handbook, input_filepath, output_filepath)
+
+class TestBatchRunner(unittest.TestCase):
+    def setUp(self) -> None:
+        # work on a copy so the shipped handbook is never modified
+        self.temp_dir = tempfile.mkdtemp()
+        db_path = os.path.join(self.temp_dir, "handbook.db")
+        shutil.copy(HANDBOOK_DB_PATH, db_path)
+        self.handbook_db = Sqlite_handbookDB(db_path)
+
+        self.input_dir = os.path.join(self.temp_dir, "inputs")
+        self.output_dir = os.path.join(self.temp_dir, "outputs")
+        os.makedirs(self.input_dir)
+        shutil.copy(EXAMPLE_INPUT_PATH, os.path.join(self.input_dir, "perth.xlsx"))
+        pd.read_excel(EXAMPLE_INPUT_PATH).to_csv(os.path.join(self.input_dir, "albany.csv"), index=False)
+        with open(os.path.join(self.input_dir, "broken.csv"), "w") as broken_file:
+            broken_file.write("not,a,marks,file\n")
+        with open(os.path.join(self.input_dir, "notes.txt"), "w") as notes_file:
+            notes_file.write("ignored\n")
+
+    def tearDown(self) -> None:
+        self.handbook_db.conn.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_find_input_files_skips_other_types(self):
+        input_files = find_input_files([self.input_dir])
+
+        self.assertEqual([os.path.basename(path) for path in input_files], ["albany.csv", "broken.csv", "perth.xlsx"])
+
+    def test_failed_file_does_not_stop_batch(self):
+        summary = run_batch(self.handbook_db, find_input_files([self.input_dir]), self.output_dir, jobs=2)
+
+        self.assertEqual(list(summary['Status']), ['OK', 'Failed', 'OK'])
+        self.assertIn("KeyError", summary['Error'][1])
+        self.assertEqual(list(summary['Students']), [5, 0, 5])
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, "albany_processed.csv")))
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, "perth_processed.xlsx")))
+
+        written_summary = pd.read_csv(os.path.join(self.output_dir, "batch_summary.csv"))
+        self.assertEqual(list(written_summary['Status']), ['OK', 'Failed', 'OK'])
+
+    def test_crashed_worker_does_not_stop_batch(self):
+        with mock.patch.object(batch_runner, 'process_input_file', crash_on_broken_file):
+            summary = run_batch(self.handbook_db, find_input_files([self.input_dir]), self.output_dir, jobs=1)
+
+        self.assertEqual(len(summary), 3)
+        self.assertEqual(summary['Status'][1], 'Failed')
+        self.assertIn("BrokenProcessPool", summary['Error'][1])
+        self.assertGreater(summary.attrs['elapsed_seconds'], 0)
+        self.assertEqual(len(pd.read_csv(os.path.join(self.output_dir, "batch_summary.csv"))), 3)
+
+if __name__ == '__main__':
+    unittest.main()
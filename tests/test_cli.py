@@ -0,0 +1,61 @@
+import unittest
+
+# set path to the src dir so the app package can be imported
+import sys
+import os
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.append(src_dir)
+
+import shutil
+import subprocess
+import tempfile
+
+import pandas as pd
+
+HANDBOOK_DB_PATH = os.path.join(src_dir, "handbook.db")
+EXAMPLE_INPUT_PATH = os.path.abspath(os.path.join(src_dir, "..", "test_files", "Example Data BEHons.xlsx"))
+
+class TestCli(unittest.TestCase):
+    def setUp(self) -> None:
+        # work on a copy so the shipped handbook is never modified
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, "handbook.db")
+        shutil.copy(HANDBOOK_DB_PATH, self.db_path)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.temp_dir)
+
+    def run_cli(self, *args):
+        return subprocess.run([sys.executable, "-m", "app", *args], cwd=src_dir, capture_output=True, text=True)
+
+    def test_process_command(self):
+        output_path = os.path.join(self.temp_dir, "output.csv")
+        result = self.run_cli("process", EXAMPLE_INPUT_PATH, output_path, "--handbook", self.db_path)
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("Processed 5 students", result.stdout)
+        self.assertEqual(len(pd.read_csv(output_path)), 5)
+
+    def test_missing_input_file(self):
+        result = self.run_cli("process", os.path.join(self.temp_dir, "missing.xlsx"),
+                              os.path.join(self.temp_dir, "output.csv"), "--handbook", self.db_path)
+
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("Error", result.stderr)
+
+    def test_file_formats_match_backends(self):
+        from app import __main__ as cli
+        from app.logic import file_backends
+
+        self.assertEqual(cli.FILE_FORMATS, list(file_backends.FORMAT_EXTENSIONS))
+
+    def test_batch_missing_handbook(self):
+        result = subprocess.run([sys.executable, "batch.py", EXAMPLE_INPUT_PATH, "-o", self.temp_dir,
+                                 "--handbook", os.path.join(self.temp_dir, "missing.db")],
+                                cwd=src_dir, capture_output=True, text=True)
+
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("Handbook database not found", result.stderr)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+
+# set path to the src dir so the app package can be imported
+import sys
+import os
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.append(src_dir)
+
+import pandas as pd
+
+from app.databases.handbook_snapshot import Handbook_snapshot
+from app.logic.eligibility import Eligibility_evaluator, eligibility_results
+
+# One major with two years: 2022 needs 12 credit points from rule 1,
+# 2023 also needs GENG1000 (zero credit points) through rule 2
+MAJOR_IDS = {'Test Engineering': [1, 2]}
+MAJOR_RULES = {
+    1: [(1, 12, [('ENSC1001', 6), ('ENSC1002', 6), ('ENSC1003', 6)])],
+    2: [(1, 12, [('ENSC1001', 6), ('ENSC1002', 6), ('ENSC1003', 6)]),
+        (2, 0, [('GENG1000', 0), ('GENG4411', 0)])],
+}
+
+class TestEligibility(unittest.TestCase):
+    def setUp(self) -> None:
+        handbook = Handbook_snapshot(MAJOR_IDS, MAJOR_RULES, major_units={})
+        self.evaluator = Eligibility_evaluator(handbook)
+
+    def evaluate(self, units, credit_totals):
+        student_units = pd.DataFrame(units, columns=['Person_ID', 'Major_Deg', 'Unit_Code'])
+        credit_totals = pd.Series(
+            list(credit_totals.values()),
+            index=pd.MultiIndex.from_tuples(list(credit_totals.keys()), names=['Person_ID', 'Major_Deg'])
+        )
+        return self.evaluator.evaluate(student_units, credit_totals)
+
+    def test_eligable_for_both_years(self):
+        comments, student_eligable = self.evaluate(
+            [(1, 'Test Engineering', 'ENSC1001'), (1, 'Test Engineering', 'ENSC1002'),
+             (1, 'Test Engineering', 'GENG1000')],
+            {(1, 'Test Engineering'): 200}
+        )
+
+        self.assertEqual(comments, {})
+        self.assertEqual(student_eligable, {1: [1, 2]})
+
+    def test_missing_zero_credit_point_unit(self):
+        comments, student_eligable = self.evaluate(
+            [(1, 'Test Engineering', 'ENSC1001'), (1, 'Test Engineering', 'ENSC1002')],
+            {(1, 'Test Engineering'): 200}
+        )
+
+        # GENG4411 is ignored, GENG1000 is not
+        self.assertEqual(comments, {1: {2: ['Student has not completed 0 credit point unit: GENG1000']}})
+        self.assertEqual(student_eligable, {1: [1]})
+
+    def test_missing_credit_points(self):
+        comments, student_eligable = self.evaluate(
+            [(1, 'Test Engineering', 'ENSC1001'), (1, 'Test Engineering', 'GENG1000')],
+            {(1, 'Test Engineering'): 200}
+        )
+
+        self.assertEqual(comments, {1: {1: ['Missing 6 credit points for rule 1'],
+                                        2: ['Missing 6 credit points for rule 1']}})
+        self.assertEqual(student_eligable, {1: ['Not Eligable']})
+
+    def test_insufficient_credit_points_to_graduate(self):
+        comments, student_eligable = self.evaluate(
+            [(1, 'Test Engineering', 'ENSC1001'), (1, 'Test Engineering', 'ENSC1003')],
+            {(1, 'Test Engineering'): 186}
+        )
+
+        self.assertEqual(comments[1][2][-1], 'Insufficient credit points to graduate. Completed 186 credit points of 192')
+        self.assertEqual(student_eligable, {1: ['Not Eligable', 'Not Eligable']})
+
+    def test_unknown_major(self):
+        comments, student_eligable = self.evaluate(
+            [(1, 'Unknown Engineering', 'ENSC1001')],
+            {(1, 'Unknown Engineering'): 200}
+        )
+
+        self.assertEqual(comments, {})
+        self.assertEqual(student_eligable, {1: ['Not Eligable']})
+
+    def test_eligibility_results_only_flags_not_eligable_students(self):
+        comments = {1: {1: ['Missing 6 credit points for rule 1'], 2: ['Missing 6 credit points for rule 1']},
+                    2: {2: ['Student has not completed 0 credit point unit: GENG1000']}}
+        student_eligable = {1: ['Not Eligable'], 2: [1], 3: [1, 2]}
+
+        results = eligibility_results(comments, student_eligable)
+
+        self.assertEqual(list(results['Person_ID']), [1])
+        self.assertEqual(list(results['Missing Information (Y/N)']), ['Y'])
+        self.assertEqual(list(results['Comments (missing information)']),
+                         ['Missing 6 credit points for rule 1\nMissing 6 credit points for rule 1\n'])
+
+if __name__ == '__main__':
+    unittest.main()
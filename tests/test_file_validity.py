@@ -1,34 +1,58 @@
 import unittest
 
-# set path to proj path (parent dir)
+# set path to the src dir so the app package can be imported
 import sys
 import os
-current_dir = os.getcwd()
-proj_dir = os.path.abspath(os.path.join(current_dir, ".."))
-sys.path.append(proj_dir)
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.append(src_dir)
 
-# import 
-from src.app.logic.marks_processor import Marks_processor
+import shutil
+import tempfile
+
+# import
+from app.databases.sqlite_handbookDB import Sqlite_handbookDB
+from app.logic.marks_processor import Marks_processor
+
+HANDBOOK_DB_PATH = os.path.join(src_dir, "handbook.db")
+EXAMPLE_INPUT_PATH = os.path.abspath(os.path.join(src_dir, "..", "test_files", "Example Data BEHons.xlsx"))
 
 class TestExcelProcessing(unittest.TestCase):
     def setUp(self) -> None:
-        self.marks_processor = Marks_processor()
+        # work on a copy so the shipped handbook is never modified
+        self.temp_dir = tempfile.mkdtemp()
+        db_path = os.path.join(self.temp_dir, "handbook.db")
+        shutil.copy(HANDBOOK_DB_PATH, db_path)
+
+        self.handbook_db = Sqlite_handbookDB(db_path)
+        self.marks_processor = Marks_processor(handbookDB=self.handbook_db)
+
+    def tearDown(self) -> None:
+        self.handbook_db.conn.close()
+        shutil.rmtree(self.temp_dir)
+
+    def input_file(self, name):
+        # the example data under another name; Excel files are read by their content, not extension
+        input_file = os.path.join(self.temp_dir, name)
+        shutil.copy(EXAMPLE_INPUT_PATH, input_file)
+        return input_file
 
     # ================================= Valid file testing =================================
-    
+
     def test_valid_file_xls(self):
-        input_file = 'valid_file.xls'
-            
-        output_file = self.marks_processor.process_file(input_file)
-    
+        input_file = self.input_file('valid_file.xls')
+        output_file = os.path.join(self.temp_dir, 'output.xlsx')
+
+        self.marks_processor.process_file(input_file, output_file)
+
         # Check that the output file was created
         self.assertTrue(os.path.exists(output_file), "Output file should be created")
-    
+
     def test_valid_file_xlsx(self):
-        input_file = 'valid_file.xlsx'
-            
-        output_file = self.marks_processor.process_file(input_file)
-    
+        input_file = self.input_file('valid_file.xlsx')
+        output_file = os.path.join(self.temp_dir, 'output.xlsx')
+
+        self.marks_processor.process_file(input_file, output_file)
+
         # Check that the output file was created
         self.assertTrue(os.path.exists(output_file), "Output file should be created")
 
@@ -37,18 +61,23 @@ class TestExcelProcessing(unittest.TestCase):
     # ================================= Invalid file testing =================================
 
     def test_invalid_file(self):
-        input_file = 'invalid_file.csv'
+        # CSV input is supported, so use a file type that is not
+        input_file = self.input_file('invalid_file.txt')
+        output_file = os.path.join(self.temp_dir, 'output.xlsx')
 
-        # Attempt to process the input file, expecting an exception 
+        # Attempt to process the input file, expecting an exception
         with self.assertRaises(Exception) as context:
-            self.marks_processor.process_file(input_file)
+            self.marks_processor.process_file(input_file, output_file)
 
         # Define the expected error message
-        expected_error_message = "Input file is not an Excel file"
+        expected_error_message = "Unsupported file type"
 
-         # Check that the error message matches the expected one
+        # Check that the error message matches the expected one
         self.assertIn(expected_error_message, str(context.exception))
 
+        # Nothing is written for an input that cannot be read
+        self.assertFalse(os.path.exists(output_file))
+
     # ================================= Invalid file testing =================================
 
 if __name__ == '__main__':
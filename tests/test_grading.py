@@ -0,0 +1,67 @@
+import unittest
+
+# set path to the src dir so the app package can be imported
+import sys
+import os
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.append(src_dir)
+
+import numpy as np
+import pandas as pd
+
+from app.logic import grading
+from app.logic.marks_processor import Marks_processor
+
+GRADES = ['FN', 'FC', 'PS', 'N', 'N+', 'P', 'CR', 'D', 'HD', 'UP', 'AC', 'PA', 'WD', 'UF', 'F']
+
+class TestGrading(unittest.TestCase):
+    def setUp(self) -> None:
+        self.marks_processor = Marks_processor(handbookDB=None)
+
+        # every grade against a spread of marks (including missing marks) and credit points
+        rows = []
+        for grade in GRADES:
+            for mark in [np.nan, 0.0, 12.0, 48.0, 49.5, 50.0, 77.0, 100.0]:
+                for enrolled, achievable in [(6, 6), (6, 0), (12, 12), (0, 0)]:
+                    rows.append({'Grade': grade, 'Mark': mark,
+                                 'Enrolled_Credit_Points': enrolled,
+                                 'Achievable_Credit_Points': achievable})
+        self.data = pd.DataFrame(rows)
+
+    def test_adjust_marks_matches_reference(self):
+        expected = self.data.apply(self.marks_processor.adjust_mark, axis=1).astype(float)
+        actual = grading.adjust_marks(self.data)
+
+        pd.testing.assert_series_equal(actual, expected, check_names=False)
+
+    def test_choose_credit_points_matches_reference(self):
+        self.data['Adjusted_Mark'] = self.data.apply(self.marks_processor.adjust_mark, axis=1)
+        expected = self.data.apply(self.marks_processor.choose_credit_points, axis=1)
+
+        self.data['Adjusted_Mark'] = grading.adjust_marks(self.data)
+        actual = grading.choose_credit_points(self.data)
+
+        pd.testing.assert_series_equal(actual, expected, check_names=False, check_dtype=False)
+
+    def test_passed_mask_matches_reference(self):
+        expected = self.data['Grade'].apply(self.marks_processor.passed)
+        actual = grading.passed_mask(self.data)
+
+        pd.testing.assert_series_equal(actual, expected, check_names=False)
+
+    def test_eh_wam_matches_per_student_average(self):
+        data = pd.DataFrame({
+            'Person_ID': [1, 1, 1, 2, 2, 3],
+            'Adjusted_Mark': [80.0, 65.0, 48.0, 90.0, 71.5, 50.0],
+            'Relevant_Credit_Points': [6, 12, 6, 6, 6, 12],
+        })
+        expected = data.groupby('Person_ID').apply(
+            lambda x: (x['Adjusted_Mark'] * x['Relevant_Credit_Points']).sum() / x['Relevant_Credit_Points'].sum()
+        )
+
+        actual = grading.eh_wam(data)
+
+        pd.testing.assert_series_equal(actual.round(3), expected.round(3), check_names=False)
+
+if __name__ == '__main__':
+    unittest.main()
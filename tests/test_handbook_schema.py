@@ -0,0 +1,183 @@
+import unittest
+
+# set path to the src dir so the app package can be imported
+import sys
+import os
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.append(src_dir)
+
+import contextlib
+import io
+import shutil
+import sqlite3
+import stat
+import tempfile
+
+from app.databases.handbook_schema import SCHEMA_VERSION, migrate, schema_version
+from app.databases.sqlite_handbookDB import Sqlite_handbookDB
+
+HANDBOOK_DB_PATH = os.path.join(src_dir, "handbook.db")
+
+# Indexes added by the migrations
+MIGRATION_INDEXES = ['Major_name_year', 'Major_year_name', 'MajorRules_rule_major', 'RuleUnits_rule_unit']
+
+class TestHandbookSchema(unittest.TestCase):
+    def setUp(self) -> None:
+        # work on a copy so the shipped handbook is never modified
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, "handbook.db")
+        shutil.copy(HANDBOOK_DB_PATH, self.db_path)
+
+    def tearDown(self) -> None:
+        os.chmod(self.temp_dir, stat.S_IRWXU)
+        shutil.rmtree(self.temp_dir)
+
+    def unmigrate(self):
+        # the shipped handbook is already migrated, so go back to the handbook as it was first shipped
+        conn = sqlite3.connect(self.db_path)
+        try:
+            for index in MIGRATION_INDEXES:
+                conn.execute(f"DROP INDEX IF EXISTS {index}")
+            conn.execute("PRAGMA user_version = 0")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def make_read_only(self):
+        os.chmod(self.db_path, stat.S_IRUSR)
+        os.chmod(self.temp_dir, stat.S_IRUSR | stat.S_IXUSR)
+
+    def test_shipped_handbook_is_migrated(self):
+        # so opening the app does not change the tracked file
+        conn = sqlite3.connect(f"file:{HANDBOOK_DB_PATH}?mode=ro", uri=True)
+        try:
+            self.assertEqual(schema_version(conn), SCHEMA_VERSION)
+        finally:
+            conn.close()
+
+    def test_migrates_once(self):
+        self.unmigrate()
+        handbook_db = Sqlite_handbookDB(self.db_path)
+        handbook_db.conn.close()
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            self.assertEqual(schema_version(conn), SCHEMA_VERSION)
+            # opening it again has nothing left to run
+            self.assertEqual(migrate(conn), SCHEMA_VERSION)
+        finally:
+            conn.close()
+
+    def test_major_name_and_year_are_unique(self):
+        handbook_db = Sqlite_handbookDB(self.db_path)
+        try:
+            with self.assertRaises(sqlite3.IntegrityError):
+                handbook_db.create_major('Civil Engineering', 2023)
+        finally:
+            handbook_db.conn.close()
+
+    def test_duplicate_majors_still_open(self):
+        self.unmigrate()
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("INSERT INTO Major(name, year) VALUES('Civil Engineering', 2023)")
+        conn.commit()
+        conn.close()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            handbook_db = Sqlite_handbookDB(self.db_path)
+        try:
+            self.assertEqual(handbook_db.schema_version, SCHEMA_VERSION)
+            self.assertEqual(len(handbook_db.get_major_ids('Civil Engineering')), 2)
+        finally:
+            handbook_db.conn.close()
+
+    def test_read_only_connection(self):
+        self.unmigrate()
+        handbook_db = Sqlite_handbookDB(self.db_path, read_only=True)
+        try:
+            # read-only consumers neither migrate the schema nor write
+            self.assertEqual(handbook_db.schema_version, 0)
+            self.assertIn('Civil Engineering', handbook_db.fetch_majors_for_year(2023))
+            with self.assertRaises(sqlite3.OperationalError):
+                handbook_db.create_unit('TEST1000', 6)
+        finally:
+            handbook_db.conn.close()
+
+    def test_read_only_connection_in_read_only_directory(self):
+        # a handbook left in WAL mode, which a mode=ro open alone needs -wal and -shm files for
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.close()
+        self.make_read_only()
+
+        handbook_db = Sqlite_handbookDB(self.db_path, read_only=True)
+        try:
+            self.assertIn('Civil Engineering', handbook_db.fetch_majors_for_year(2023))
+        finally:
+            handbook_db.conn.close()
+        self.assertEqual(os.listdir(self.temp_dir), ["handbook.db"])
+
+    def test_read_only_file_opens_without_migrating(self):
+        self.unmigrate()
+        self.make_read_only()
+        if os.access(self.db_path, os.W_OK):
+            self.skipTest("file permissions are not enforced for this user")
+
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            handbook_db = Sqlite_handbookDB(self.db_path)
+        try:
+            self.assertEqual(handbook_db.schema_version, 0)
+            self.assertIn("cannot be written", output.getvalue())
+            self.assertIn('Civil Engineering', handbook_db.fetch_majors_for_year(2023))
+        finally:
+            handbook_db.conn.close()
+
+    def test_connection_pragmas(self):
+        handbook_db = Sqlite_handbookDB(self.db_path)
+        try:
+            # WAL would be kept in the shipped handbook, so it is only used when asked for
+            self.assertEqual(handbook_db.conn.execute("PRAGMA journal_mode").fetchone()[0], 'delete')
+            self.assertEqual(handbook_db.conn.execute("PRAGMA temp_store").fetchone()[0], 2)
+        finally:
+            handbook_db.conn.close()
+
+        handbook_db = Sqlite_handbookDB(self.db_path, wal=True)
+        try:
+            self.assertEqual(handbook_db.conn.execute("PRAGMA journal_mode").fetchone()[0], 'wal')
+        finally:
+            handbook_db.conn.close()
+
+    def test_hot_queries_do_not_scan(self):
+        handbook_db = Sqlite_handbookDB(self.db_path)
+        major_id = handbook_db.get_major_id('Civil Engineering', 2023)
+        rule_id = handbook_db.fetch_major_rules('Civil Engineering', 2023)[0][0]
+
+        # record the statements the lookups actually run
+        statements = []
+        handbook_db.conn.set_trace_callback(statements.append)
+        with contextlib.redirect_stdout(io.StringIO()):
+            handbook_db.select_all_rules('Civil Engineering', 2023)
+            handbook_db.select_all_major_units('Civil Engineering', 2023)
+            handbook_db.fetch_major_rules('Civil Engineering', 2023)
+            handbook_db.fetch_major_rules_verbose('Civil Engineering', 2023)
+            handbook_db.fetch_major_rules_verbose_by_id(major_id)
+            handbook_db.fetch_rule_major(rule_id)
+            handbook_db.fetch_rule_verbose(rule_id)
+            handbook_db.fetch_unit_rules(rule_id)
+            handbook_db.unit_in_major('GENG4412', 'Civil Engineering')
+            handbook_db.get_major_id('Civil Engineering', 2023)
+            handbook_db.get_major_ids('Civil Engineering')
+            handbook_db.fetch_majors_for_year(2023)
+        handbook_db.conn.set_trace_callback(None)
+
+        try:
+            self.assertEqual(len(statements), 12)
+            for statement in statements:
+                plan = [row[3] for row in handbook_db.conn.execute("EXPLAIN QUERY PLAN " + statement)]
+                scans = [step for step in plan if step.startswith("SCAN")]
+                self.assertEqual(scans, [], f"{' '.join(statement.split())} scans a table: {plan}")
+        finally:
+            handbook_db.conn.close()
+
+if __name__ == '__main__':
+    unittest.main()
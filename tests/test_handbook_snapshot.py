@@ -0,0 +1,81 @@
+import unittest
+
+# set path to the src dir so the app package can be imported
+import sys
+import os
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.append(src_dir)
+
+import shutil
+import tempfile
+
+import pandas as pd
+
+from app.databases.sqlite_handbookDB import Sqlite_handbookDB
+from app.databases.handbook_snapshot import Handbook_snapshot
+
+HANDBOOK_DB_PATH = os.path.join(src_dir, "handbook.db")
+
+class TestHandbookSnapshot(unittest.TestCase):
+    def setUp(self) -> None:
+        # work on a copy so the shipped handbook is never modified
+        self.temp_dir = tempfile.mkdtemp()
+        db_path = os.path.join(self.temp_dir, "handbook.db")
+        shutil.copy(HANDBOOK_DB_PATH, db_path)
+
+        self.handbook_db = Sqlite_handbookDB(db_path)
+        self.snapshot = Handbook_snapshot.from_db(self.handbook_db)
+
+    def tearDown(self) -> None:
+        self.handbook_db.conn.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_units_in_majors_matches_database(self):
+        majors = [name for name, _ in self.handbook_db.fetch_all_majors()] + ['Unknown Engineering']
+        unit_codes = self.handbook_db.fetch_all_units() + ['ZZZZ9999']
+
+        pairs = pd.DataFrame([(major, unit_code) for major in majors for unit_code in unit_codes],
+                             columns=['Major_Deg', 'Unit_Code'])
+        expected = [self.handbook_db.unit_in_major(unit_code, major)
+                    for major, unit_code in zip(pairs['Major_Deg'], pairs['Unit_Code'])]
+        actual = self.snapshot.units_in_majors(pairs['Unit_Code'], pairs['Major_Deg'])
+
+        self.assertEqual(list(actual), expected)
+        self.assertTrue(any(expected), "Handbook should link at least one unit to a major")
+
+    def test_bulk_rules_match_per_major_queries(self):
+        major_ids = [major_id for ids in self.snapshot.major_ids.values() for major_id in ids]
+
+        for major_id in major_ids:
+            expected = self.handbook_db.fetch_major_rules_verbose_by_id(major_id)
+            actual = self.snapshot.fetch_major_rules_verbose_by_id(major_id)
+
+            # unit order inside GROUP_CONCAT is not defined, so compare units as sorted lists
+            self.assertEqual([(rule_id, value, sorted(units)) for rule_id, value, units in actual],
+                             [(rule_id, value, sorted(units)) for rule_id, value, units in expected])
+
+    def test_get_major_ids_matches_database(self):
+        for major, _ in self.handbook_db.fetch_all_majors():
+            self.assertEqual(self.snapshot.get_major_ids(major), self.handbook_db.get_major_ids(major))
+        self.assertEqual(self.snapshot.get_major_ids('Unknown Engineering'), [])
+
+    def test_unit_in_major(self):
+        major, unit_codes = next(iter(self.snapshot.major_units.items()))
+        unit_code = next(iter(unit_codes))
+
+        self.assertTrue(self.snapshot.unit_in_major(unit_code, major))
+        self.assertFalse(self.snapshot.unit_in_major(unit_code, 'Unknown Engineering'))
+
+    def test_changed_majors(self):
+        self.assertEqual(self.snapshot.changed_majors(Handbook_snapshot.from_db(self.handbook_db)), set())
+
+        major_id = self.handbook_db.get_major_ids('Civil Engineering')[0]
+        rule_id, _, units = self.handbook_db.fetch_major_rules_verbose_by_id(major_id)[0]
+        self.handbook_db.unlink_unit_rule(units[0][0], rule_id)
+
+        changed = self.snapshot.changed_majors(Handbook_snapshot.from_db(self.handbook_db))
+        self.assertIn('Civil Engineering', changed)
+        self.assertNotIn('Software Engineering', changed)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import unittest
+from unittest import mock
+
+# set path to the src dir so the app package can be imported
+import sys
+import os
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.append(src_dir)
+
+import pickle
+import shutil
+import stat
+import tempfile
+import time
+
+import pandas as pd
+
+from app.logic import file_backends
+from app.logic.ingest_cache import Ingest_cache
+
+EXAMPLE_INPUT_PATH = os.path.abspath(os.path.join(src_dir, "..", "test_files", "Example Data BEHons.xlsx"))
+
+class TestIngestCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache = Ingest_cache(cache_dir=os.path.join(self.temp_dir, "cache"))
+
+        self.input_path = os.path.join(self.temp_dir, "input.xlsx")
+        shutil.copy(EXAMPLE_INPUT_PATH, self.input_path)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.temp_dir)
+
+    def test_second_read_skips_parsing(self):
+        expected = self.cache.read(self.input_path)
+
+        with mock.patch.object(file_backends, 'read_input', side_effect=AssertionError("input was parsed again")):
+            actual = self.cache.read(self.input_path)
+
+        pd.testing.assert_frame_equal(actual, expected)
+
+    def test_modified_file_misses(self):
+        self.cache.read(self.input_path)
+
+        # a new modification time is a new key
+        modified_time = time.time() + 10
+        os.utime(self.input_path, (modified_time, modified_time))
+
+        self.assertIsNone(self.cache.get(self.input_path))
+
+    def test_content_hash_survives_touch(self):
+        cache = Ingest_cache(cache_dir=os.path.join(self.temp_dir, "hashed"), hash_contents=True)
+        cache.read(self.input_path)
+
+        modified_time = time.time() + 10
+        os.utime(self.input_path, (modified_time, modified_time))
+
+        self.assertIsNotNone(cache.get(self.input_path))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        other_path = os.path.join(self.temp_dir, "other.xlsx")
+        newest_path = os.path.join(self.temp_dir, "newest.xlsx")
+        shutil.copy(EXAMPLE_INPUT_PATH, other_path)
+        shutil.copy(EXAMPLE_INPUT_PATH, newest_path)
+
+        self.cache.read(self.input_path)
+        entry_size = self.cache.entries()[0][2]
+        self.cache.max_bytes = 2 * entry_size
+
+        self.cache.read(other_path)
+        # use the first entry again so other.xlsx becomes the least recently used
+        time.sleep(0.01)
+        self.cache.get(self.input_path)
+        time.sleep(0.01)
+        self.cache.read(newest_path)
+
+        self.assertEqual(len(self.cache.entries()), 2)
+        self.assertIsNotNone(self.cache.get(self.input_path))
+        self.assertIsNone(self.cache.get(other_path))
+
+    @unittest.skipUnless(hasattr(os, "getuid"), "file owners are POSIX only")
+    def test_cache_dir_is_private(self):
+        self.cache.read(self.input_path)
+
+        self.assertEqual(stat.S_IMODE(os.stat(self.cache.cache_dir).st_mode), 0o700)
+        for file_name in os.listdir(self.cache.cache_dir):
+            self.assertEqual(stat.S_IMODE(os.stat(os.path.join(self.cache.cache_dir, file_name)).st_mode), 0o600)
+
+        # an existing directory others can use is made private again
+        shared_dir = os.path.join(self.temp_dir, "shared")
+        os.mkdir(shared_dir)
+        os.chmod(shared_dir, 0o777)
+        Ingest_cache(cache_dir=shared_dir)
+        self.assertEqual(stat.S_IMODE(os.stat(shared_dir).st_mode), 0o700)
+
+    @unittest.skipUnless(hasattr(os, "getuid"), "file owners are POSIX only")
+    def test_cache_dir_of_another_user_is_refused(self):
+        with mock.patch.object(os, 'getuid', return_value=os.stat(self.cache.cache_dir).st_uid + 1):
+            with self.assertRaises(PermissionError):
+                Ingest_cache(cache_dir=self.cache.cache_dir)
+
+        link_path = os.path.join(self.temp_dir, "link")
+        os.symlink(self.cache.cache_dir, link_path)
+        with self.assertRaises(PermissionError):
+            Ingest_cache(cache_dir=link_path)
+
+    def test_unsigned_entry_is_not_unpickled(self):
+        expected = self.cache.read(self.input_path)
+        entry_path = self.cache.entries()[0][0]
+
+        # a valid pickle planted without the cache's signature
+        with open(entry_path, 'wb') as entry_file:
+            pickle.dump(expected, entry_file)
+        with mock.patch.object(pickle, 'loads', side_effect=AssertionError("unsigned entry was unpickled")):
+            self.assertIsNone(self.cache.get(self.input_path))
+        self.assertFalse(os.path.exists(entry_path))
+
+        # a signed entry changed afterwards
+        self.cache.read(self.input_path)
+        with open(entry_path, 'r+b') as entry_file:
+            entry_file.seek(-1, os.SEEK_END)
+            last_byte = entry_file.read(1)
+            entry_file.seek(-1, os.SEEK_END)
+            entry_file.write(bytes([last_byte[0] ^ 0xFF]))
+        self.assertIsNone(self.cache.get(self.input_path))
+
+        # a cache with another key does not trust the entries either
+        self.cache.read(self.input_path)
+        os.remove(os.path.join(self.cache.cache_dir, "signing.key"))
+        self.assertIsNone(Ingest_cache(cache_dir=self.cache.cache_dir).get(self.input_path))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,355 @@
+import unittest
+
+# set path to the src dir so the app package can be imported
+import sys
+import os
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.append(src_dir)
+
+import importlib.util
+import json
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+import openpyxl
+import pandas as pd
+
+from app.databases.sqlite_handbookDB import Sqlite_handbookDB
+from app.logic import file_backends
+from app.logic.cohort_state import Cohort_state, WAM_KEYS
+from app.logic.file_backends import read_excel_chunks
+from app.logic.ingest_cache import Ingest_cache
+from app.logic.instrumentation import Instrumentation
+from app.logic.marks_processor import Marks_processor
+from app.logic.progress import PROCESSING_STAGES, Processing_cancelled
+
+HANDBOOK_DB_PATH = os.path.join(src_dir, "handbook.db")
+EXAMPLE_INPUT_PATH = os.path.abspath(os.path.join(src_dir, "..", "test_files", "Example Data BEHons.xlsx"))
+
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+class TestMarksProcessor(unittest.TestCase):
+    def setUp(self) -> None:
+        # work on a copy so the shipped handbook is never modified
+        self.temp_dir = tempfile.mkdtemp()
+        db_path = os.path.join(self.temp_dir, "handbook.db")
+        shutil.copy(HANDBOOK_DB_PATH, db_path)
+
+        self.handbook_db = Sqlite_handbookDB(db_path)
+        self.marks_processor = Marks_processor(handbookDB=self.handbook_db)
+
+    def tearDown(self) -> None:
+        self.handbook_db.conn.close()
+        shutil.rmtree(self.temp_dir)
+
+    def output_path(self, name):
+        return os.path.join(self.temp_dir, name)
+
+    def test_process_example_file(self):
+        output_df = self.marks_processor.process_file(EXAMPLE_INPUT_PATH, self.output_path("output.xlsx"))
+
+        self.assertTrue(os.path.exists(self.output_path("output.xlsx")), "Output file should be created")
+        self.assertEqual(list(output_df['Person_ID']), ['23001000', '23002002', '23013000', '23313400', '23345034'])
+        self.assertEqual(list(output_df['Honours Class']), ['H2B', 'H3', 'H1', 'H2B', 'H2A'])
+        self.assertEqual(list(output_df['Missing Information (Y/N)']), ['Y', 'N', 'Y', 'Y', 'N'])
+
+    def test_read_excel_chunks_matches_read_excel(self):
+        chunks = list(read_excel_chunks(EXAMPLE_INPUT_PATH, chunksize=50))
+        expected = pd.read_excel(EXAMPLE_INPUT_PATH)
+
+        self.assertEqual([len(chunk) for chunk in chunks], [50, 50, 50, 50, 9])
+        pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), expected, check_dtype=False)
+
+    def test_streaming_matches_whole_file(self):
+        expected = self.marks_processor.process_file(EXAMPLE_INPUT_PATH, self.output_path("whole.xlsx"))
+        actual = self.marks_processor.process_file(EXAMPLE_INPUT_PATH, self.output_path("streamed.xlsx"), chunksize=7)
+
+        pd.testing.assert_frame_equal(actual, expected)
+
+    def test_cohort_state_keeps_totals_per_student_unit(self):
+        input_data = file_backends.read_input(EXAMPLE_INPUT_PATH)
+        handbook = self.marks_processor.load_handbook()
+
+        whole = Cohort_state(handbook)
+        whole.add(input_data.copy())
+        whole.consolidate()
+
+        # the same rows again in another chunk add to the totals, not to the number of rows kept
+        repeated = Cohort_state(handbook)
+        repeated.add(input_data.copy())
+        repeated.add(input_data.copy())
+        repeated.consolidate()
+
+        self.assertFalse(repeated.wam_inputs[WAM_KEYS].duplicated().any())
+        self.assertEqual(len(repeated.wam_inputs), len(whole.wam_inputs))
+        pd.testing.assert_series_equal(repeated.wam_inputs['Relevant_Credit_Points'].reset_index(drop=True),
+                                       whole.wam_inputs['Relevant_Credit_Points'].reset_index(drop=True) * 2)
+
+    def test_workers_match_serial(self):
+        expected = self.marks_processor.process_file(EXAMPLE_INPUT_PATH, self.output_path("serial.xlsx"))
+        actual = self.marks_processor.process_file(EXAMPLE_INPUT_PATH, self.output_path("parallel.xlsx"), workers=2)
+        streamed = self.marks_processor.process_file(EXAMPLE_INPUT_PATH, self.output_path("streamed.xlsx"), chunksize=50, workers=3)
+
+        pd.testing.assert_frame_equal(actual, expected)
+        pd.testing.assert_frame_equal(streamed, expected)
+
+    def test_workers_match_serial_with_string_person_ids(self):
+        input_data = pd.read_excel(EXAMPLE_INPUT_PATH)
+        input_data['Person_ID'] = 'A' + input_data['Person_ID'].astype(str)
+        input_data.to_csv(self.output_path("input.csv"), index=False)
+
+        expected = self.marks_processor.process_file(self.output_path("input.csv"), self.output_path("serial.csv"), workers=1)
+        actual = self.marks_processor.process_file(self.output_path("input.csv"), self.output_path("parallel.csv"), workers=2)
+
+        pd.testing.assert_frame_equal(actual, expected)
+
+    def test_progress_stages(self):
+        stages = []
+        self.marks_processor.process_file(EXAMPLE_INPUT_PATH, self.output_path("output.xlsx"),
+                                          progress=lambda stage, fraction: stages.append((stage, fraction)))
+
+        self.assertEqual([stage for stage, _ in stages], PROCESSING_STAGES + ['done'])
+        self.assertEqual([fraction for _, fraction in stages], sorted(fraction for _, fraction in stages))
+        self.assertEqual(stages[-1][1], 1.0)
+
+    def test_cancel_stops_before_writing(self):
+        cancel_event = threading.Event()
+
+        def cancel_at_eligibility(stage, fraction):
+            if stage == 'eligibility':
+                cancel_event.set()
+
+        with self.assertRaises(Processing_cancelled):
+            self.marks_processor.process_file(EXAMPLE_INPUT_PATH, self.output_path("output.xlsx"),
+                                              progress=cancel_at_eligibility, cancel_event=cancel_event)
+
+        self.assertFalse(os.path.exists(self.output_path("output.xlsx")))
+        self.assertIsNone(self.marks_processor.last_output)
+
+    def test_instrumentation_report(self):
+        report_path = self.output_path("report.json")
+        output_df = self.marks_processor.process_file(EXAMPLE_INPUT_PATH, self.output_path("output.xlsx"),
+                                                      instrumentation=Instrumentation(report_path=report_path))
+
+        report = output_df.attrs['report']
+        self.assertEqual(report['status'], 'completed')
+        self.assertEqual([stage['stage'] for stage in report['stages']], PROCESSING_STAGES)
+        stages = {stage['stage']: stage for stage in report['stages']}
+        self.assertEqual(stages['adjust']['rows'], 209)
+        self.assertEqual(stages['write']['rows'], 5)
+        self.assertGreater(stages['load']['db_queries'], 0)
+        self.assertEqual(stages['eligibility']['db_queries'], 0)
+        self.assertGreater(report['peak_memory_bytes'], 0)
+
+        with open(report_path) as report_file:
+            self.assertEqual(json.load(report_file), report)
+
+    def test_instrumentation_report_of_chunked_run(self):
+        read_input_chunks = file_backends.read_input_chunks
+
+        def slow_chunks(*args, **kwargs):
+            # reading each chunk takes a known time, which belongs to 'load'
+            for chunk in read_input_chunks(*args, **kwargs):
+                time.sleep(0.05)
+                yield chunk
+
+        with mock.patch.object(file_backends, 'read_input_chunks', slow_chunks):
+            output_df = self.marks_processor.process_file(EXAMPLE_INPUT_PATH, self.output_path("output.xlsx"), chunksize=50,
+                                                          instrumentation=Instrumentation(track_memory=False))
+
+        report = output_df.attrs['report']
+        # one row per stage, the chunks added up
+        self.assertEqual([stage['stage'] for stage in report['stages']], PROCESSING_STAGES)
+        stages = {stage['stage']: stage for stage in report['stages']}
+        self.assertEqual(stages['load']['rows'], 209)
+        self.assertEqual(stages['adjust']['rows'], 209)
+        self.assertGreaterEqual(stages['load']['seconds'], 5 * 0.05)
+        self.assertLess(stages['adjust']['seconds'], stages['load']['seconds'])
+        self.assertLessEqual(sum(stage['seconds'] for stage in report['stages']), report['total_seconds'])
+
+    def test_instrumentation_report_of_workers_is_noted(self):
+        output_df = self.marks_processor.process_file(EXAMPLE_INPUT_PATH, self.output_path("output.xlsx"), workers=2,
+                                                      instrumentation=Instrumentation(track_memory=False))
+
+        stages = {stage['stage']: stage for stage in output_df.attrs['report']['stages']}
+        self.assertIn("Approximate", stages['adjust']['note'])
+        self.assertIsNone(stages['load']['note'])
+
+    def test_instrumentation_report_of_cancelled_run(self):
+        cancel_event = threading.Event()
+        cancel_event.set()
+
+        with self.assertRaises(Processing_cancelled):
+            self.marks_processor.process_file(EXAMPLE_INPUT_PATH, self.output_path("output.xlsx"), cancel_event=cancel_event,
+                                              instrumentation=Instrumentation(track_memory=False))
+
+        self.assertEqual(self.marks_processor.last_report['status'], 'cancelled')
+        self.assertEqual(self.marks_processor.last_report['stages'], [])
+
+    def test_csv_input_and_output(self):
+        csv_input_path = self.output_path("input.csv")
+        pd.read_excel(EXAMPLE_INPUT_PATH).to_csv(csv_input_path, index=False)
+
+        expected = self.marks_processor.process_file(EXAMPLE_INPUT_PATH, self.output_path("output.xlsx"))
+        actual = self.marks_processor.process_file(csv_input_path, self.output_path("output.csv"))
+        streamed = self.marks_processor.process_file(csv_input_path, self.output_path("streamed.csv"), chunksize=7)
+
+        pd.testing.assert_frame_equal(actual, expected)
+        pd.testing.assert_frame_equal(streamed, expected)
+        self.assertEqual(list(pd.read_csv(self.output_path("output.csv")).columns), list(expected.columns))
+
+    @unittest.skipUnless(HAS_PYARROW, "pyarrow is not installed")
+    def test_parquet_and_feather_input_and_output(self):
+        input_data = pd.read_excel(EXAMPLE_INPUT_PATH)
+        input_data.to_parquet(self.output_path("input.parquet"))
+        input_data.to_feather(self.output_path("input.feather"))
+
+        expected = self.marks_processor.process_file(EXAMPLE_INPUT_PATH, self.output_path("output.xlsx"))
+        for extension in ["parquet", "feather"]:
+            input_path = self.output_path(f"input.{extension}")
+            output_path = self.output_path(f"output.{extension}")
+
+            pd.testing.assert_frame_equal(self.marks_processor.process_file(input_path, output_path), expected)
+            pd.testing.assert_frame_equal(
+                self.marks_processor.process_file(input_path, output_path, chunksize=7), expected)
+
+    def test_input_format_parameter_overrides_extension(self):
+        csv_input_path = self.output_path("input.txt")
+        pd.read_excel(EXAMPLE_INPUT_PATH).to_csv(csv_input_path, index=False)
+
+        output_df = self.marks_processor.process_file(csv_input_path, self.output_path("output.xlsx"), input_format='csv')
+
+        self.assertEqual(len(output_df), 5)
+
+    def test_reevaluate_only_affected_students(self):
+        self.marks_processor.process_file(EXAMPLE_INPUT_PATH, self.output_path("output.xlsx"))
+
+        # unlink every Civil Engineering unit from its first rule
+        major_id = self.handbook_db.get_major_ids('Civil Engineering')[0]
+        rule_id, _, units = self.handbook_db.fetch_major_rules_verbose_by_id(major_id)[0]
+        for unit_code, _ in units:
+            self.handbook_db.unlink_unit_rule(unit_code, rule_id)
+
+        changed_rows = self.marks_processor.reevaluate()
+        incremental = self.marks_processor.last_output
+        expected = self.marks_processor.process_file(EXAMPLE_INPUT_PATH, self.output_path("rerun.xlsx"))
+
+        self.assertEqual(list(changed_rows['Person_ID']), ['23002002'])
+        pd.testing.assert_frame_equal(incremental, expected)
+        self.assertEqual(len(self.marks_processor.reevaluate()), 0)
+
+    def test_reevaluate_with_handbook_snapshot(self):
+        self.marks_processor.process_file(EXAMPLE_INPUT_PATH, self.output_path("output.xlsx"))
+
+        major_id = self.handbook_db.get_major_ids('Civil Engineering')[0]
+        rule_id, _, units = self.handbook_db.fetch_major_rules_verbose_by_id(major_id)[0]
+        for unit_code, _ in units:
+            self.handbook_db.unlink_unit_rule(unit_code, rule_id)
+
+        # as the GUI does, the snapshot is loaded in the database's thread and re-evaluated elsewhere
+        changed_rows = self.marks_processor.reevaluate(self.marks_processor.load_handbook())
+
+        self.assertEqual(list(changed_rows['Person_ID']), ['23002002'])
+
+    def test_input_schema(self):
+        csv_input_path = self.output_path("input.csv")
+        pd.read_excel(EXAMPLE_INPUT_PATH).to_csv(csv_input_path, index=False)
+
+        for data in [file_backends.read_input(EXAMPLE_INPUT_PATH), file_backends.read_input(csv_input_path),
+                     next(file_backends.read_input_chunks(EXAMPLE_INPUT_PATH, chunksize=50)),
+                     next(file_backends.read_input_chunks(csv_input_path, chunksize=50))]:
+            # only the columns the pipeline uses are read, e.g. not Unit_Title
+            self.assertEqual({column: str(dtype) for column, dtype in data.dtypes.items()}, file_backends.INPUT_DTYPES)
+
+    def test_half_marks_keep_their_dtype(self):
+        input_data = pd.read_excel(EXAMPLE_INPUT_PATH)
+        expected = self.marks_processor.process_file(EXAMPLE_INPUT_PATH, self.output_path("output.xlsx"))
+
+        # the same marks as floats, one of them not whole
+        marked = input_data['Mark'].notna() & (input_data['Unit_Code'] != 'GENG4412')
+        input_data.loc[input_data.index[marked][0], 'Mark'] += 0.5
+        input_data.to_csv(self.output_path("input.csv"), index=False)
+
+        self.assertEqual(file_backends.read_input(self.output_path("input.csv"))['Mark'].dtype, 'float64')
+        actual = self.marks_processor.process_file(self.output_path("input.csv"), self.output_path("output.csv"))
+        pd.testing.assert_frame_equal(actual.drop(columns='EH-WAM'), expected.drop(columns='EH-WAM'))
+
+    def test_rows_without_person_id_are_dropped(self):
+        expected = self.marks_processor.process_file(EXAMPLE_INPUT_PATH, self.output_path("output.xlsx"))
+
+        # a trailing row with only a mark, as left at the end of some extracts
+        input_data = pd.read_excel(EXAMPLE_INPUT_PATH)
+        input_data.loc[len(input_data), 'Mark'] = 50
+        input_data.to_excel(self.output_path("blank_id.xlsx"), index=False)
+
+        self.assertEqual(file_backends.read_input(self.output_path("blank_id.xlsx"))['Person_ID'].dtype, 'int64')
+        pd.testing.assert_frame_equal(
+            self.marks_processor.process_file(self.output_path("blank_id.xlsx"), self.output_path("blank_id_output.xlsx")), expected)
+        pd.testing.assert_frame_equal(
+            self.marks_processor.process_file(self.output_path("blank_id.xlsx"), self.output_path("blank_id_output.xlsx"),
+                                              chunksize=7), expected)
+
+    def test_non_numeric_person_id_keeps_its_dtype(self):
+        input_data = pd.read_excel(EXAMPLE_INPUT_PATH)
+        input_data['Person_ID'] = 'S' + input_data['Person_ID'].astype(str)
+        input_data.to_csv(self.output_path("input.csv"), index=False)
+
+        output_df = self.marks_processor.process_file(self.output_path("input.csv"), self.output_path("output.csv"))
+
+        self.assertEqual(list(output_df['Person_ID']), ['S23001000', 'S23002002', 'S23013000', 'S23313400', 'S23345034'])
+
+    def test_non_numeric_person_id_through_every_path(self):
+        input_data = pd.read_excel(EXAMPLE_INPUT_PATH)
+        input_data['Person_ID'] = 'S' + input_data['Person_ID'].astype(str)
+        input_path = self.output_path("input.csv")
+        input_data.to_csv(input_path, index=False)
+
+        # the Person_ID cast fails, so the column stays as read
+        self.assertEqual(file_backends.read_input(input_path)['Person_ID'].dtype, object)
+        expected = self.marks_processor.process_file(input_path, self.output_path("output.csv"))
+
+        for options in [{'chunksize': 7}, {'workers': 2}, {'chunksize': 7, 'workers': 2}]:
+            actual = self.marks_processor.process_file(input_path, self.output_path("output.csv"), **options)
+            pd.testing.assert_frame_equal(actual, expected, obj=str(options))
+
+        # the second read comes from the cache
+        cached_processor = Marks_processor(handbookDB=self.handbook_db,
+                                           ingest_cache=Ingest_cache(cache_dir=self.output_path("cache")))
+        for _ in range(2):
+            pd.testing.assert_frame_equal(cached_processor.process_file(input_path, self.output_path("output.csv")), expected)
+
+    def test_excel_output_filter_and_highlight(self):
+        output_df = self.marks_processor.process_file(EXAMPLE_INPUT_PATH, self.output_path("output.xlsx"))
+
+        worksheet = openpyxl.load_workbook(self.output_path("output.xlsx")).active
+        self.assertEqual(worksheet.auto_filter.ref, "A1:L6")
+        highlights = [(str(formatting.sqref), rule.formula, rule.dxf.font.color.rgb)
+                      for formatting in worksheet.conditional_formatting for rule in formatting.rules]
+        # Completed GENG4412 (Y/N) is the 7th column
+        self.assertEqual(highlights, [("G2:G6", ['"N"'], "00FF0000")])
+        self.assertTrue(worksheet["A1"].font.b)
+
+        # missing marks and empty comments are empty cells
+        written = pd.read_excel(self.output_path("output.xlsx"), dtype={'Person_ID': str})
+        pd.testing.assert_frame_equal(written.fillna({'Comments (missing information)': ''}), output_df)
+
+    def test_unsupported_file_type(self):
+        with self.assertRaises(ValueError) as context:
+            file_backends.file_format("marks.docx")
+
+        self.assertIn("Unsupported file type", str(context.exception))
+
+    def test_xls_is_only_read_whole(self):
+        self.assertEqual(file_backends.file_format("marks.xls", whole_input=True), 'excel')
+
+        # openpyxl cannot stream or write .xls, so it is not silently given xlsx bytes
+        for requested_format in [None, 'excel']:
+            with self.assertRaises(ValueError) as context:
+                file_backends.file_format("marks.xls", requested_format)
+            self.assertIn(".xls files can only be read whole", str(context.exception))
+
+if __name__ == '__main__':
+    unittest.main()
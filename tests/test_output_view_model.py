@@ -0,0 +1,87 @@
+import unittest
+
+# set path to the src dir so the app package can be imported
+import sys
+import os
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.append(src_dir)
+
+import numpy as np
+import pandas as pd
+
+from app.TkinterGui.output_view_model import FLAG_COLUMN, FLAG_VALUE, Column_indexes, Output_view_model
+
+
+def make_output_df(rows=200):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'Person ID': rng.permutation(rows) + 20000000,
+        'EH-WAM': rng.integers(40, 90, rows).astype(float),
+        'Major_Deg': rng.choice(['Civil', 'Mechanical', 'Software'], rows),
+        FLAG_COLUMN: rng.choice(['Y', 'N'], rows),
+    })
+    df.loc[df.index[::7], 'EH-WAM'] = np.nan
+    return df
+
+class TestOutputViewModel(unittest.TestCase):
+    def setUp(self) -> None:
+        self.df = make_output_df()
+
+    def test_sort_matches_pandas(self):
+        view = Output_view_model(self.df)
+        for ascending in [True, False]:
+            view.sort('EH-WAM', ascending)
+            expected = self.df.reset_index(drop=True).sort_values('EH-WAM', ascending=ascending,
+                                                                  kind='stable', na_position='last').index
+            self.assertEqual(list(view.rows), list(expected))
+
+    def test_sort_toggles_direction(self):
+        view = Output_view_model(self.df)
+        view.sort('Major_Deg')
+        self.assertTrue(view.ascending)
+        view.sort('Major_Deg')
+        self.assertFalse(view.ascending)
+        view.sort('Person ID')
+        self.assertTrue(view.ascending)
+
+    def test_flagged_view_does_not_copy(self):
+        indexes = Column_indexes(self.df)
+        view = Output_view_model(self.df, indexes, filters={FLAG_COLUMN: FLAG_VALUE})
+
+        self.assertIs(view.output_df, self.df)
+        expected = self.df[self.df[FLAG_COLUMN] == FLAG_VALUE]
+        self.assertEqual(view.row_count, len(expected))
+        self.assertEqual([row[0] for row in view.page(0, 5)], [str(value) for value in expected['Person ID'].head(5)])
+
+        # filters and sorting combine, and the indexes are shared between views
+        view.set_filter('Major_Deg', 'Civil')
+        view.sort('Person ID')
+        expected = expected[expected['Major_Deg'] == 'Civil'].sort_values('Person ID')
+        self.assertEqual([int(row[0]) for row in view.page(0, view.row_count)], list(expected['Person ID']))
+        self.assertIn('Person ID', Output_view_model(self.df, indexes).indexes.codes)
+
+        view.clear_filters(keep={FLAG_COLUMN: FLAG_VALUE})
+        self.assertEqual(view.row_count, (self.df[FLAG_COLUMN] == FLAG_VALUE).sum())
+
+    def test_filter_by_shown_value(self):
+        view = Output_view_model(self.df)
+        value = self.df['EH-WAM'].dropna().iloc[0]
+
+        view.set_filter('EH-WAM', str(int(value)))
+        self.assertEqual(view.row_count, (self.df['EH-WAM'] == value).sum())
+
+        view.set_filter('EH-WAM', 'not a mark')
+        self.assertEqual(view.row_count, 0)
+        self.assertEqual(view.page(0, 10), [])
+
+    def test_page(self):
+        view = Output_view_model(self.df)
+
+        self.assertEqual(len(view.page(0, 20)), 20)
+        self.assertEqual(len(view.page(190, 20)), 10)
+        # missing marks are blank and whole marks have no decimals
+        self.assertEqual(view.page(0, 1)[0][1], "")
+        self.assertEqual(view.page(1, 1)[0][1], str(int(self.df['EH-WAM'].iloc[1])))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+
+# set path to the src dir so the app package can be imported
+import sys
+import os
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.append(src_dir)
+
+import contextlib
+import io
+import shutil
+import tempfile
+
+from app.databases.sqlite_handbookDB import Sqlite_handbookDB
+from app.TkinterGui.rules_view_model import Rules_view_model
+
+HANDBOOK_DB_PATH = os.path.join(src_dir, "handbook.db")
+
+class TestRulesViewModel(unittest.TestCase):
+    def setUp(self) -> None:
+        # work on a copy so the shipped handbook is never modified
+        self.temp_dir = tempfile.mkdtemp()
+        db_path = os.path.join(self.temp_dir, "handbook.db")
+        shutil.copy(HANDBOOK_DB_PATH, db_path)
+
+        self.handbook_db = Sqlite_handbookDB(db_path)
+        self.rules_view = Rules_view_model(self.handbook_db)
+        self.rules_view.load('Civil Engineering', 2023)
+
+    def tearDown(self) -> None:
+        self.handbook_db.conn.close()
+        shutil.rmtree(self.temp_dir)
+
+    def assert_matches_db(self):
+        # the rules kept in memory are what a full reload shows
+        reloaded = Rules_view_model(self.handbook_db)
+        reloaded.load('Civil Engineering', 2023)
+        self.assertEqual({rule_id: (credit_points, sorted(units)) for rule_id, (credit_points, units) in self.rules_view.rules.items()},
+                         {rule_id: (credit_points, sorted(units)) for rule_id, (credit_points, units) in reloaded.rules.items()})
+
+    def test_unit_edits(self):
+        rule_id = next(iter(self.rules_view.rules))
+        _, units = self.rules_view.rules[rule_id]
+        removed_unit = units[0]
+
+        self.rules_view.remove_unit(rule_id, removed_unit[0])
+        self.assertNotIn(removed_unit, self.rules_view.rules[rule_id][1])
+        self.assert_matches_db()
+
+        self.assertTrue(self.rules_view.add_unit(rule_id, *removed_unit))
+        self.assertEqual(self.rules_view.rules[rule_id][1][-1], removed_unit)
+        # already in the rule
+        self.assertFalse(self.rules_view.add_unit(rule_id, *removed_unit))
+        self.assert_matches_db()
+
+    def test_rule_edits(self):
+        first_rule_id = next(iter(self.rules_view.rules))
+        rule_count = len(self.rules_view.rules)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            rule_id = self.rules_view.add_rule(12)
+        self.assertEqual(self.rules_view.rules[rule_id], (12, []))
+        self.assertEqual(self.rules_view.rule_number(rule_id), rule_count + 1)
+
+        self.rules_view.delete_rule(first_rule_id)
+        self.assertEqual(self.rules_view.rule_number(rule_id), rule_count)
+        self.assert_matches_db()
+
+    def test_unit_deleted(self):
+        unit_code = 'GENG4412'
+        in_rules = [rule_id for rule_id, (_, units) in self.rules_view.rules.items() if unit_code in dict(units)]
+        self.assertTrue(in_rules)
+
+        self.handbook_db.delete_unit(unit_code)
+        self.assertEqual(self.rules_view.unit_deleted(unit_code), in_rules)
+        self.assert_matches_db()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+
+# set path to the src dir so the app package can be imported
+import sys
+import os
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.append(src_dir)
+
+import contextlib
+import io
+import shutil
+import sqlite3
+import tempfile
+
+from app.databases.sqlite_handbookDB import Sqlite_handbookDB
+
+HANDBOOK_DB_PATH = os.path.join(src_dir, "handbook.db")
+
+class TestSqliteHandbookDBWrites(unittest.TestCase):
+    def setUp(self) -> None:
+        # work on a copy so the shipped handbook is never modified
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.temp_dir, "handbook.db")
+        shutil.copy(HANDBOOK_DB_PATH, self.db_path)
+
+        self.handbook_db = Sqlite_handbookDB(self.db_path)
+
+    def tearDown(self) -> None:
+        self.handbook_db.conn.close()
+        shutil.rmtree(self.temp_dir)
+
+    def rules(self, major, year):
+        # rule IDs differ between copies, so compare the credit points and units of each rule
+        return sorted((value, sorted(units)) for _, value, units in self.handbook_db.fetch_major_rules_verbose(major, year))
+
+    def test_duplicate_major(self):
+        self.handbook_db.duplicate_major('Civil Engineering', 2023, 'Civil Engineering', 2024)
+
+        self.assertEqual(self.rules('Civil Engineering', 2024), self.rules('Civil Engineering', 2023))
+        # committed as a whole
+        self.assertFalse(self.handbook_db.conn.in_transaction)
+
+    def test_duplicate_major_rolls_back(self):
+        rule_count = len(self.handbook_db.fetch_all_rules())
+
+        # the new major already exists, so nothing is copied
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.handbook_db.duplicate_major('Civil Engineering', 2023, 'Mechanical Engineering', 2023)
+
+        self.assertEqual(len(self.handbook_db.fetch_all_rules()), rule_count)
+
+    def test_create_rule_with_units_rolls_back(self):
+        rule_count = len(self.handbook_db.fetch_all_rules())
+        link_count = self.handbook_db.conn.execute("SELECT COUNT(*) FROM RuleUnits").fetchone()[0]
+
+        # linking the same unit twice fails, after the rule and the first link were written
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.handbook_db.create_rule_with_units(['GENG4411', 'GENG4412', 'GENG4411'], 12)
+
+        self.assertEqual(len(self.handbook_db.fetch_all_rules()), rule_count)
+        self.assertEqual(self.handbook_db.conn.execute("SELECT COUNT(*) FROM RuleUnits").fetchone()[0], link_count)
+
+    def test_rollback_keeps_pending_edits(self):
+        # an edit made before, not committed yet, survives a bulk write that fails
+        self.handbook_db.create_unit('TEST1000', 6)
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.handbook_db.create_rule_with_units(['TEST1000', 'TEST1000'], 6)
+
+        self.assertIn('TEST1000', self.handbook_db.fetch_all_units())
+        self.assertTrue(self.handbook_db.conn.in_transaction)
+
+    def test_import_units(self):
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            created = self.handbook_db.import_units([('TEST1000', 6), ('TEST2000', 12), ('GENG4412', 6), ('TEST1000', 6)])
+
+        self.assertEqual(created, 2)
+        units = dict(self.handbook_db.fetch_all_units_with_credit())
+        self.assertEqual((units['TEST1000'], units['TEST2000'], units['GENG4412']), (6, 12, 12))
+        self.assertIn("GENG4412 already exists in the database with different credit points", output.getvalue())
+
+if __name__ == '__main__':
+    unittest.main()
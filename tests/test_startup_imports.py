@@ -0,0 +1,80 @@
+import unittest
+
+# set path to the src dir so the app package can be imported
+import sys
+import os
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.append(src_dir)
+
+import subprocess
+
+# Only loaded once a result is previewed
+PREVIEW_MODULES = ['app.TkinterGui.output_window']
+
+# Only loaded once a file is processed
+PROCESSING_MODULES = ['pandas', 'numpy', 'app.logic.marks_processor']
+
+# Modules the headless CLI should never import
+GUI_MODULES = ['tkinter', 'app.TkinterGui']
+
+# Generous limit on the import time of the GUI modules themselves (pandas not included), in microseconds
+MAIN_WINDOW_IMPORT_LIMIT_US = 500_000
+
+
+def import_times(code):
+    """
+    Run code in a fresh interpreter with -X importtime.
+
+    Returns:
+    dict: Module name -> cumulative import time in microseconds.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=src_dir,
+                            check=True, capture_output=True, text=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        times[module.strip()] = int(cumulative)
+    return times
+
+def loaded_modules(code):
+    """
+    Run code in a fresh interpreter from the src directory.
+
+    Returns:
+    set: The names of every module in sys.modules afterwards.
+    """
+    result = subprocess.run([sys.executable, "-c", f"{code}\nimport sys\nprint('\\n'.join(sys.modules))"],
+                            cwd=src_dir, check=True, capture_output=True, text=True)
+    return set(result.stdout.splitlines())
+
+class TestStartupImports(unittest.TestCase):
+    def test_gui_start_does_not_import_preview(self):
+        # everything loaded before the first window is drawn
+        imported = loaded_modules("import main")
+
+        self.assertIn("app.TkinterGui.main_window", imported)
+        for module in PREVIEW_MODULES:
+            self.assertNotIn(module, imported)
+
+    def test_gui_start_does_not_import_pandas(self):
+        imported = loaded_modules("import main")
+
+        for module in PROCESSING_MODULES:
+            self.assertNotIn(module, imported)
+
+    def test_main_window_import_time(self):
+        times = import_times("import app.TkinterGui.main_window")
+
+        self.assertLess(times["app.TkinterGui.main_window"], MAIN_WINDOW_IMPORT_LIMIT_US)
+
+    def test_cli_does_not_import_gui(self):
+        imported = loaded_modules("import app.__main__, app.logic.marks_processor, app.databases.sqlite_handbookDB")
+
+        self.assertIn("app.logic.marks_processor", imported)
+        for module in GUI_MODULES:
+            self.assertNotIn(module, imported)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+
+# set path to the src and benchmarks dirs so the app package and the generator can be imported
+import sys
+import os
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+benchmarks_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+sys.path.append(src_dir)
+sys.path.append(benchmarks_dir)
+
+import shutil
+import tempfile
+
+import pandas as pd
+
+from app.databases.sqlite_handbookDB import Sqlite_handbookDB
+from app.logic.marks_processor import Marks_processor
+import synthetic_cohort
+
+EXAMPLE_INPUT_PATH = os.path.abspath(os.path.join(src_dir, "..", "test_files", "Example Data BEHons.xlsx"))
+
+class TestSyntheticCohort(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.mkdtemp()
+        self.handbook = synthetic_cohort.build_handbook(majors=3)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.temp_dir)
+
+    def test_extract_matches_example_columns(self):
+        chunk = next(synthetic_cohort.cohort_chunks(self.handbook, students=20))
+        example_columns = list(pd.read_excel(EXAMPLE_INPUT_PATH, nrows=0).columns)
+
+        self.assertEqual(list(chunk.columns), example_columns)
+        self.assertEqual(chunk['Person_ID'].nunique(), 20)
+
+    def test_same_seed_same_extract(self):
+        first = pd.concat(synthetic_cohort.cohort_chunks(self.handbook, students=30, seed=4, block_size=7))
+        second = pd.concat(synthetic_cohort.cohort_chunks(self.handbook, students=30, seed=4, block_size=7))
+
+        pd.testing.assert_frame_equal(first, second)
+
+    def test_process_synthetic_cohort(self):
+        input_path = os.path.join(self.temp_dir, "cohort.csv")
+        db_path = os.path.join(self.temp_dir, "handbook.db")
+        synthetic_cohort.write_handbook_db(self.handbook, db_path)
+        synthetic_cohort.write_cohort(input_path, self.handbook, students=50)
+
+        handbook_db = Sqlite_handbookDB(db_path)
+        try:
+            output_df = Marks_processor(handbookDB=handbook_db).process_file(input_path, os.path.join(self.temp_dir, "output.csv"))
+        finally:
+            handbook_db.conn.close()
+
+        self.assertEqual(output_df['Person_ID'].nunique(), 50)
+        self.assertEqual(set(output_df['Major_Deg']), set(self.handbook['majors']))
+        # most students have completed their degree
+        self.assertGreater((output_df['Missing Information (Y/N)'] == 'N').mean(), 0.3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+# set path to the src dir so the app package can be imported
+import sys
+import os
+src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+sys.path.append(src_dir)
+
+from app.databases.unit_index import Unit_index
+
+UNITS = [('MATH1011', 6), ('GENG1010', 6), ('CITS1401', 6), ('GENG4412', 12), ('ENSC1001', 6), ('geng9999', 6)]
+
+class TestUnitIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        self.unit_index = Unit_index(UNITS)
+
+    def test_prefix_search(self):
+        self.assertEqual(self.unit_index.prefix_search('GENG'), ['GENG1010', 'GENG4412', 'geng9999'])
+        self.assertEqual(self.unit_index.prefix_search('geng4'), ['GENG4412'])
+        self.assertEqual(self.unit_index.prefix_search('PHYS'), [])
+
+    def test_search_puts_prefix_matches_first(self):
+        # ENSC1001 only contains 'en'
+        self.assertEqual(self.unit_index.search('en'), ['ENSC1001', 'GENG1010', 'GENG4412', 'geng9999'])
+        self.assertEqual(self.unit_index.search('10'), ['ENSC1001', 'GENG1010', 'MATH1011'])
+        self.assertEqual(len(self.unit_index.search('')), len(UNITS))
+
+    def test_search_as_typed_matches_fresh_search(self):
+        for term in ['g', 'ge', 'gen', 'geng', 'geng1', 'geng', 'e', '1']:
+            self.assertEqual(self.unit_index.search(term), Unit_index(UNITS).search(term), term)
+
+    def test_add_and_remove(self):
+        self.unit_index.search('geng')
+        self.unit_index.add('GENG2000', 0)
+        self.unit_index.remove('GENG4412')
+        self.unit_index.remove('NONE0000')
+        # an existing unit keeps its credit points
+        self.unit_index.add('GENG1010', 12)
+
+        self.assertEqual(self.unit_index.search('geng'), ['GENG1010', 'GENG2000', 'geng9999'])
+        self.assertEqual(self.unit_index.credit_points['GENG1010'], 6)
+
+if __name__ == '__main__':
+    unittest.main()